@@ -7,10 +7,20 @@ src_dir = current_dir / "src"
 if src_dir.exists():
     sys.path.append(str(current_dir))
 
+from src.startup import Capabilities, ImportProfiler
+# Profile the app's own imports when ISP_ANALYZER_IMPORT_PROFILE is set; must run before they are imported.
+ImportProfiler.install_from_env()
+
 from src.config.settings import KeywordSets
+from src.data.repository import SessionRepository
 from src.data.session_store import SQLiteSessionRepository, SessionManager
+from src.data.file_store import FileSessionRepository
+from src.data.journal import SessionJournal
+from src.domain.metrics import MetricsAggregate
 from src.ui.app import setup_app_ui
+from src.ui.utils import session_activity_check
 from src.domain.ai.model import ModelManager
+from src.domain.ai.backend import FakeLLMBackend
 
 st.set_page_config(
     page_title="ISP Keyword Analyzer",
@@ -19,19 +29,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_session_repository() -> SessionRepository:
+    """Session repository shared by all browser sessions, so they share one connection pool."""
+    if FileSessionRepository.selected():
+        session_repo = FileSessionRepository.from_env()
+    else:
+        session_repo = SQLiteSessionRepository()
+    session_repo.initialize()
+    return session_repo
+
 def initialize_app():
     """Initialize the application state and dependencies."""
     
-    try:
-        import llama_cpp
-        st.session_state.ai_available = True
-    except ImportError:
-        st.session_state.ai_available = False
-        import sys
+    # Probe for llama_cpp without importing it; the library is loaded when a model is.
+    st.session_state.ai_available = (Capabilities.llm_available()
+                                     or FakeLLMBackend.configured_mode() in ("replay", "synthesize"))
+    if not st.session_state.ai_available:
         print("\033[91mERROR: The llama-cpp-python library is not installed. AI features will be disabled.\033[0m", file=sys.stderr)
     
-    session_repo = SQLiteSessionRepository()
-    session_manager = SessionManager(session_repo)
+    session_manager = SessionManager(get_session_repository())
     
     if 'isps' not in st.session_state:
         st.session_state.isps = {}
@@ -73,6 +90,25 @@ def initialize_app():
         st.session_state.all_keywords_analyzed = False
     if 'classification_metadata' not in st.session_state:
         st.session_state.classification_metadata = {}
+    if 'loaded_session_id' not in st.session_state:
+        st.session_state.loaded_session_id = None
+    if 'isp_loader' not in st.session_state:
+        st.session_state.isp_loader = None
+    if 'session_name' not in st.session_state:
+        st.session_state.session_name = ""
+    if 'loaded_head_id' not in st.session_state:
+        st.session_state.loaded_head_id = None
+    if 'save_conflict' not in st.session_state:
+        st.session_state.save_conflict = None
+    if 'merge_conflicts' not in st.session_state:
+        st.session_state.merge_conflicts = []
+    if 'metrics' not in st.session_state:
+        st.session_state.metrics = MetricsAggregate.from_isps(st.session_state.isps)
+    if 'journal' not in st.session_state:
+        st.session_state.journal = SessionJournal.create(st.session_state.loaded_session_id,
+                                                         is_active=session_activity_check())
+    else:
+        st.session_state.journal.ensure_open()
     
     if 'selected_model' not in st.session_state:
         available_models = ModelManager.get_available_models()
@@ -85,6 +121,18 @@ def initialize_app():
     
     return session_manager
 
+def render_import_profile():
+    """Show the import-time profile when ISP_ANALYZER_IMPORT_PROFILE is set, and log new imports to stderr."""
+    profiler = ImportProfiler.active()
+    if profiler is None:
+        return
+    profiler.write_new()
+    with st.expander(f"Import profile ({profiler.total():.3f} s importing {len(profiler.records)} modules)"):
+        st.markdown("**Slowest imports (cumulative)**")
+        st.code(profiler.format(profiler.slowest(15)), language=None)
+        st.markdown("**All imports, in the order they finished**")
+        st.code(profiler.format(), language=None)
+
 def main():
     """Main application entry point."""
     st.title("ISP Keyword Analyzer")
@@ -100,6 +148,7 @@ def main():
     
     session_manager = initialize_app()
     setup_app_ui(session_manager)
+    render_import_profile()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,6 @@
 """
 Configuration module for the ISP Keyword Analyzer.
 """
-from src.config.settings import KeywordSets
+from src.config.settings import KeywordSets, RuleMarkerSets
 
-__all__ = ['KeywordSets']
\ No newline at end of file
+__all__ = ['KeywordSets', 'RuleMarkerSets']
\ No newline at end of file
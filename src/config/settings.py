@@ -39,4 +39,37 @@ class KeywordSets:
     @classmethod
     def is_valid_language(cls, language: str) -> bool:
         """Check if a language is supported."""
-        return language in cls._DEFAULT_SETS
\ No newline at end of file
+        return language in cls._DEFAULT_SETS
+
+class RuleMarkerSets:
+    """Manages the rule-based classifier marker packs for different languages.
+    
+    Markers are matched as whole words or phrases, so inflected forms that should
+    count are listed separately.
+    """
+    
+    _DEFAULT_SETS = {
+        "Swedish": {
+            "action_markers": ["måste", "ska", "skall", "krävs att", "alltid", "aldrig",
+                               "får inte", "får ej", "bör", "är förbjudet", "är inte tillåtet",
+                               "är ej tillåtet"],
+            "vague_terms": ["i god tid", "iaktta försiktighet", "vara försiktig", "vid behov",
+                            "när det behövs", "lämplig", "lämpligt", "lämpliga", "rimlig", "rimligt",
+                            "rimliga", "på ett korrekt sätt"]
+        },
+        "English": {
+            "action_markers": ["must", "shall", "required to", "always", "never",
+                               "do not", "should", "is prohibited", "is not permitted"],
+            "vague_terms": ["good time", "exercise caution", "be careful", "as appropriate",
+                            "when necessary", "as needed", "reasonable", "proper", "properly"]
+        }
+    }
+    
+    @classmethod
+    def get_markers(cls, language: str) -> Dict[str, list]:
+        """Get the action markers and vague terms for a specific language.
+        
+        Unknown languages fall back to the English pack.
+        """
+        pack = cls._DEFAULT_SETS.get(language, cls._DEFAULT_SETS["English"])
+        return {kind: list(markers) for kind, markers in pack.items()}
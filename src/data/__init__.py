@@ -1,7 +1,35 @@
 """
 Data management module for the ISP Keyword Analyzer.
 """
-from src.data.repository import SessionRepository
-from src.data.session_store import SessionManager, SQLiteSessionRepository
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
 
-__all__ = ['SessionRepository', 'SessionManager', 'SQLiteSessionRepository']
\ No newline at end of file
+if TYPE_CHECKING:
+    from src.data.repository import SessionRepository, SessionConflictError
+    from src.data.session_store import SessionManager, SQLiteSessionRepository
+    from src.data.journal import SessionJournal
+    from src.data.connection import SQLiteConnectionManager
+    from src.data.blob_store import BlobStore
+    from src.data.lazy_session import LazySessionLoader
+    from src.data.catalog import SessionCatalog
+    from src.data.retention import RetentionPolicy
+    from src.data.file_store import FileSessionRepository
+    from src.data.archive import ProjectArchiveWriter, ProjectArchiveReader, ArchiveError
+    from src.data.merge import SessionMerger
+
+__all__ = ['SessionRepository', 'SessionConflictError', 'SessionManager', 'SQLiteSessionRepository', 'SessionJournal', 'SQLiteConnectionManager', 'BlobStore', 'LazySessionLoader', 'SessionCatalog', 'RetentionPolicy', 'FileSessionRepository', 'ProjectArchiveWriter', 'ProjectArchiveReader', 'ArchiveError', 'SessionMerger']
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.data.repository': ['SessionRepository', 'SessionConflictError'],
+    'src.data.session_store': ['SessionManager', 'SQLiteSessionRepository'],
+    'src.data.journal': ['SessionJournal'],
+    'src.data.connection': ['SQLiteConnectionManager'],
+    'src.data.blob_store': ['BlobStore'],
+    'src.data.lazy_session': ['LazySessionLoader'],
+    'src.data.catalog': ['SessionCatalog'],
+    'src.data.retention': ['RetentionPolicy'],
+    'src.data.file_store': ['FileSessionRepository'],
+    'src.data.archive': ['ProjectArchiveWriter', 'ProjectArchiveReader', 'ArchiveError'],
+    'src.data.merge': ['SessionMerger']
+})
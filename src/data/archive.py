@@ -0,0 +1,280 @@
+"""
+Portable project archives: a ZIP with a manifest, ISP texts and classification tables.
+
+Archives are written and read one ISP at a time, so memory use does not grow
+with the size of the project. Command line use:
+
+    python -m src.data.archive export <session id> project.zip [--db session_state.db]
+    python -m src.data.archive verify project.zip
+    python -m src.data.archive import project.zip [--isp ID ...] [--name NAME] [--db session_state.db]
+"""
+import io
+import sys
+import json
+import zipfile
+import hashlib
+import argparse
+import datetime
+from typing import Dict, List, Any, Iterator, Optional, Tuple, BinaryIO
+
+ARCHIVE_FORMAT = "isp-analyzer-project"
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+class ArchiveError(ValueError):
+    """Raised when a project archive is malformed or fails validation."""
+
+
+class ProjectArchiveWriter:
+    """Write a project archive to a seekable or non-seekable binary file.
+
+    Call add_isp for each ISP and then close(). Each entry is compressed and
+    hashed while it is streamed into the ZIP; the manifest with the SHA-256 of
+    every entry is written last.
+    """
+
+    def __init__(self, fileobj: BinaryIO, state: Optional[Dict[str, Any]] = None, compresslevel: int = 6):
+        self.zip = zipfile.ZipFile(fileobj, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self.state = state or {}
+        self.isps: List[Dict[str, Any]] = []
+        self.files: Dict[str, Dict[str, Any]] = {}
+
+    def _write_entry(self, name: str, chunks: Iterator[bytes]) -> None:
+        """Stream chunks into a compressed entry, recording their size and SHA-256."""
+        digest = hashlib.sha256()
+        size = 0
+        with self.zip.open(name, mode="w", force_zip64=True) as entry:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                entry.write(chunk)
+        self.files[name] = {'sha256': digest.hexdigest(), 'size': size}
+
+    def add_isp(self, isp_id: int, isp: Dict[str, Any], analyzed_keywords: List[str],
+                classification_metadata: Dict[str, Any]) -> None:
+        """Add one ISP with its text, classifications and the metadata of its classifications."""
+        prefix = f"isps/{isp_id}/"
+        text = isp.get('text', '')
+        analysis_results = isp.get('analysis_results', {})
+        self._write_entry(prefix + "text.txt", (text[i:i + CHUNK_SIZE].encode('utf-8')
+                                                for i in range(0, len(text), CHUNK_SIZE)))
+
+        counts = {'AA': 0, 'OI': 0}
+
+        def rows() -> Iterator[bytes]:
+            for keyword, results in analysis_results.items():
+                for label in ('AA', 'OI'):
+                    for occurrence in results.get(label, []):
+                        counts[label] += 1
+                        row = {'keyword': keyword, 'label': label, 'occurrence': occurrence}
+                        metadata = classification_metadata.get(f"{isp_id}::{keyword}::{occurrence}")
+                        if metadata is not None:
+                            row['metadata'] = metadata
+                        yield (json.dumps(row, ensure_ascii=False) + "\n").encode('utf-8')
+
+        self._write_entry(prefix + "classifications.jsonl", rows())
+
+        entry = {
+            'id': isp_id,
+            'name': isp.get('name'),
+            'keywords': list(analysis_results.keys()),
+            'analyzed_keywords': sorted(analyzed_keywords),
+            'extra': {k: v for k, v in isp.items()
+                      if k not in ('name', 'text', 'analysis_results', 'hydrated', 'summary')},
+            'counts': counts
+        }
+        self.isps.append(entry)
+
+    def close(self) -> None:
+        manifest = {
+            'format': ARCHIVE_FORMAT,
+            'version': ARCHIVE_VERSION,
+            'created': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'state': self.state,
+            'isps': self.isps,
+            'files': self.files
+        }
+        self.zip.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1))
+        self.zip.close()
+
+    def __enter__(self) -> 'ProjectArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.zip.close()
+
+
+class ProjectArchiveReader:
+    """Read a project archive from a seekable binary file, one ISP at a time."""
+
+    def __init__(self, fileobj: BinaryIO):
+        try:
+            self.zip = zipfile.ZipFile(fileobj)
+            with self.zip.open(MANIFEST_NAME) as f:
+                self.manifest = json.load(f)
+        except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as e:
+            raise ArchiveError(f"Not a project archive: {e}") from e
+        if self.manifest.get('format') != ARCHIVE_FORMAT:
+            raise ArchiveError("Not a project archive: unknown format.")
+        if self.manifest.get('version', 0) > ARCHIVE_VERSION:
+            raise ArchiveError(f"Archive version {self.manifest['version']} is newer than this app supports.")
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        return self.manifest.get('state', {})
+
+    @property
+    def isps(self) -> List[Dict[str, Any]]:
+        """Manifest entries of the ISPs in the archive: id, name, keywords and AA/OI counts."""
+        return self.manifest.get('isps', [])
+
+    def verify(self) -> List[str]:
+        """Check every entry against the size and SHA-256 in the manifest; return a list of problems."""
+        problems = []
+        for name, expected in self.manifest.get('files', {}).items():
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with self.zip.open(name) as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        size += len(chunk)
+            except KeyError:
+                problems.append(f"{name}: missing")
+                continue
+            except (zipfile.BadZipFile, OSError) as e:
+                problems.append(f"{name}: unreadable ({e})")
+                continue
+            if size != expected.get('size') or digest.hexdigest() != expected.get('sha256'):
+                problems.append(f"{name}: content does not match the manifest")
+        return problems
+
+    def _entry(self, isp_id: int) -> Dict[str, Any]:
+        for entry in self.isps:
+            if entry['id'] == isp_id:
+                return entry
+        raise ArchiveError(f"ISP {isp_id} is not in the archive.")
+
+    def iter_classifications(self, isp_id: int) -> Iterator[Dict[str, Any]]:
+        """Stream the classification rows (keyword, label, occurrence and optional metadata) of an ISP."""
+        self._entry(isp_id)
+        with self.zip.open(f"isps/{isp_id}/classifications.jsonl") as f:
+            for line in io.TextIOWrapper(f, encoding="utf-8"):
+                if line.strip():
+                    yield json.loads(line)
+
+    def read_isp(self, isp_id: int) -> Tuple[Dict[str, Any], List[str], Dict[str, Any]]:
+        """Read one ISP as (isp dict, analyzed keywords, metadata keyed by 'keyword::occurrence')."""
+        entry = self._entry(isp_id)
+        with self.zip.open(f"isps/{isp_id}/text.txt") as f:
+            text = io.TextIOWrapper(f, encoding="utf-8").read()
+        analysis_results = {keyword: {'AA': [], 'OI': []} for keyword in entry['keywords']}
+        metadata = {}
+        for row in self.iter_classifications(isp_id):
+            results = analysis_results.setdefault(row['keyword'], {'AA': [], 'OI': []})
+            results[row['label']].append(row['occurrence'])
+            if 'metadata' in row:
+                metadata[f"{row['keyword']}::{row['occurrence']}"] = row['metadata']
+        isp = {'name': entry['name'], 'text': text, 'analysis_results': analysis_results}
+        isp.update(entry.get('extra', {}))
+        return isp, list(entry.get('analyzed_keywords', [])), metadata
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+def export_session(repository, session_id: int, fileobj: BinaryIO) -> int:
+    """Write a saved session to an archive, loading one ISP at a time. Returns the number of ISPs."""
+    manifest = repository.load_session_manifest(session_id)
+    if manifest is None:
+        raise ArchiveError(f"Session {session_id} not found.")
+    state = {field: manifest.get(field) for field in ('language', 'context_mode', 'selected_model', 'session_name')}
+    with ProjectArchiveWriter(fileobj, state) as writer:
+        for isp_id in sorted(manifest['isps']):
+            loaded = repository.load_isp(session_id, isp_id)
+            writer.add_isp(isp_id, loaded['isp'], loaded['analyzed_keywords'], loaded['classification_metadata'])
+    return len(manifest['isps'])
+
+
+def import_session(repository, reader: ProjectArchiveReader, isp_ids: Optional[List[int]] = None,
+                   session_name: Optional[str] = None) -> Tuple[int, int]:
+    """Save ISPs of an archive as a new session, reading one ISP at a time.
+
+    isp_ids selects ISPs by their id in the archive (all by default); they keep
+    those ids in the new session. repository must offer save_new_session, as
+    SQLiteSessionRepository does. Returns (session id, number of ISPs).
+    """
+    available = [entry['id'] for entry in reader.isps]
+    selected = available if isp_ids is None else list(dict.fromkeys(isp_ids))
+    for isp_id in selected:
+        if isp_id not in available:
+            raise ArchiveError(f"ISP {isp_id} is not in the archive.")
+    state = {field: reader.state.get(field) for field in ('language', 'context_mode', 'selected_model')}
+    state.update({
+        'session_name': session_name or reader.state.get('session_name'),
+        'current_isp_id': selected[0] if selected else None,
+        'next_isp_id': max(selected, default=0) + 1
+    })
+
+    def read_isps():
+        for isp_id in selected:
+            isp, analyzed_keywords, metadata = reader.read_isp(isp_id)
+            yield isp_id, isp, analyzed_keywords, metadata
+
+    session_id, _ = repository.save_new_session(state, read_isps)
+    return session_id, len(selected)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export, verify and import project archives.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write a saved session to an archive")
+    export_parser.add_argument("session_id", type=int)
+    export_parser.add_argument("archive")
+    export_parser.add_argument("--db", default="session_state.db", help="session database (default: %(default)s)")
+    verify_parser = commands.add_parser("verify", help="check an archive against its manifest hashes")
+    verify_parser.add_argument("archive")
+    import_parser = commands.add_parser("import", help="save ISPs of a verified archive as a new session")
+    import_parser.add_argument("archive")
+    import_parser.add_argument("--isp", type=int, action="append", dest="isp_ids",
+                               help="id of an ISP in the archive to import; repeat for several (default: all)")
+    import_parser.add_argument("--name", help="name of the new session (default: the archived session's name)")
+    import_parser.add_argument("--db", default="session_state.db", help="session database (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        from src.data.session_store import SQLiteSessionRepository
+        repository = SQLiteSessionRepository(args.db)
+        repository.initialize()
+        with open(args.archive, "wb") as f:
+            count = export_session(repository, args.session_id, f)
+        print(f"Exported {count} ISPs from session {args.session_id} to {args.archive}")
+        return 0
+
+    with open(args.archive, "rb") as f:
+        reader = ProjectArchiveReader(f)
+        problems = reader.verify()
+        if args.command == "import" and not problems:
+            from src.data.session_store import SQLiteSessionRepository
+            repository = SQLiteSessionRepository(args.db)
+            repository.initialize()
+            try:
+                session_id, count = import_session(repository, reader, args.isp_ids, args.name)
+            except ArchiveError as e:
+                print(e, file=sys.stderr)
+                return 1
+            print(f"Imported {count} ISPs from {args.archive} as session {session_id}")
+            return 0
+    for problem in problems:
+        print(problem)
+    print(f"{len(reader.isps)} ISPs, {'OK' if not problems else f'{len(problems)} problem(s)'}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
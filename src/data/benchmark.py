@@ -0,0 +1,111 @@
+"""
+Compare save and load times of the session backends on a synthetic project.
+
+Run with: python -m src.data.benchmark --isps 200 --occurrences 400
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from typing import Callable, Dict, Any, List, Tuple
+from src.data.repository import SessionRepository
+from src.data.session_store import SQLiteSessionRepository
+from src.data.file_store import FileSessionRepository
+
+KEYWORDS = ["Must", "Must not", "Required", "Never", "Only", "Should", "Allowed"]
+
+
+def make_session(isp_count: int, occurrences_per_isp: int, seed: int = 0) -> Dict[str, Any]:
+    """Build a session with isp_count ISPs of about occurrences_per_isp classified occurrences each."""
+    rng = random.Random(seed)
+    isps = {}
+    metadata = {}
+    analyzed_keywords = {}
+    per_keyword = max(1, occurrences_per_isp // len(KEYWORDS))
+    for isp_id in range(1, isp_count + 1):
+        analysis_results = {}
+        for keyword in KEYWORDS:
+            results = {'AA': [], 'OI': []}
+            for i in range(per_keyword):
+                sentence = f"ISP {isp_id} sentence {i}: staff {keyword.lower()} follow rule {rng.randint(0, 10 ** 6)}."
+                occurrence = f"{sentence}::{i}::{i + len(keyword)}"
+                label = "AA" if rng.random() < 0.6 else "OI"
+                results[label].append(occurrence)
+                if rng.random() < 0.5:
+                    metadata[f"{isp_id}::{keyword}::{occurrence}"] = {'method': 'AI', 'rationale': "Synthetic rationale."}
+            analysis_results[keyword] = results
+        isps[isp_id] = {
+            'name': f"ISP {isp_id}",
+            'text': " ".join(f"Policy paragraph {isp_id}-{i}." for i in range(2000)),
+            'analysis_results': analysis_results
+        }
+        analyzed_keywords[str(isp_id)] = list(KEYWORDS)
+    return {
+        'isps': isps,
+        'current_isp_id': 1,
+        'next_isp_id': isp_count + 1,
+        'analyzed_keywords': analyzed_keywords,
+        'language': 'English',
+        'context_mode': 'normal',
+        'classification_metadata': metadata,
+        'selected_model': None
+    }
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(repository: SessionRepository, session_data: Dict[str, Any], repeat: int) -> Dict[str, float]:
+    """Best-of-repeat seconds for a full save, full load, manifest load and single-ISP load."""
+    repository.initialize()
+    session_id, _ = repository.save_session(session_data)
+    results = {
+        'save': _timed(lambda: repository.save_session(session_data), repeat),
+        'load': _timed(lambda: repository.load_session(session_id), repeat),
+        'load manifest': _timed(lambda: repository.load_session_manifest(session_id), repeat),
+        'load one ISP': _timed(lambda: repository.load_isp(session_id, 1), repeat)
+    }
+    if isinstance(repository, SQLiteSessionRepository):
+        # The SQLite repository caches resolved sessions; time cold loads as well.
+        def cold_load():
+            SQLiteSessionRepository._resolved_cache.clear()
+            repository.load_session(session_id)
+        results['load (cold cache)'] = _timed(cold_load, repeat)
+    return results
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--isps", type=int, default=100, help="number of ISPs in the session")
+    parser.add_argument("--occurrences", type=int, default=300, help="classified occurrences per ISP")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args(argv)
+
+    session_data = make_session(args.isps, args.occurrences)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: List[Tuple[str, SessionRepository]] = [
+            ("sqlite", SQLiteSessionRepository(os.path.join(tmp, "bench.db"))),
+            ("files", FileSessionRepository(os.path.join(tmp, "sessions")))
+        ]
+        results = {name: benchmark(repository, session_data, args.repeat) for name, repository in backends}
+
+    print(f"{args.isps} ISPs x ~{args.occurrences} occurrences, best of {args.repeat}")
+    operations = list(dict.fromkeys(op for timings in results.values() for op in timings))
+    print(f"{'operation':<20}" + "".join(f"{name:>12}" for name, _ in backends))
+    for operation in operations:
+        row = "".join(
+            f"{results[name][operation] * 1000:>10.1f}ms" if operation in results[name] else f"{'-':>12}"
+            for name, _ in backends
+        )
+        print(f"{operation:<20}{row}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import lzma
+import zlib
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+class BlobStore:
+    """Content-addressed, compressed storage for large values such as ISP texts.
+
+    Values are keyed by the SHA-1 of their uncompressed content, so identical
+    texts are stored once no matter how many ISPs or sessions use them. Each blob
+    records its codec, so the codec and level can be changed at any time without
+    rewriting existing blobs. Decompressed values are kept in a small LRU bounded
+    by size, since blobs never change once written.
+    """
+
+    CODECS = ("zlib", "lzma", "none")
+    DEFAULT_CODEC = "zlib"
+    DEFAULT_LEVEL = 6
+
+    ENV_CODEC = "ISP_ANALYZER_BLOB_CODEC"
+    ENV_LEVEL = "ISP_ANALYZER_BLOB_LEVEL"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    """
+
+    def __init__(self, codec: Optional[str] = None, level: Optional[int] = None, cache_bytes: int = 64 * 1024 * 1024):
+        codec = (codec or os.environ.get(self.ENV_CODEC) or self.DEFAULT_CODEC).lower()
+        if codec not in self.CODECS:
+            raise ValueError(f"Unknown blob codec: {codec}. Use one of {', '.join(self.CODECS)}.")
+        self.codec = codec
+        self.level = int(level if level is not None else os.environ.get(self.ENV_LEVEL) or self.DEFAULT_LEVEL)
+        self.cache_bytes = cache_bytes
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash(value: str) -> str:
+        """Content address of a value."""
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    def initialize(self, conn: sqlite3.Connection) -> None:
+        conn.execute(self._SCHEMA)
+
+    def _compress(self, raw: bytes):
+        if self.codec == "zlib":
+            return "zlib", zlib.compress(raw, self.level)
+        if self.codec == "lzma":
+            return "lzma", lzma.compress(raw, preset=self.level)
+        return "none", raw
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zlib":
+            return zlib.decompress(data)
+        if codec == "lzma":
+            return lzma.decompress(data)
+        return bytes(data)
+
+    def put(self, conn: sqlite3.Connection, value: str, value_hash: Optional[str] = None) -> str:
+        """Store a value unless a blob with the same content exists, and return its hash."""
+        value_hash = value_hash or self.hash(value)
+        if conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (value_hash,)).fetchone() is None:
+            raw = value.encode('utf-8')
+            codec, data = self._compress(raw)
+            if len(data) >= len(raw):
+                codec, data = "none", raw
+            conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+                (value_hash, codec, len(raw), data)
+            )
+        return value_hash
+
+    def get_many(self, conn: sqlite3.Connection, hashes: Iterable[str]) -> Dict[str, str]:
+        """Fetch and decompress the given blobs, serving repeats from the cache."""
+        values = {}
+        missing = []
+        with self._lock:
+            for value_hash in set(hashes):
+                if value_hash is None:
+                    continue
+                if value_hash in self._cache:
+                    self._cache.move_to_end(value_hash)
+                    values[value_hash] = self._cache[value_hash]
+                else:
+                    missing.append(value_hash)
+
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for value_hash, codec, data in conn.execute(
+                f"SELECT hash, codec, data FROM blobs WHERE hash IN ({placeholders})", chunk
+            ):
+                value = self._decompress(codec, data).decode('utf-8')
+                values[value_hash] = value
+                self._cache_put(value_hash, value)
+        return values
+
+    def _cache_put(self, value_hash: str, value: str) -> None:
+        size = len(value)
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if value_hash in self._cache:
+                return
+            self._cache[value_hash] = value
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+
+    def migrate_table(self, conn: sqlite3.Connection, table: str, hash_column: str, value_column: str) -> int:
+        """Move rows of an older uncompressed (hash, value) table into the blob table and drop it."""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if exists is None:
+            return 0
+        moved = 0
+        for value_hash, value in conn.execute(f"SELECT {hash_column}, {value_column} FROM {table}").fetchall():
+            self.put(conn, value, value_hash)
+            moved += 1
+        conn.execute(f"DROP TABLE {table}")
+        return moved
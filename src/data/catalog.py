@@ -0,0 +1,132 @@
+import re
+import sqlite3
+from typing import Dict, List, Tuple, Any, Optional
+
+class SessionCatalog:
+    """Searchable summary of every saved session, maintained at save time.
+
+    One row per session holds its name, ISP names, counts, language, model and
+    size, so the session list can be searched and paginated without resolving
+    any session. Search uses an FTS5 index with prefix matching when SQLite is
+    built with FTS5, and falls back to LIKE otherwise.
+    """
+
+    COLUMNS = ('session_id', 'name', 'timestamp', 'isp_count', 'classified_count',
+               'language', 'model', 'byte_size', 'isp_names')
+
+    _SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS session_catalog (
+            session_id INTEGER PRIMARY KEY,
+            name TEXT,
+            timestamp TEXT,
+            isp_count INTEGER NOT NULL DEFAULT 0,
+            classified_count INTEGER NOT NULL DEFAULT 0,
+            language TEXT,
+            model TEXT,
+            byte_size INTEGER NOT NULL DEFAULT 0,
+            isp_names TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_catalog_name ON session_catalog (name COLLATE NOCASE)"
+    ]
+
+    _FTS_SCHEMA = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS session_catalog_fts USING fts5(
+            name, isp_names, language, model,
+            content='session_catalog', content_rowid='session_id'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS session_catalog_ai AFTER INSERT ON session_catalog BEGIN
+            INSERT INTO session_catalog_fts (rowid, name, isp_names, language, model)
+            VALUES (new.session_id, new.name, new.isp_names, new.language, new.model);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS session_catalog_ad AFTER DELETE ON session_catalog BEGIN
+            INSERT INTO session_catalog_fts (session_catalog_fts, rowid, name, isp_names, language, model)
+            VALUES ('delete', old.session_id, old.name, old.isp_names, old.language, old.model);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS session_catalog_au AFTER UPDATE ON session_catalog BEGIN
+            INSERT INTO session_catalog_fts (session_catalog_fts, rowid, name, isp_names, language, model)
+            VALUES ('delete', old.session_id, old.name, old.isp_names, old.language, old.model);
+            INSERT INTO session_catalog_fts (rowid, name, isp_names, language, model)
+            VALUES (new.session_id, new.name, new.isp_names, new.language, new.model);
+        END
+        """
+    ]
+
+    def __init__(self):
+        self.fts_enabled = False
+
+    def initialize(self, conn: sqlite3.Connection) -> None:
+        for statement in self._SCHEMA:
+            conn.execute(statement)
+        try:
+            conn.execute("SAVEPOINT catalog_fts")
+            fts_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'session_catalog_fts'"
+            ).fetchone() is not None
+            for statement in self._FTS_SCHEMA:
+                conn.execute(statement)
+            if not fts_exists:
+                conn.execute("INSERT INTO session_catalog_fts (session_catalog_fts) VALUES ('rebuild')")
+            conn.execute("RELEASE catalog_fts")
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE.
+            conn.execute("ROLLBACK TO catalog_fts")
+            conn.execute("RELEASE catalog_fts")
+
+    def missing_session_ids(self, conn: sqlite3.Connection) -> List[int]:
+        """Sessions saved before the catalog existed."""
+        return [row[0] for row in conn.execute(
+            "SELECT id FROM sessions WHERE id NOT IN (SELECT session_id FROM session_catalog) ORDER BY id"
+        )]
+
+    def record(self, conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
+        """Insert or replace the catalog row of a session."""
+        conn.execute(
+            f"INSERT OR REPLACE INTO session_catalog ({', '.join(self.COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            tuple(entry.get(column) for column in self.COLUMNS)
+        )
+
+    def remove(self, conn: sqlite3.Connection, session_id: int) -> None:
+        conn.execute("DELETE FROM session_catalog WHERE session_id = ?", (session_id,))
+
+    def search(self, conn: sqlite3.Connection, query: str = "", limit: int = 20,
+               offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Return one page of catalog entries matching query, newest first, and the total match count."""
+        columns = ", ".join(f"c.{column}" for column in self.COLUMNS)
+        terms = re.findall(r"\w+", query or "")
+        if not terms:
+            where, params = "", ()
+        elif self.fts_enabled:
+            match = " ".join(f'"{term}"*' for term in terms)
+            where = "WHERE c.session_id IN (SELECT rowid FROM session_catalog_fts WHERE session_catalog_fts MATCH ?)"
+            params = (match,)
+        else:
+            clauses = []
+            params = ()
+            for term in terms:
+                clauses.append("(c.name LIKE ? OR c.isp_names LIKE ? OR c.language LIKE ? OR c.model LIKE ?)")
+                params += (f"%{term}%",) * 4
+            where = "WHERE " + " AND ".join(clauses)
+
+        total = conn.execute(f"SELECT COUNT(*) FROM session_catalog c {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {columns} FROM session_catalog c {where} ORDER BY c.session_id DESC LIMIT ? OFFSET ?",
+            params + (limit, offset)
+        ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows], total
+
+    def get(self, conn: sqlite3.Connection, session_id: int) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM session_catalog WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
@@ -0,0 +1,179 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Callable, Any, Iterator
+
+class SQLiteConnectionManager:
+    """Pooled SQLite connections in WAL mode with busy retries and explicit transactions.
+
+    A thread checks a connection out of the pool for the duration of a `connection()`
+    or `transaction()` block; nested blocks on the same thread reuse it, so a whole
+    unit of work runs on one connection and benefits from its prepared statement
+    cache. Connections run in autocommit mode; writes go through `transaction()`,
+    which takes the write lock up front with BEGIN IMMEDIATE.
+
+    WAL mode lets readers (such as listing sessions) proceed while another analyst
+    is saving. Writers that still find the database locked after `busy_timeout`
+    are retried by `run()` with exponential backoff.
+    """
+
+    _managers: Dict[str, 'SQLiteConnectionManager'] = {}
+    _managers_lock = threading.Lock()
+
+    def __init__(self, database_file: str, synchronous: str = "NORMAL", cache_size_kib: int = 16384,
+                 busy_timeout: float = 5.0, pool_size: int = 8, cached_statements: int = 256,
+                 max_retries: int = 5, retry_backoff: float = 0.05):
+        self.database_file = database_file
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout = busy_timeout
+        self.pool_size = pool_size
+        self.cached_statements = cached_statements
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wal_enabled = False
+
+    @classmethod
+    def for_database(cls, database_file: str, **options) -> 'SQLiteConnectionManager':
+        """Get the process-wide manager for a database file, creating it on first use."""
+        key = os.path.abspath(database_file)
+        with cls._managers_lock:
+            manager = cls._managers.get(key)
+            if manager is None:
+                manager = cls(database_file, **options)
+                cls._managers[key] = manager
+            return manager
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database_file,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        if not self._wal_enabled:
+            # The journal mode is persistent, so it only has to be switched once per database.
+            self._with_retry(lambda: conn.execute("PRAGMA journal_mode=WAL").fetchone())
+            self._wal_enabled = True
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+
+    def _checkin(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow this thread's connection, checking one out of the pool if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    @contextmanager
+    def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """Run a block in a transaction, committing on success and rolling back on error.
+
+        With immediate=False the transaction only reads from a consistent snapshot and
+        does not block writers. Nested transactions on the same thread become savepoints.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                depth = getattr(self._local, 'depth', 0)
+                savepoint = f"sp_{depth}"
+                self._local.depth = depth + 1
+                conn.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                    raise
+                else:
+                    conn.execute(f"RELEASE {savepoint}")
+                finally:
+                    self._local.depth -= 1
+                return
+
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any], write: bool = False) -> Any:
+        """Call fn(conn) in a write (or read) transaction, retrying while the database is busy.
+
+        Inside an enclosing connection or transaction block the call is not retried
+        on its own; the outermost unit of work is the one that can be repeated.
+        """
+        if getattr(self._local, 'conn', None) is not None:
+            return self._call(fn, write)
+        return self._with_retry(lambda: self._call(fn, write))
+
+    def _call(self, fn: Callable[[sqlite3.Connection], Any], write: bool) -> Any:
+        with self.transaction(immediate=write) as conn:
+            return fn(conn)
+
+    def _with_retry(self, fn: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except sqlite3.OperationalError as e:
+                if attempt == self.max_retries or not self._is_busy(e):
+                    raise
+                time.sleep(self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    @staticmethod
+    def _is_busy(error: sqlite3.OperationalError) -> bool:
+        message = str(error).lower()
+        return "locked" in message or "busy" in message
+
+    def vacuum(self) -> None:
+        """Rebuild the database file to return free pages to the file system.
+
+        VACUUM cannot run inside a transaction, so it runs on its own connection
+        and is retried while other connections hold locks.
+        """
+        with self.connection() as conn:
+            self._with_retry(lambda: conn.execute("VACUUM"))
+            self._with_retry(lambda: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone())
+
+    def close_all(self) -> None:
+        """Close the idle connections in the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
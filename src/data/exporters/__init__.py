@@ -1,6 +1,20 @@
 """
 Export functionality for the ISP Keyword Analyzer.
 """
-from src.data.exporters.excel import ExcelExporter
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
 
-__all__ = ['ExcelExporter']
\ No newline at end of file
+if TYPE_CHECKING:
+    from src.data.exporters.excel import ExcelExporter
+    from src.data.exporters.occurrences import iter_occurrences
+    from src.data.exporters.tabular import TabularExporter, ParquetExporter, CsvExporter, JsonlExporter
+
+__all__ = ['ExcelExporter', 'iter_occurrences', 'TabularExporter', 'ParquetExporter', 'CsvExporter',
+           'JsonlExporter']
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.data.exporters.excel': ['ExcelExporter'],
+    'src.data.exporters.occurrences': ['iter_occurrences'],
+    'src.data.exporters.tabular': ['TabularExporter', 'ParquetExporter', 'CsvExporter', 'JsonlExporter']
+})
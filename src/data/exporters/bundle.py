@@ -0,0 +1,152 @@
+"""
+Bundles of per-ISP Excel workbooks, generated in parallel and zipped as they finish.
+
+Command line use:
+
+    python -m src.data.exporters.bundle <session id> bundle.zip [--db session_state.db] [--workers N]
+"""
+import os
+import re
+import sys
+import shutil
+import zipfile
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Any, BinaryIO, Callable, Iterable, Optional, Tuple
+from src.data.exporters.excel import ExcelExporter
+
+# One ISP to export: (ISP id, ISP dict, classification metadata of the ISP keyed like the session's).
+BundleItem = Tuple[int, Dict[str, Any], Dict[str, Any]]
+
+
+def _write_isp_workbook(isp_id: int, isp: Dict[str, Any], classification_metadata: Dict[str, Any],
+                        language: str, path: str) -> Tuple[int, str]:
+    """Write the workbook of one ISP; runs in a worker process."""
+    ExcelExporter({isp_id: isp}, language, classification_metadata).write_excel(path)
+    return isp_id, path
+
+
+class WorkbookBundleExporter:
+    """Write one Excel workbook per ISP into a ZIP.
+
+    Workbooks are generated concurrently in a pool of worker processes (started
+    with "spawn", which is safe in the multi-threaded Streamlit server). At most
+    two ISPs per worker are handed to the pool at a time, so ISPs can be loaded
+    lazily from the session store, and each finished workbook is copied into the
+    ZIP and deleted right away. With one worker, workbooks are written in-process.
+    """
+
+    ENV_WORKERS = "ISP_ANALYZER_EXPORT_WORKERS"
+
+    def __init__(self, language: str, max_workers: Optional[int] = None):
+        self.language = language
+        self.max_workers = max(1, int(max_workers or os.environ.get(self.ENV_WORKERS) or os.cpu_count() or 1))
+
+    @staticmethod
+    def file_name(isp_id: int, isp: Dict[str, Any]) -> str:
+        name = re.sub(r'[^\w\-]+', '_', str(isp.get('name') or f"ISP {isp_id}")).strip('_')[:60]
+        return f"{isp_id:03d}_{name or 'ISP'}.xlsx"
+
+    @staticmethod
+    def items_from_session(isps: Dict[int, Dict[str, Any]],
+                           classification_metadata: Dict[str, Any]) -> List[BundleItem]:
+        """Split the session's classification metadata by ISP, in one pass, into bundle items."""
+        by_isp: Dict[int, Dict[str, Any]] = {isp_id: {} for isp_id in isps}
+        for key, value in classification_metadata.items():
+            isp_part = key.split("::", 1)[0]
+            if isp_part.isdigit() and int(isp_part) in by_isp:
+                by_isp[int(isp_part)][key] = value
+        return [(isp_id, isps[isp_id], by_isp[isp_id]) for isp_id in sorted(isps)]
+
+    def write_zip(self, fileobj: BinaryIO, items: Iterable[BundleItem], total: int,
+                  progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Write a workbook for every item into a ZIP; progress(done, total) is called after each one.
+
+        Returns the number of workbooks written.
+        """
+        directory = tempfile.mkdtemp(prefix="isp-bundle-")
+        done = 0
+        try:
+            with zipfile.ZipFile(fileobj, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                def add(isp_id: int, path: str, name: str) -> None:
+                    nonlocal done
+                    with open(path, "rb") as workbook, archive.open(name, mode="w", force_zip64=True) as entry:
+                        shutil.copyfileobj(workbook, entry)
+                    os.remove(path)
+                    done += 1
+                    if progress is not None:
+                        progress(done, total)
+
+                if self.max_workers == 1:
+                    for isp_id, isp, metadata in items:
+                        path = os.path.join(directory, f"{isp_id}.xlsx")
+                        _write_isp_workbook(isp_id, isp, metadata, self.language, path)
+                        add(isp_id, path, self.file_name(isp_id, isp))
+                    return done
+
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as pool:
+                    pending = {}
+                    for isp_id, isp, metadata in items:
+                        path = os.path.join(directory, f"{isp_id}.xlsx")
+                        future = pool.submit(_write_isp_workbook, isp_id, isp, metadata, self.language, path)
+                        pending[future] = self.file_name(isp_id, isp)
+                        while len(pending) >= 2 * self.max_workers:
+                            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            for finished_future in finished:
+                                add(*finished_future.result(), pending.pop(finished_future))
+                    while pending:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for finished_future in finished:
+                            add(*finished_future.result(), pending.pop(finished_future))
+            return done
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def export_session_bundle(repository, session_id: int, fileobj: BinaryIO, max_workers: Optional[int] = None,
+                          progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Write the per-ISP workbooks of a saved session, loading one ISP at a time. Returns the number written."""
+    manifest = repository.load_session_manifest(session_id)
+    if manifest is None:
+        raise ValueError(f"Session {session_id} not found.")
+    isp_ids = sorted(manifest['isps'])
+
+    def items():
+        for isp_id in isp_ids:
+            loaded = repository.load_isp(session_id, isp_id)
+            yield isp_id, loaded['isp'], loaded['classification_metadata']
+
+    exporter = WorkbookBundleExporter(manifest.get('language') or "English", max_workers)
+    return exporter.write_zip(fileobj, items(), len(isp_ids), progress)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export one Excel workbook per ISP of a saved session as a ZIP.")
+    parser.add_argument("session_id", type=int)
+    parser.add_argument("bundle")
+    parser.add_argument("--db", default="session_state.db", help="session database (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    from src.data.session_store import SQLiteSessionRepository
+    repository = SQLiteSessionRepository(args.db)
+    repository.initialize()
+
+    def progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total} workbooks", end="", file=sys.stderr, flush=True)
+
+    if repository.load_session_manifest(args.session_id) is None:
+        print(f"Session {args.session_id} not found.", file=sys.stderr)
+        return 1
+    with open(args.bundle, "wb") as f:
+        count = export_session_bundle(repository, args.session_id, f, args.workers, progress)
+    print(file=sys.stderr)
+    print(f"Exported {count} workbooks from session {args.session_id} to {args.bundle}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,60 @@
 import pandas as pd
-import base64
-import datetime
-from io import BytesIO
+import xlsxwriter
 from typing import Dict, List, Any
-from src.domain.metrics import MetricsCalculator
+from src.domain.metrics import MetricsCalculator, MetricsAggregate
+from src.domain.intervals import LossIntervals
+from src.domain.corpus import OccurrenceTable
+from src.domain.agreement import AgreementAnalyzer
+from src.data.exporters.occurrences import iter_occurrences
 from src.config.settings import KeywordSets
 
 class ExcelExporter:
     """Responsible for exporting analysis results to Excel format."""
     
-    def __init__(self, isps: Dict[int, Dict[str, Any]], language: str, classification_metadata: Dict = None):
-        """Initialize the exporter with ISP data and language."""
+    MAX_SHEET_ROWS = 1048576
+    
+    def __init__(self, isps: Dict[int, Dict[str, Any]], language: str, classification_metadata: Dict = None,
+                 metrics: MetricsAggregate = None, occurrence_table: OccurrenceTable = None):
+        """Initialize the exporter with ISP data and language.
+        
+        When the session's MetricsAggregate is given, its counters are used instead
+        of counting the classifications of every ISP again; likewise the session's
+        OccurrenceTable is used for the agreement worksheet when given.
+        """
         self.isps = isps
         self.language = language
         self.keywords = KeywordSets.get_keywords(language)
-        self.all_metrics = MetricsCalculator.calculate_all_metrics(isps, self.keywords)
+        if metrics is not None:
+            self.all_metrics = metrics.all_metrics(self.keywords)
+        else:
+            self.all_metrics = MetricsCalculator.calculate_all_metrics(isps, self.keywords)
+        self.metrics = metrics
         self.sorted_isps = sorted(isps.items(), key=lambda x: x[0])
         self.isp_ids = [isp_id for isp_id, _ in self.sorted_isps]
         self.classification_metadata = classification_metadata or {}
+        self.occurrence_table = occurrence_table
     
-    def generate_excel(self) -> BytesIO:
-        """Generate an Excel file with the analysis results."""
-        output = BytesIO()
+    def write_excel(self, path: str) -> None:
+        """Write an Excel file with the analysis results to path.
         
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            workbook = writer.book
+        The workbook is written in XlsxWriter's constant_memory mode, which flushes
+        each row to a temporary file once the next row is started, so memory use does
+        not grow with the number of raw data rows. Every worksheet is therefore
+        written strictly row by row.
+        """
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        try:
             title_format = workbook.add_format({'bold': True})
             
             self._create_total_loss_worksheet(workbook, title_format)
             self._create_aa_keywords_worksheet(workbook, title_format)
             self._create_oi_keywords_worksheet(workbook, title_format)
             self._create_keyword_loss_worksheet(workbook, title_format)
+            self._create_intervals_worksheet(workbook, title_format)
+            self._create_agreement_worksheet(workbook, title_format)
             self._create_raw_data_worksheet(workbook, title_format)
-            
-        return output
+        finally:
+            workbook.close()
     
     def _create_total_loss_worksheet(self, workbook, title_format):
         """Create the total keyword loss of specificity worksheet."""
@@ -158,6 +179,7 @@ class ExcelExporter:
             
         row = 2
         valid_metrics = {kw: [] for kw in self.keywords}
+        integer_format = workbook.add_format({'num_format': '0'})
         
         for isp_id in self.isp_ids:
             metrics = self.all_metrics.get(isp_id)
@@ -166,7 +188,7 @@ class ExcelExporter:
                 for col, kw in enumerate(self.keywords.keys(), start=1):
                     loss = metrics['keyword_loss_specificity'].get(kw)
                     if loss is not None:
-                        worksheet.write(row, col, loss, workbook.add_format({'num_format': '0'}))
+                        worksheet.write(row, col, loss, integer_format)
                         valid_metrics[kw].append(loss)
                     else:
                         worksheet.write(row, col, '-')
@@ -184,95 +206,107 @@ class ExcelExporter:
             total = aa_sum + oi_sum
             if total > 0:
                 loss_specificity = (oi_sum / total) * 100
-                worksheet.write(row, col, loss_specificity, workbook.add_format({'num_format': '0'}))
+                worksheet.write(row, col, loss_specificity, integer_format)
             else:
                 worksheet.write(row, col, '-')
                 
         row += 1
         worksheet.write(row, 0, 'Note: *Calculated using the sums in Tables 2 and 3')
     
+    def _create_intervals_worksheet(self, workbook, title_format):
+        """Create the keyword loss of specificity worksheet with Wilson and bootstrap confidence intervals."""
+        intervals = LossIntervals()
+        metrics = self.metrics if self.metrics is not None else MetricsAggregate.from_isps(self.isps)
+        frame = intervals.for_metrics(metrics, self.keywords)
+        frame = frame[frame['Total'] > 0]
+
+        worksheet = workbook.add_worksheet('Table 5')
+        worksheet.write(0, 0, f'Table 5. Keyword loss of specificity with {intervals.label} confidence intervals',
+                        title_format)
+        headers = ['ISP', 'Keyword', 'Actionable advice', 'Other information', 'Total',
+                   'Loss of specificity (%)'] + list(LossIntervals.COLUMNS)
+
+        for col, header in enumerate(headers):
+            worksheet.write(1, col, header)
+
+        percent_format = workbook.add_format({'num_format': '0.0'})
+        columns = ['ISP', 'Keyword', 'AA', 'OI', 'Total', 'Loss of specificity (%)'] + list(LossIntervals.COLUMNS)
+        row = 2
+        for values in frame[columns].itertuples(index=False):
+            for col, value in enumerate(values):
+                if col >= 5:
+                    worksheet.write_number(row, col, value, percent_format)
+                elif col >= 2:
+                    worksheet.write_number(row, col, int(value))
+                else:
+                    worksheet.write(row, col, value)
+            row += 1
+
+        worksheet.write(row, 0, f'Note: Bootstrap intervals use {intervals.resamples} resamples '
+                                f'with seed {intervals.seed}')
+
+    def _create_agreement_worksheet(self, workbook, title_format):
+        """Create the worksheet comparing AI labels with the reviewed labels per keyword."""
+        table = self.occurrence_table
+        if table is None:
+            table = OccurrenceTable.from_session(self.isps, self.classification_metadata)
+        analyzer = AgreementAnalyzer()
+        agreement = analyzer.by_keyword(table)
+
+        worksheet = workbook.add_worksheet('Agreement')
+        worksheet.write(0, 0, 'Agreement between AI labels and reviewed labels', title_format)
+        for col, header in enumerate(AgreementAnalyzer.COLUMNS):
+            worksheet.write(1, col, header)
+
+        percent_format = workbook.add_format({'num_format': '0.0'})
+        kappa_format = workbook.add_format({'num_format': '0.000'})
+        row = 2
+        for values in agreement[list(AgreementAnalyzer.COLUMNS)].itertuples(index=False):
+            worksheet.write(row, 0, values[0])
+            for col in range(1, 6):
+                worksheet.write_number(row, col, int(values[col]))
+            for col in range(6, 10):
+                if pd.notna(values[col]):
+                    worksheet.write_number(row, col, values[col], kappa_format if col == 9 else percent_format)
+                else:
+                    worksheet.write(row, col, '-')
+            row += 1
+
+        row += 1
+        worksheet.write(row, 0, 'Confusion matrix, all keywords', title_format)
+        matrix = analyzer.confusion_matrix(table)
+        for col, header in enumerate(matrix.columns, start=1):
+            worksheet.write(row + 1, col, header)
+        for offset, (label, counts) in enumerate(matrix.iterrows(), start=2):
+            worksheet.write(row + offset, 0, label)
+            for col, count in enumerate(counts, start=1):
+                worksheet.write_number(row + offset, col, int(count))
+
     def _create_raw_data_worksheet(self, workbook, title_format):
-        """Create the raw data worksheet with all occurrences."""
-        worksheet = workbook.add_worksheet('Raw Data')
+        """Create the raw data worksheet with all occurrences, one row per occurrence.
+        
+        A worksheet holds at most MAX_SHEET_ROWS rows, so occurrences beyond that
+        continue on 'Raw Data (2)', 'Raw Data (3)' and so on, each with the headers.
+        """
         headers = ['ISP ID', 'ISP Name', 'Keyword', 'Classification', 
                 'Sentence', 'Keyword Instance', 'Position', 'Method', 'Rationale']
-        
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header)
+        sheets = 1
+        worksheet = workbook.add_worksheet('Raw Data')
+        worksheet.write_row(0, 0, headers)
             
         row = 1
         
-        for isp_id, isp_data in sorted(self.isps.items(), key=lambda x: x[0]):
-            analysis_results = isp_data.get('analysis_results', {})
-            isp_name = isp_data.get('name', f"ISP {isp_id}")
-            
-            for keyword, data in analysis_results.items():
-                for occurrence in data.get('AA', []):
-                    parts = occurrence.split("::")
-                    if len(parts) >= 3:
-                        sentence = parts[0]
-                        start_pos = int(parts[1])
-                        end_pos = int(parts[2])
-                        keyword_instance = sentence[start_pos:end_pos]
-                        
-                        highlighted_sentence = (
-                            sentence[:start_pos] +
-                            '[' + keyword_instance + ']' +
-                            sentence[end_pos:]
-                        )
-                        
-                        metadata_key = f"{isp_id}::{keyword}::{occurrence}"
-                        metadata = self.classification_metadata.get(metadata_key, {})
-                        method = metadata.get("method", "Manual")
-                        rationale = metadata.get("rationale", "")
-                        
-                        worksheet.write(row, 0, isp_id)
-                        worksheet.write(row, 1, isp_name)
-                        worksheet.write(row, 2, keyword)
-                        worksheet.write(row, 3, 'AA')
-                        worksheet.write(row, 4, highlighted_sentence)
-                        worksheet.write(row, 5, keyword_instance)
-                        worksheet.write(row, 6, f"{start_pos}-{end_pos}")
-                        worksheet.write(row, 7, method)
-                        worksheet.write(row, 8, rationale)
-                        row += 1
-                        
-                for occurrence in data.get('OI', []):
-                    parts = occurrence.split("::")
-                    if len(parts) >= 3:
-                        sentence = parts[0]
-                        start_pos = int(parts[1])
-                        end_pos = int(parts[2])
-                        keyword_instance = sentence[start_pos:end_pos]
-                        
-                        highlighted_sentence = (
-                            sentence[:start_pos] +
-                            '[' + keyword_instance + ']' +
-                            sentence[end_pos:]
-                        )
-                        
-                        metadata_key = f"{isp_id}::{keyword}::{occurrence}"
-                        metadata = self.classification_metadata.get(metadata_key, {})
-                        method = metadata.get("method", "Manual")
-                        rationale = metadata.get("rationale", "")
-                        
-                        worksheet.write(row, 0, isp_id)
-                        worksheet.write(row, 1, isp_name)
-                        worksheet.write(row, 2, keyword)
-                        worksheet.write(row, 3, 'OI')
-                        worksheet.write(row, 4, highlighted_sentence)
-                        worksheet.write(row, 5, keyword_instance)
-                        worksheet.write(row, 6, f"{start_pos}-{end_pos}")
-                        worksheet.write(row, 7, method)
-                        worksheet.write(row, 8, rationale)
-                        row += 1
-    
-    def get_download_link(self) -> str:
-        """Generate a download link for the Excel file."""
-        excel_data = self.generate_excel().getvalue()
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        b64 = base64.b64encode(excel_data).decode()
-        return (
-            f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;'
-            f'base64,{b64}" download="isp_analysis_{timestamp}.xlsx">Download Excel file</a>'
-        )
\ No newline at end of file
+        for (isp_id, isp_name, keyword, classification, sentence, keyword_instance, start_pos, end_pos,
+             method, _, rationale) in iter_occurrences(self.isps, self.classification_metadata):
+            if row == self.MAX_SHEET_ROWS:
+                sheets += 1
+                worksheet = workbook.add_worksheet(f'Raw Data ({sheets})')
+                worksheet.write_row(0, 0, headers)
+                row = 1
+            highlighted_sentence = f"{sentence[:start_pos]}[{keyword_instance}]{sentence[end_pos:]}"
+            if worksheet.write_row(row, 0, (
+                isp_id, isp_name, keyword, classification, highlighted_sentence, keyword_instance,
+                f"{start_pos}-{end_pos}", method, rationale or ""
+            )) == -1:
+                raise ValueError(f"Raw data row {row} could not be written to worksheet '{worksheet.name}'")
+            row += 1
@@ -0,0 +1,41 @@
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+# Column names and types of an occurrence record, in order. Types are the names
+# shared by the tabular exporters: 'int64', 'float64' or 'string' (all nullable).
+OCCURRENCE_SCHEMA: List[Tuple[str, str]] = [
+    ('isp_id', 'int64'),
+    ('isp_name', 'string'),
+    ('keyword', 'string'),
+    ('classification', 'string'),
+    ('sentence', 'string'),
+    ('keyword_instance', 'string'),
+    ('start', 'int64'),
+    ('end', 'int64'),
+    ('method', 'string'),
+    ('model', 'string'),
+    ('rationale', 'string')
+]
+
+OccurrenceRecord = Tuple[int, str, str, str, str, str, int, int, str, Optional[str], Optional[str]]
+
+
+def iter_occurrences(isps: Dict[int, Dict[str, Any]],
+                     classification_metadata: Dict[str, Any]) -> Iterator[OccurrenceRecord]:
+    """Yield one record per classified occurrence, in ISP id order, in the order of OCCURRENCE_SCHEMA.
+
+    Each occurrence string is parsed once. Occurrences without classification
+    metadata have the method "Manual". Malformed occurrences are skipped.
+    """
+    for isp_id, isp_data in sorted(isps.items(), key=lambda x: x[0]):
+        isp_name = isp_data.get('name', f"ISP {isp_id}")
+        for keyword, data in isp_data.get('analysis_results', {}).items():
+            prefix = f"{isp_id}::{keyword}::"
+            for classification in ('AA', 'OI'):
+                for occurrence in data.get(classification, []):
+                    parts = occurrence.rsplit("::", 2)
+                    if len(parts) < 3:
+                        continue
+                    sentence, start, end = parts[0], int(parts[1]), int(parts[2])
+                    metadata = classification_metadata.get(prefix + occurrence) or {}
+                    yield (isp_id, isp_name, keyword, classification, sentence, sentence[start:end], start, end,
+                           metadata.get("method", "Manual"), metadata.get("model"), metadata.get("rationale"))
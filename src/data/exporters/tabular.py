@@ -0,0 +1,188 @@
+"""
+Streaming exports of the analysis as data files for downstream pipelines.
+
+An export has three parts: the raw occurrence table, per-ISP keyword metrics and
+a metadata.json describing the export (format version, language, keywords,
+ISPs and the schema of each table). Tables are written in chunks of rows with a
+fixed schema, so the column names and types do not depend on the data.
+"""
+import io
+import os
+import csv
+import gzip
+import json
+import zipfile
+import datetime
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Dict, List, Any, BinaryIO, Callable, Iterable, Iterator, Tuple
+from src.data.exporters.occurrences import OCCURRENCE_SCHEMA, iter_occurrences
+from src.domain.metrics import MetricsAggregate
+from src.config.settings import KeywordSets
+
+EXPORT_FORMAT = "isp-analyzer-data"
+EXPORT_VERSION = 1
+METADATA_NAME = "metadata.json"
+
+METRICS_SCHEMA: List[Tuple[str, str]] = [
+    ('isp_id', 'int64'),
+    ('isp_name', 'string'),
+    ('keyword', 'string'),
+    ('aa_count', 'int64'),
+    ('oi_count', 'int64'),
+    ('total_count', 'int64'),
+    ('loss_of_specificity', 'float64')
+]
+
+Schema = List[Tuple[str, str]]
+
+
+class TabularExporter(ABC):
+    """Base class of the data file exporters; subclasses write one table to a binary stream."""
+
+    label = ""
+    extension = ""
+    # Whether files are already compressed, so a ZIP should store rather than deflate them.
+    compressed = False
+
+    def __init__(self, isps: Dict[int, Dict[str, Any]], language: str, classification_metadata: Dict = None,
+                 metrics: MetricsAggregate = None, chunk_size: int = 50_000):
+        self.isps = isps
+        self.language = language
+        self.keywords = KeywordSets.get_keywords(language)
+        self.classification_metadata = classification_metadata or {}
+        self.metrics = metrics if metrics is not None else MetricsAggregate.from_isps(isps)
+        self.chunk_size = chunk_size
+
+    @abstractmethod
+    def write_table(self, stream: BinaryIO, schema: Schema, chunks: Iterable[List[tuple]]) -> None:
+        """Write a table given as chunks of row tuples in schema order."""
+        pass
+
+    @staticmethod
+    def get_exporter(export_format: str) -> type:
+        """Factory method to get the exporter class for a format name."""
+        exporters = {'parquet': ParquetExporter, 'csv': CsvExporter, 'jsonl': JsonlExporter}
+        if export_format not in exporters:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        return exporters[export_format]
+
+    def _chunks(self, rows: Iterator[tuple]) -> Iterator[List[tuple]]:
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _metric_rows(self) -> Iterator[tuple]:
+        for isp_id in sorted(self.metrics.counts):
+            isp_name = self.isps.get(isp_id, {}).get('name', f"ISP {isp_id}")
+            counts = self.metrics.counts[isp_id]
+            for keyword in self.keywords:
+                aa, oi = counts.get(keyword, (0, 0))
+                total = aa + oi
+                yield (isp_id, isp_name, keyword, aa, oi, total, oi / total * 100 if total else None)
+
+    def tables(self) -> List[Tuple[str, Schema, Callable[[], Iterator[tuple]]]]:
+        """The tables of the export as (name, schema, function returning the rows)."""
+        return [
+            ('occurrences', OCCURRENCE_SCHEMA, lambda: iter_occurrences(self.isps, self.classification_metadata)),
+            ('isp_metrics', METRICS_SCHEMA, self._metric_rows)
+        ]
+
+    def _counted(self, rows: Iterator[tuple], counts: Dict[str, int], name: str) -> Iterator[tuple]:
+        for row in rows:
+            counts[name] += 1
+            yield row
+
+    def _metadata(self, counts: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            'format': EXPORT_FORMAT,
+            'version': EXPORT_VERSION,
+            'created': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'language': self.language,
+            'keywords': list(self.keywords),
+            'isps': [{'id': isp_id, 'name': isp.get('name'),
+                      'attributes': {k: v for k, v in isp.items()
+                                     if k not in ('name', 'text', 'analysis_results', 'hydrated', 'summary')}}
+                     for isp_id, isp in sorted(self.isps.items(), key=lambda x: x[0])],
+            'tables': {name: {'file': f"{name}.{self.extension}", 'rows': counts[name],
+                              'columns': [{'name': column, 'type': column_type} for column, column_type in schema]}
+                       for name, schema, _ in self.tables()}
+        }
+
+    def write_zip(self, fileobj: BinaryIO) -> Dict[str, int]:
+        """Write all tables and metadata.json into a ZIP. Returns the number of rows per table."""
+        counts = {name: 0 for name, _, _ in self.tables()}
+        compression = zipfile.ZIP_STORED if self.compressed else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(fileobj, mode="w", compression=compression) as archive:
+            for name, schema, rows in self.tables():
+                with archive.open(f"{name}.{self.extension}", mode="w", force_zip64=True) as stream:
+                    self.write_table(stream, schema, self._chunks(self._counted(rows(), counts, name)))
+            archive.writestr(METADATA_NAME, json.dumps(self._metadata(counts), ensure_ascii=False, indent=1))
+        return counts
+
+    def write_directory(self, directory: str) -> Dict[str, int]:
+        """Write all tables and metadata.json into a directory. Returns the number of rows per table."""
+        os.makedirs(directory, exist_ok=True)
+        counts = {name: 0 for name, _, _ in self.tables()}
+        for name, schema, rows in self.tables():
+            with open(os.path.join(directory, f"{name}.{self.extension}"), "wb") as stream:
+                self.write_table(stream, schema, self._chunks(self._counted(rows(), counts, name)))
+        with open(os.path.join(directory, METADATA_NAME), "w", encoding="utf-8") as f:
+            json.dump(self._metadata(counts), f, ensure_ascii=False, indent=1)
+        return counts
+
+
+class ParquetExporter(TabularExporter):
+    """Write tables as Parquet files with one row group per chunk (requires pyarrow)."""
+
+    label = "Parquet"
+    extension = "parquet"
+    compressed = True
+
+    def write_table(self, stream: BinaryIO, schema: Schema, chunks: Iterable[List[tuple]]) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires the pyarrow library. Please run 'pip install pyarrow'.")
+
+        arrow_schema = pa.schema([(column, pa.string() if column_type == 'string' else pa.from_numpy_dtype(column_type))
+                                  for column, column_type in schema])
+        with pq.ParquetWriter(stream, arrow_schema, compression="zstd") as writer:
+            for chunk in chunks:
+                columns = list(zip(*chunk))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, arrow_schema)],
+                    schema=arrow_schema
+                ))
+
+
+class CsvExporter(TabularExporter):
+    """Write tables as gzip-compressed UTF-8 CSV files with a header row."""
+
+    label = "CSV (gzip)"
+    extension = "csv.gz"
+    compressed = True
+
+    def write_table(self, stream: BinaryIO, schema: Schema, chunks: Iterable[List[tuple]]) -> None:
+        with gzip.GzipFile(fileobj=stream, mode="wb", mtime=0) as compressed:
+            with io.TextIOWrapper(compressed, encoding="utf-8", newline="") as text:
+                writer = csv.writer(text)
+                writer.writerow([column for column, _ in schema])
+                for chunk in chunks:
+                    writer.writerows(chunk)
+
+
+class JsonlExporter(TabularExporter):
+    """Write tables as JSON Lines, one object per row with every column present (null when missing)."""
+
+    label = "JSON Lines"
+    extension = "jsonl"
+
+    def write_table(self, stream: BinaryIO, schema: Schema, chunks: Iterable[List[tuple]]) -> None:
+        columns = [column for column, _ in schema]
+        for chunk in chunks:
+            stream.write("".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+                                 for row in chunk).encode("utf-8"))
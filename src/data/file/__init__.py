@@ -1,8 +1,19 @@
 """
 File processing module for the ISP Keyword Analyzer.
 """
-from src.data.file.reader import FileReader
-from src.data.file.pdf import PDFFileReader
-from src.data.file.text import TextFileReader
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
 
-__all__ = ['FileReader', 'PDFFileReader', 'TextFileReader']
\ No newline at end of file
+if TYPE_CHECKING:
+    from src.data.file.reader import FileReader
+    from src.data.file.pdf import PDFFileReader
+    from src.data.file.text import TextFileReader
+
+__all__ = ['FileReader', 'PDFFileReader', 'TextFileReader']
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.data.file.reader': ['FileReader'],
+    'src.data.file.pdf': ['PDFFileReader'],
+    'src.data.file.text': ['TextFileReader']
+})
@@ -0,0 +1,360 @@
+import os
+import re
+import json
+import uuid
+import zlib
+import hashlib
+import datetime
+from typing import Dict, List, Tuple, Any, Iterable, Iterator, Optional
+import numpy as np
+from src.data.repository import SessionRepository
+from src.data.session_store import SESSION_STATE_FIELDS, ISP_CORE_FIELDS, ISP_TRANSIENT_FIELDS
+
+LABELS = ("AA", "OI")
+
+
+class FileSessionRepository(SessionRepository):
+    """Session repository that stores each session as a directory of columnar files.
+
+    A session directory `<root>/<id>` holds:
+
+    - `session.json`: timestamp, parent and the catalog fields used to list sessions,
+    - `manifest.json`: session state and, per ISP, its name, text hash, keywords and AA/OI counts,
+    - `isp.npy`, `keyword.npy`, `label.npy`, `occurrence.npy`: one row per classified
+      occurrence, in saved list order,
+    - `occurrences.bin` and `occurrence_offsets.npy`: the UTF-8 occurrence strings
+      the `occurrence` column indexes into,
+    - `metadata_<isp_id>.json`: classification metadata of one ISP.
+
+    ISP texts are stored once each, compressed, in `<root>/blobs`. A session is
+    written to a temporary directory and renamed into place, so readers never see
+    a partial session. Columns are read memory-mapped, so loading one ISP or the
+    counts of a session only touches the rows it needs.
+    """
+
+    SESSION_FILE = "session.json"
+    MANIFEST_FILE = "manifest.json"
+    OCCURRENCE_DATA = "occurrences.bin"
+    OCCURRENCE_OFFSETS = "occurrence_offsets.npy"
+    COLUMNS = {'isp': np.int32, 'keyword': np.int32, 'label': np.int8, 'occurrence': np.int32}
+
+    ENV_BACKEND = "ISP_ANALYZER_SESSION_BACKEND"
+    ENV_DIR = "ISP_ANALYZER_SESSION_DIR"
+    BACKEND_NAME = "files"
+
+    _SESSION_DIR = re.compile(r"^\d{8}$")
+
+    def __init__(self, root: str = "sessions", blob_level: int = 6):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.blob_level = blob_level
+
+    @classmethod
+    def selected(cls) -> bool:
+        """Whether the environment selects this backend instead of SQLite."""
+        return os.environ.get(cls.ENV_BACKEND, "").strip().lower() == cls.BACKEND_NAME
+
+    @classmethod
+    def from_env(cls) -> 'FileSessionRepository':
+        return cls(os.environ.get(cls.ENV_DIR) or "sessions")
+
+    def initialize(self) -> None:
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    # Writing
+
+    def save_session(self, session_data: Dict[str, Any], parent_id: Optional[int] = None,
+                     expected_head: Optional[int] = None) -> Tuple[int, str]:
+        """Write the session to a new directory; ISPs that are still stubs are copied from the parent.
+
+        Session directories do not record lineages, so expected_head is not checked.
+        """
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        isps = {int(isp_id): isp for isp_id, isp in session_data.get('isps', {}).items()}
+        stub_ids = {isp_id for isp_id, isp in isps.items() if self.is_stub(isp)}
+        if parent_id is not None and not os.path.isdir(self._session_dir(parent_id)):
+            parent_id = None
+        if stub_ids and parent_id is None:
+            raise ValueError("Cannot save ISPs that were never loaded without the session they came from.")
+        parent_manifest = self._read_json(parent_id, self.MANIFEST_FILE) if stub_ids else None
+        parent_columns = self._read_columns(parent_id) if stub_ids else None
+
+        analyzed_keywords = {int(k): v for k, v in session_data.get('analyzed_keywords', {}).items()}
+        metadata_by_isp: Dict[int, Dict[str, Any]] = {}
+        for key, value in session_data.get('classification_metadata', {}).items():
+            isp_part, _, rest = key.partition("::")
+            if isp_part.isdigit() and int(isp_part) in isps and int(isp_part) not in stub_ids:
+                metadata_by_isp.setdefault(int(isp_part), {})[rest] = value
+
+        keyword_index: Dict[str, int] = {}
+        occurrence_index: Dict[str, int] = {}
+        columns = {name: [] for name in self.COLUMNS}
+        manifest_isps = {}
+        classified_count = 0
+
+        def add_row(isp_id: int, keyword: str, label: str, occurrence: str) -> None:
+            columns['isp'].append(isp_id)
+            columns['keyword'].append(keyword_index.setdefault(keyword, len(keyword_index)))
+            columns['label'].append(LABELS.index(label))
+            columns['occurrence'].append(occurrence_index.setdefault(occurrence, len(occurrence_index)))
+
+        for isp_id in sorted(isps):
+            isp = isps[isp_id]
+            if isp_id in stub_ids:
+                entry = parent_manifest['isps'][str(isp_id)]
+                for keyword, label, occurrence in parent_columns.rows(isp_id):
+                    add_row(isp_id, keyword, label, occurrence)
+            else:
+                text = isp.get('text', '')
+                analysis_results = isp.get('analysis_results', {})
+                summary = {label: {} for label in LABELS}
+                for keyword, results in analysis_results.items():
+                    for label in LABELS:
+                        occurrences = results.get(label, [])
+                        summary[label][keyword] = len(occurrences)
+                        for occurrence in occurrences:
+                            add_row(isp_id, keyword, label, occurrence)
+                entry = {
+                    'name': isp.get('name'),
+                    'text_hash': self._put_blob(text),
+                    'text_size': len(text.encode('utf-8')),
+                    'keywords': list(analysis_results.keys()),
+                    'analyzed_keywords': sorted(analyzed_keywords.get(isp_id, [])),
+                    'extra': {k: v for k, v in isp.items()
+                              if k not in ISP_CORE_FIELDS and k not in ISP_TRANSIENT_FIELDS},
+                    'summary': summary
+                }
+            manifest_isps[str(isp_id)] = entry
+            classified_count += sum(sum(counts.values()) for counts in entry['summary'].values())
+
+        occurrences = list(occurrence_index)
+        encoded = [occurrence.encode('utf-8') for occurrence in occurrences]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        state = {field: session_data.get(field) for field in SESSION_STATE_FIELDS}
+        # The keyword column indexes into the manifest's keyword list.
+        manifest = {'state': state, 'keywords': list(keyword_index), 'isps': manifest_isps}
+        info = {
+            'timestamp': timestamp,
+            'parent_id': parent_id,
+            'name': state.get('session_name') or None,
+            'isp_count': len(manifest_isps),
+            'classified_count': classified_count,
+            'language': state.get('language'),
+            'model': state.get('selected_model'),
+            'byte_size': int(offsets[-1]) + sum(entry.get('text_size', 0) for entry in manifest_isps.values()),
+            'isp_names': ", ".join(entry['name'] or "" for entry in manifest_isps.values())
+        }
+
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        self._write_json(os.path.join(tmp_dir, self.MANIFEST_FILE), manifest)
+        self._write_json(os.path.join(tmp_dir, self.SESSION_FILE), info)
+        for name, dtype in self.COLUMNS.items():
+            self._write_array(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(columns[name], dtype=dtype))
+        self._write_array(os.path.join(tmp_dir, self.OCCURRENCE_OFFSETS), offsets)
+        with open(os.path.join(tmp_dir, self.OCCURRENCE_DATA), "wb") as f:
+            f.write(b"".join(encoded))
+            f.flush()
+            os.fsync(f.fileno())
+        for isp_id in isps:
+            target = os.path.join(tmp_dir, f"metadata_{isp_id}.json")
+            if isp_id in stub_ids:
+                source = os.path.join(self._session_dir(parent_id), f"metadata_{isp_id}.json")
+                if os.path.exists(source):
+                    os.link(source, target)
+            elif metadata_by_isp.get(isp_id):
+                self._write_json(target, metadata_by_isp[isp_id])
+
+        return self._commit(tmp_dir), timestamp
+
+    def _commit(self, tmp_dir: str) -> int:
+        """Rename a written session into place under the next free id."""
+        session_id = max(self._session_ids(), default=0) + 1
+        while True:
+            try:
+                os.rename(tmp_dir, self._session_dir(session_id))
+                break
+            except OSError:
+                if not os.path.exists(self._session_dir(session_id)):
+                    raise
+                session_id += 1  # Another process committed this id first.
+        self._fsync_dir(self.root)
+        return session_id
+
+    def _put_blob(self, text: str) -> str:
+        text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        path = os.path.join(self.blob_dir, text_hash + ".z")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(text.encode('utf-8'), self.blob_level))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        return text_hash
+
+    def _get_blob(self, text_hash: str) -> str:
+        with open(os.path.join(self.blob_dir, text_hash + ".z"), "rb") as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+
+    @staticmethod
+    def _write_json(path: str, value: Any) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _write_array(path: str, array: np.ndarray) -> None:
+        with open(path, "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _fsync_dir(path: str) -> None:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # Reading
+
+    def _session_dir(self, session_id: int) -> str:
+        return os.path.join(self.root, f"{int(session_id):08d}")
+
+    def _session_ids(self) -> List[int]:
+        if not os.path.isdir(self.root):
+            return []
+        return [int(name) for name in os.listdir(self.root) if self._SESSION_DIR.match(name)]
+
+    def _read_json(self, session_id: int, filename: str) -> Optional[Any]:
+        try:
+            with open(os.path.join(self._session_dir(session_id), filename), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _read_columns(self, session_id: int) -> 'SessionColumns':
+        manifest = self._read_json(session_id, self.MANIFEST_FILE)
+        return SessionColumns(self._session_dir(session_id), manifest.get('keywords', []))
+
+    def get_sessions(self) -> List[Tuple[int, str]]:
+        sessions = []
+        for session_id in sorted(self._session_ids(), reverse=True):
+            info = self._read_json(session_id, self.SESSION_FILE)
+            if info is not None:
+                sessions.append((session_id, info['timestamp']))
+        return sessions
+
+    def search_sessions(self, query: str = "", limit: int = 20,
+                        offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Match query terms against the name, ISP names, language and model of each session."""
+        terms = re.findall(r"\w+", (query or "").lower())
+        matches = []
+        for session_id in sorted(self._session_ids(), reverse=True):
+            info = self._read_json(session_id, self.SESSION_FILE)
+            if info is None:
+                continue
+            haystack = " ".join(str(info.get(field) or "") for field in ('name', 'isp_names', 'language', 'model'))
+            if all(term in haystack.lower() for term in terms):
+                matches.append({'session_id': session_id, **info})
+        return matches[offset:offset + limit], len(matches)
+
+    def load_session(self, session_id: int) -> Optional[Dict[str, Any]]:
+        manifest = self._read_json(session_id, self.MANIFEST_FILE)
+        if manifest is None:
+            return None
+        rows_by_isp: Dict[int, List[Tuple[str, str, str]]] = {}
+        for isp_id, keyword, label, occurrence in self._read_columns(session_id).all_rows():
+            rows_by_isp.setdefault(isp_id, []).append((keyword, label, occurrence))
+        session_data = dict(manifest['state'])
+        session_data.update({'isps': {}, 'analyzed_keywords': {}, 'classification_metadata': {}})
+        for isp_key in manifest['isps']:
+            loaded = self._build_isp(session_id, manifest, rows_by_isp.get(int(isp_key), []), int(isp_key))
+            session_data['isps'][int(isp_key)] = loaded['isp']
+            session_data['analyzed_keywords'][int(isp_key)] = loaded['analyzed_keywords']
+            session_data['classification_metadata'].update(loaded['classification_metadata'])
+        return session_data
+
+    def load_session_manifest(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """Session state and ISP stubs with AA/OI counts, read from the manifest alone."""
+        manifest = self._read_json(session_id, self.MANIFEST_FILE)
+        if manifest is None:
+            return None
+        session_data = dict(manifest['state'])
+        session_data['isps'] = {}
+        session_data['analyzed_keywords'] = {}
+        session_data['classification_metadata'] = {}
+        for isp_key, entry in manifest['isps'].items():
+            isp = {'name': entry['name'], **entry.get('extra', {})}
+            session_data['isps'][int(isp_key)] = self.isp_stub(isp, entry['summary'])
+            session_data['analyzed_keywords'][int(isp_key)] = entry['analyzed_keywords']
+        return session_data
+
+    def load_isp(self, session_id: int, isp_id: int) -> Optional[Dict[str, Any]]:
+        manifest = self._read_json(session_id, self.MANIFEST_FILE)
+        if manifest is None or str(isp_id) not in manifest['isps']:
+            return None
+        return self._build_isp(session_id, manifest, self._read_columns(session_id).rows(isp_id), isp_id)
+
+    def _build_isp(self, session_id: int, manifest: Dict[str, Any], rows: Iterable[Tuple[str, str, str]],
+                   isp_id: int) -> Dict[str, Any]:
+        entry = manifest['isps'][str(isp_id)]
+        analysis_results = {keyword: {'AA': [], 'OI': []} for keyword in entry['keywords']}
+        for keyword, label, occurrence in rows:
+            analysis_results.setdefault(keyword, {'AA': [], 'OI': []})[label].append(occurrence)
+        isp = {'name': entry['name'], 'text': self._get_blob(entry['text_hash']), 'analysis_results': analysis_results}
+        isp.update(entry.get('extra', {}))
+        metadata = self._read_json(session_id, f"metadata_{isp_id}.json") or {}
+        return {
+            'isp': isp,
+            'analyzed_keywords': entry['analyzed_keywords'],
+            'classification_metadata': {f"{isp_id}::{key}": value for key, value in metadata.items()}
+        }
+
+
+class SessionColumns:
+    """Memory-mapped classification columns of one session directory, read when sessions and ISPs are loaded."""
+
+    def __init__(self, session_dir: str, keywords: List[str]):
+        self.keywords = keywords
+        self.columns = {
+            name: np.load(os.path.join(session_dir, f"{name}.npy"), mmap_mode='r')
+            for name in FileSessionRepository.COLUMNS
+        }
+        self.offsets = np.load(os.path.join(session_dir, FileSessionRepository.OCCURRENCE_OFFSETS), mmap_mode='r')
+        data_path = os.path.join(session_dir, FileSessionRepository.OCCURRENCE_DATA)
+        # np.memmap cannot map an empty file.
+        self.data = np.memmap(data_path, dtype=np.uint8, mode='r') if os.path.getsize(data_path) else np.zeros(0, np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.columns['isp'])
+
+    def occurrence(self, index: int) -> str:
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    def occurrences(self) -> List[str]:
+        """Decode the whole occurrence table at once."""
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+    def rows(self, isp_id: int) -> Iterator[Tuple[str, str, str]]:
+        """Yield (keyword, label, occurrence) of one ISP in saved order, decoding only its occurrences."""
+        indices = np.flatnonzero(self.columns['isp'] == isp_id)
+        keywords = self.columns['keyword'][indices].tolist()
+        labels = self.columns['label'][indices].tolist()
+        occurrences = self.columns['occurrence'][indices].tolist()
+        for keyword, label, occurrence in zip(keywords, labels, occurrences):
+            yield self.keywords[keyword], LABELS[label], self.occurrence(occurrence)
+
+    def all_rows(self) -> Iterator[Tuple[int, str, str, str]]:
+        """Yield (isp_id, keyword, label, occurrence) of every row in saved order."""
+        strings = self.occurrences()
+        columns = [self.columns[name].tolist() for name in ('isp', 'keyword', 'label', 'occurrence')]
+        for isp_id, keyword, label, occurrence in zip(*columns):
+            yield isp_id, self.keywords[keyword], LABELS[label], strings[occurrence]
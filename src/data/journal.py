@@ -0,0 +1,477 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import datetime
+import threading
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+EVENT_CLASSIFY = "classify"
+EVENT_KEYWORD_DONE = "keyword_done"
+EVENT_ADD_ISP = "add_isp"
+EVENT_DELETE_ISP = "delete_isp"
+EVENT_SET_ATTRIBUTES = "set_attributes"
+EVENT_BASE = "base"
+
+
+class SessionJournal:
+    """Append-only autosave journal for work done since the last saved session.
+
+    Every classification, AI result and ISP change is appended to an in-memory
+    buffer, which costs a json.dumps per click. A background thread writes the
+    buffers of all open journals to `<journal_dir>/<id>.log` and fsyncs them every
+    `flush_interval` seconds. Once a log grows past `compact_after` events it is
+    folded into `<id>.snapshot.json` (last write wins per occurrence) and truncated.
+
+    A journal is replayed on top of the session it was based on. Journals left
+    behind by a crashed or restarted server are offered for recovery in the UI.
+
+    Each open journal has an owner file, `<id>.owner.json`, with the process that
+    owns it and the session it is based on; the flusher touches it as a heartbeat.
+    A journal is orphaned when its owner file is missing, marked closed, or has not
+    been touched for `stale_after` seconds, so replicas sharing the journal folder
+    leave each other's live journals alone. A journal created with an `is_active`
+    check (whether its browser session still exists) is closed by the flusher once
+    that check has failed for `close_after` seconds; its unsaved work is then
+    offered for recovery.
+    """
+
+    DEFAULT_DIR = "journal"
+    LOG_SUFFIX = ".log"
+    SNAPSHOT_SUFFIX = ".snapshot.json"
+    OWNER_SUFFIX = ".owner.json"
+
+    flush_interval = 1.0
+    compact_after = 500
+    stale_after = 30.0
+    close_after = 120.0
+
+    _open: Dict[str, 'SessionJournal'] = {}
+    _registry_lock = threading.Lock()
+    _flusher: Optional[threading.Thread] = None
+    # Base sessions of journals without an owner file, keyed by journal id, with the file signature read.
+    _base_cache: Dict[str, Tuple[tuple, Optional[int]]] = {}
+
+    def __init__(self, journal_id: str, journal_dir: str = DEFAULT_DIR,
+                 is_active: Optional[Callable[[], bool]] = None):
+        self.journal_id = journal_id
+        self.journal_dir = journal_dir
+        self.log_path = os.path.join(journal_dir, journal_id + self.LOG_SUFFIX)
+        self.snapshot_path = os.path.join(journal_dir, journal_id + self.SNAPSHOT_SUFFIX)
+        self.owner_path = os.path.join(journal_dir, journal_id + self.OWNER_SUFFIX)
+        self.is_active = is_active
+        self._inactive_since: Optional[float] = None
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._logged_events = 0
+        self._truncate = False
+        self.base_session_id: Optional[int] = None
+
+    @classmethod
+    def create(cls, base_session_id: Optional[int] = None, journal_dir: str = DEFAULT_DIR,
+               is_active: Optional[Callable[[], bool]] = None) -> 'SessionJournal':
+        """Open a new journal for a browser session and start the background flusher.
+
+        is_active tells whether the browser session still exists; without it the
+        journal stays open until it is closed or the process ends.
+        """
+        journal = cls(uuid.uuid4().hex, journal_dir, is_active)
+        # Registered before its owner file exists, so it is never mistaken for an orphan of this process.
+        journal._register()
+        journal.reset(base_session_id)
+        return journal
+
+    def _register(self) -> None:
+        with self._registry_lock:
+            self._open[self.journal_id] = self
+            if SessionJournal._flusher is None or not SessionJournal._flusher.is_alive():
+                SessionJournal._flusher = threading.Thread(target=SessionJournal._flush_loop,
+                                                           name="session-journal", daemon=True)
+                SessionJournal._flusher.start()
+
+    @property
+    def is_open(self) -> bool:
+        with self._registry_lock:
+            return self._open.get(self.journal_id) is self
+
+    def ensure_open(self) -> None:
+        """Reopen a journal the flusher closed while its browser session was away.
+
+        If another session recovered or discarded the closed journal in the meantime,
+        the journal starts over on its base session.
+        """
+        if self.is_open:
+            return
+        self._inactive_since = None
+        self._register()
+        if not os.path.exists(self.log_path) and not os.path.exists(self.snapshot_path):
+            self.reset(self.base_session_id)
+        else:
+            self._write_owner()
+
+    def _write_owner(self, closed: bool = False) -> None:
+        """Write the owner file: the owning process, the base session and whether the journal is closed."""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        owner = {'pid': os.getpid(), 'host': socket.gethostname(),
+                 'base_session_id': self.base_session_id, 'closed': closed}
+        tmp_path = self.owner_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(owner, f)
+        os.replace(tmp_path, self.owner_path)
+
+    def _heartbeat(self) -> None:
+        try:
+            os.utime(self.owner_path)
+        except FileNotFoundError:
+            self._write_owner()
+
+    def append(self, event_type: str, **fields) -> None:
+        """Buffer an event; it reaches disk with the next timed flush."""
+        line = json.dumps({'type': event_type, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+
+    def reset(self, base_session_id: Optional[int] = None, events: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Start over on top of a saved session, e.g. after saving or loading one.
+
+        Events passed in (for example from a recovered journal) are kept as unsaved work.
+        """
+        self.base_session_id = base_session_id
+        self._write_owner()
+        lines = [json.dumps({'type': EVENT_BASE, 'session_id': base_session_id})]
+        lines.extend(json.dumps(event, ensure_ascii=False) for event in events or [])
+        with self._lock:
+            self._buffer = lines
+            self._truncate = True
+
+    def flush(self) -> None:
+        """Write buffered events to the log, fsync it and compact it if it has grown large."""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            truncate, self._truncate = self._truncate, False
+            if not lines and not truncate:
+                return
+
+            os.makedirs(self.journal_dir, exist_ok=True)
+            if truncate:
+                self._remove(self.snapshot_path)
+                self._logged_events = 0
+            with open(self.log_path, "w" if truncate else "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._logged_events += len(lines)
+
+            if self._logged_events >= self.compact_after:
+                self._compact()
+
+    def close(self, discard: bool = False) -> None:
+        """Flush and stop tracking this journal, deleting its files if discard is set.
+
+        A journal closed without discarding is left for recovery.
+        """
+        with self._registry_lock:
+            if self._open.get(self.journal_id) is self:
+                del self._open[self.journal_id]
+        if discard:
+            with self._lock:
+                self._buffer = []
+                self._remove(self.log_path)
+                self._remove(self.snapshot_path)
+                self._remove(self.owner_path)
+        else:
+            self.flush()
+            self._write_owner(closed=True)
+
+    def _compact(self) -> None:
+        """Fold snapshot and log into a new snapshot, then truncate the log. Caller holds the lock."""
+        base_session_id, events = self.read_events(self.journal_id, self.journal_dir)
+        snapshot = {
+            'base_session_id': base_session_id,
+            'compacted_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'events': events
+        }
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        with open(self.log_path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._logged_events = 0
+
+    @classmethod
+    def _flush_loop(cls) -> None:
+        while True:
+            time.sleep(cls.flush_interval)
+            with cls._registry_lock:
+                journals = list(cls._open.values())
+            now = time.monotonic()
+            for journal in journals:
+                try:
+                    if journal._expired(now):
+                        journal.close()
+                    else:
+                        journal.flush()
+                        journal._heartbeat()
+                except OSError as e:
+                    print(f"Error writing autosave journal {journal.journal_id}: {e}", file=sys.stderr)
+
+    def _expired(self, now: float) -> bool:
+        """Whether the browser session of the journal has been gone for close_after seconds."""
+        if self.is_active is None:
+            return False
+        try:
+            active = self.is_active()
+        except Exception:
+            active = True
+        if active:
+            self._inactive_since = None
+            return False
+        if self._inactive_since is None:
+            self._inactive_since = now
+        return now - self._inactive_since >= self.close_after
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def read_events(cls, journal_id: str, journal_dir: str = DEFAULT_DIR) -> tuple:
+        """Read a journal from disk and return (base_session_id, folded events)."""
+        base_session_id = None
+        events = []
+        snapshot_path = os.path.join(journal_dir, journal_id + cls.SNAPSHOT_SUFFIX)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            base_session_id = snapshot.get('base_session_id')
+            events = snapshot.get('events', [])
+
+        log_path = os.path.join(journal_dir, journal_id + cls.LOG_SUFFIX)
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn final line from a crash mid-write
+                    if event.get('type') == EVENT_BASE:
+                        base_session_id = event.get('session_id')
+                        events = []
+                    else:
+                        events.append(event)
+        return base_session_id, cls.fold_events(events)
+
+    @staticmethod
+    def fold_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Collapse events to their net effect, keeping the order of the last writes."""
+        folded: Dict[tuple, Dict[str, Any]] = {}
+        for event in events:
+            event_type = event.get('type')
+            isp_id = event.get('isp_id')
+            if event_type == EVENT_CLASSIFY:
+                key = (EVENT_CLASSIFY, isp_id, event['keyword'], event['occurrence'])
+                previous = folded.pop(key, None)
+                if event.get('metadata') is None and previous is not None:
+                    event = {**event, 'metadata': previous.get('metadata')}
+                folded[key] = event
+            elif event_type == EVENT_KEYWORD_DONE:
+                key = (EVENT_KEYWORD_DONE, isp_id, event['keyword'])
+                folded.pop(key, None)
+                folded[key] = event
+            elif event_type == EVENT_SET_ATTRIBUTES:
+                key = (EVENT_SET_ATTRIBUTES, isp_id)
+                previous = folded.pop(key, None)
+                if previous is not None:
+                    event = {**event, 'attributes': {**previous['attributes'], **event['attributes']}}
+                folded[key] = event
+            elif event_type == EVENT_ADD_ISP:
+                for key in [key for key in folded if key[1] == isp_id and key[0] != EVENT_DELETE_ISP]:
+                    del folded[key]
+                folded[(EVENT_ADD_ISP, isp_id)] = event
+            elif event_type == EVENT_DELETE_ISP:
+                added = (EVENT_ADD_ISP, isp_id) in folded
+                for key in [key for key in folded if key[1] == isp_id]:
+                    del folded[key]
+                if not added:
+                    folded[(EVENT_DELETE_ISP, isp_id)] = event
+        return list(folded.values())
+
+    @staticmethod
+    def apply_events(state: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Replay events onto a session state dict with 'isps', 'analyzed_keywords' and 'classification_metadata'."""
+        isps = state.setdefault('isps', {})
+        analyzed_keywords = state.setdefault('analyzed_keywords', {})
+        metadata = state.setdefault('classification_metadata', {})
+
+        for event in events:
+            event_type = event.get('type')
+            isp_id = event.get('isp_id')
+            if event_type == EVENT_ADD_ISP:
+                isps[isp_id] = {'name': event['name'], 'text': event['text'], 'analysis_results': {}}
+                analyzed_keywords[isp_id] = set()
+                for key in [key for key in metadata if key.startswith(f"{isp_id}::")]:
+                    del metadata[key]
+                state['next_isp_id'] = max(isp_id + 1, state.get('next_isp_id') or 1)
+            elif event_type == EVENT_DELETE_ISP:
+                isps.pop(isp_id, None)
+                analyzed_keywords.pop(isp_id, None)
+                for key in [key for key in metadata if key.startswith(f"{isp_id}::")]:
+                    del metadata[key]
+            elif isp_id not in isps:
+                continue
+            elif event_type == EVENT_CLASSIFY:
+                keyword = event['keyword']
+                occurrence = event['occurrence']
+                label = event['label']
+                results = isps[isp_id].setdefault('analysis_results', {}).setdefault(keyword, {'AA': [], 'OI': []})
+                if label is None:
+                    # A classification that was removed, e.g. by resolving a merge conflict.
+                    for labeled in results.values():
+                        if occurrence in labeled:
+                            labeled.remove(occurrence)
+                    metadata.pop(f"{isp_id}::{keyword}::{occurrence}", None)
+                    continue
+                other = "OI" if label == "AA" else "AA"
+                if occurrence not in results[label]:
+                    results[label].append(occurrence)
+                if occurrence in results[other]:
+                    results[other].remove(occurrence)
+                if event.get('metadata') is not None:
+                    metadata[f"{isp_id}::{keyword}::{occurrence}"] = event['metadata']
+            elif event_type == EVENT_SET_ATTRIBUTES:
+                isps[isp_id].update(event['attributes'])
+            elif event_type == EVENT_KEYWORD_DONE:
+                isps[isp_id].setdefault('analysis_results', {}).setdefault(event['keyword'], {'AA': [], 'OI': []})
+                analyzed_keywords.setdefault(isp_id, set()).add(event['keyword'])
+        return state
+
+    @classmethod
+    def _journal_ids(cls, journal_dir: str) -> set:
+        """Ids of the journals with files in journal_dir."""
+        if not os.path.isdir(journal_dir):
+            return set()
+        journal_ids = set()
+        for filename in os.listdir(journal_dir):
+            for suffix in (cls.LOG_SUFFIX, cls.SNAPSHOT_SUFFIX, cls.OWNER_SUFFIX):
+                if filename.endswith(suffix):
+                    journal_ids.add(filename[:-len(suffix)])
+        return journal_ids
+
+    @classmethod
+    def _read_owner(cls, journal_id: str, journal_dir: str) -> Optional[Dict[str, Any]]:
+        """The owner file of a journal with its modification time as 'heartbeat', or None."""
+        path = os.path.join(journal_dir, journal_id + cls.OWNER_SUFFIX)
+        try:
+            with open(path, encoding="utf-8") as f:
+                owner = json.load(f)
+            owner['heartbeat'] = os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+        return owner if isinstance(owner, dict) else None
+
+    @classmethod
+    def _owned(cls, owner: Optional[Dict[str, Any]]) -> bool:
+        """Whether an owner file belongs to a journal that is open in a running process."""
+        if owner is None or owner.get('closed'):
+            return False
+        if time.time() - owner['heartbeat'] > cls.stale_after:
+            return False
+        if owner.get('host') == socket.gethostname():
+            pid = owner.get('pid')
+            if pid == os.getpid():
+                # Open journals of this process are in the registry; anything else here is left over.
+                return False
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return False
+            except (OSError, TypeError):
+                pass
+        return True
+
+    @classmethod
+    def find_orphaned(cls, journal_dir: str = DEFAULT_DIR) -> List[Dict[str, Any]]:
+        """List journals with unsaved work that no running session owns.
+
+        Journals that are open in this process, or whose owner file shows a live
+        owner in another process or replica, are skipped.
+        """
+        with cls._registry_lock:
+            open_ids = set(cls._open)
+
+        orphaned = []
+        for journal_id in cls._journal_ids(journal_dir) - open_ids:
+            if cls._owned(cls._read_owner(journal_id, journal_dir)):
+                continue
+            try:
+                base_session_id, events = cls.read_events(journal_id, journal_dir)
+            except (OSError, ValueError):
+                continue
+            if not events:
+                cls.discard(journal_id, journal_dir)
+                continue
+            paths = [os.path.join(journal_dir, journal_id + suffix) for suffix in (cls.LOG_SUFFIX, cls.SNAPSHOT_SUFFIX)]
+            modified = max((os.path.getmtime(path) for path in paths if os.path.exists(path)), default=time.time())
+            orphaned.append({
+                'journal_id': journal_id,
+                'base_session_id': base_session_id,
+                'events': events,
+                'modified': datetime.datetime.fromtimestamp(modified).strftime("%Y-%m-%d %H:%M:%S")
+            })
+        return sorted(orphaned, key=lambda journal: journal['modified'], reverse=True)
+
+    @classmethod
+    def referenced_session_ids(cls, journal_dir: str = DEFAULT_DIR) -> set:
+        """Sessions that any journal on disk or open in this process is based on, which must not be pruned.
+
+        Open journals are known in memory and other journals name their base session
+        in their owner file; only journals without one are read, once per change.
+        """
+        with cls._registry_lock:
+            referenced = {journal.base_session_id for journal in cls._open.values()}
+            open_ids = set(cls._open)
+        journal_ids = cls._journal_ids(journal_dir) - open_ids
+        for journal_id in journal_ids:
+            owner = cls._read_owner(journal_id, journal_dir)
+            if owner is not None:
+                referenced.add(owner.get('base_session_id'))
+            else:
+                referenced.add(cls._cached_base_session_id(journal_id, journal_dir))
+        for journal_id in set(cls._base_cache) - journal_ids:
+            cls._base_cache.pop(journal_id, None)
+        referenced.discard(None)
+        return referenced
+
+    @classmethod
+    def _cached_base_session_id(cls, journal_id: str, journal_dir: str) -> Optional[int]:
+        signature = []
+        for suffix in (cls.LOG_SUFFIX, cls.SNAPSHOT_SUFFIX):
+            try:
+                stat = os.stat(os.path.join(journal_dir, journal_id + suffix))
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        cached = cls._base_cache.get(journal_id)
+        if cached is not None and cached[0] == tuple(signature):
+            return cached[1]
+        try:
+            base_session_id, _ = cls.read_events(journal_id, journal_dir)
+        except (OSError, ValueError):
+            base_session_id = None
+        cls._base_cache[journal_id] = (tuple(signature), base_session_id)
+        return base_session_id
+
+    @classmethod
+    def discard(cls, journal_id: str, journal_dir: str = DEFAULT_DIR) -> None:
+        """Delete an orphaned journal's files."""
+        for suffix in (cls.LOG_SUFFIX, cls.SNAPSHOT_SUFFIX, cls.OWNER_SUFFIX):
+            cls._remove(os.path.join(journal_dir, journal_id + suffix))
@@ -0,0 +1,91 @@
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import streamlit as st
+from src.data.repository import SessionRepository
+
+class LazySessionLoader:
+    """Hydrates the ISPs of a lazily loaded session on demand.
+
+    After a lazy load, `st.session_state.isps` holds stubs with names and AA/OI
+    counts. The first time an ISP is selected, its text, occurrences and metadata
+    are loaded from the repository. At most `max_hydrated` ISPs are kept in full;
+    the least recently used ISP without unsaved changes is turned back into a stub
+    when the limit is exceeded.
+    """
+
+    def __init__(self, repository: SessionRepository, session_id: int, max_hydrated: Optional[int] = 8):
+        self.repository = repository
+        self.session_id = session_id
+        self.max_hydrated = max_hydrated
+        self._hydrated: 'OrderedDict[int, str]' = OrderedDict()
+
+    def hydrate(self, isp_id: int) -> Optional[Dict[str, Any]]:
+        """Make sure an ISP is fully loaded in the session state and return it."""
+        isps = st.session_state.isps
+        isp = isps.get(isp_id)
+        if isp is None:
+            return None
+        if not SessionRepository.is_stub(isp):
+            if isp_id in self._hydrated:
+                self._hydrated.move_to_end(isp_id)
+            return isp
+
+        loaded = self.repository.load_isp(self.session_id, isp_id)
+        if loaded is None:
+            return isp
+        isps[isp_id] = loaded['isp']
+        st.session_state.analyzed_keywords[isp_id] = set(loaded['analyzed_keywords'])
+        st.session_state.classification_metadata.update(loaded['classification_metadata'])
+        self._hydrated[isp_id] = self._fingerprint(isp_id)
+        self._evict()
+        return isps[isp_id]
+
+    def hydrate_all(self) -> None:
+        """Load every ISP, e.g. before an export, and stop evicting for the rest of the session."""
+        self.max_hydrated = None
+        for isp_id in list(st.session_state.isps):
+            self.hydrate(isp_id)
+
+    def has_stubs(self) -> bool:
+        return any(SessionRepository.is_stub(isp) for isp in st.session_state.isps.values())
+
+    def mark_saved(self, session_id: int) -> None:
+        """Rebase on a newly saved session; everything hydrated so far is now clean."""
+        self.session_id = session_id
+        for isp_id in list(self._hydrated):
+            if isp_id in st.session_state.isps:
+                self._hydrated[isp_id] = self._fingerprint(isp_id)
+            else:
+                del self._hydrated[isp_id]
+
+    def _evict(self) -> None:
+        if self.max_hydrated is None:
+            return
+        current_isp_id = st.session_state.get('current_isp_id')
+        for isp_id in list(self._hydrated):
+            if len(self._hydrated) <= self.max_hydrated:
+                break
+            isp = st.session_state.isps.get(isp_id)
+            if isp is None:
+                del self._hydrated[isp_id]
+            elif isp_id != current_isp_id and self._hydrated[isp_id] == self._fingerprint(isp_id):
+                st.session_state.isps[isp_id] = SessionRepository.isp_stub(isp)
+                prefix = f"{isp_id}::"
+                metadata = st.session_state.classification_metadata
+                for key in [key for key in metadata if key.startswith(prefix)]:
+                    del metadata[key]
+                del self._hydrated[isp_id]
+
+    @staticmethod
+    def _fingerprint(isp_id: int) -> str:
+        """Digest of everything about an ISP that a save would write, to detect unsaved changes."""
+        isp = st.session_state.isps[isp_id]
+        prefix = f"{isp_id}::"
+        state = {
+            'isp': {k: v for k, v in isp.items() if k != 'text'},
+            'analyzed_keywords': sorted(st.session_state.analyzed_keywords.get(isp_id, ())),
+            'metadata': {k: v for k, v in st.session_state.classification_metadata.items() if k.startswith(prefix)}
+        }
+        return hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
@@ -0,0 +1,206 @@
+from typing import Dict, List, Tuple, Any, Optional
+
+LABELS = ("AA", "OI")
+
+
+class SessionMerger:
+    """Three-way merge of two sessions saved concurrently from the same base session.
+
+    Sessions are dicts in the shape returned by SessionRepository.load_session,
+    with fully loaded ISPs. Classifications are merged per occurrence: a change
+    made on one side only is taken over, and an occurrence both sides changed
+    to different labels (or one relabeled and the other removed) is a conflict.
+    Conflicts are resolved in favor of "ours" in the merged session and returned
+    for review. Metadata follows the label it belongs to. Merging is linear in
+    the number of classifications.
+    """
+
+    @staticmethod
+    def _identity(isp: Optional[Dict[str, Any]]) -> Optional[Tuple]:
+        """ISPs with the same id, name and text are the same ISP; anything else was replaced."""
+        if isp is None:
+            return None
+        return (isp.get('name'), isp.get('text'))
+
+    @staticmethod
+    def _labels(isp: Optional[Dict[str, Any]]) -> Dict[Tuple[str, str], str]:
+        labels = {}
+        if isp is None:
+            return labels
+        for keyword, results in isp.get('analysis_results', {}).items():
+            for label in LABELS:
+                for occurrence in results.get(label, []):
+                    labels[(keyword, occurrence)] = label
+        return labels
+
+    @staticmethod
+    def _metadata_by_isp(session: Dict[str, Any]) -> Dict[int, Dict[Tuple[str, str], Any]]:
+        by_isp: Dict[int, Dict[Tuple[str, str], Any]] = {}
+        for key, value in session.get('classification_metadata', {}).items():
+            parts = key.split("::", 2)
+            if len(parts) == 3 and parts[0].isdigit():
+                by_isp.setdefault(int(parts[0]), {})[(parts[1], parts[2])] = value
+        return by_isp
+
+    @staticmethod
+    def _merge_values(base, ours, theirs):
+        """Three-way merge of one value; returns (merged value, whether both sides changed it differently)."""
+        if ours == theirs:
+            return ours, False
+        if ours == base:
+            return theirs, False
+        if theirs == base:
+            return ours, False
+        return ours, True
+
+    @classmethod
+    def merge(cls, base: Dict[str, Any], ours: Dict[str, Any],
+              theirs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Merge ours and theirs against base; return (merged session, conflicts).
+
+        Each conflict has 'isp_id', 'keyword', 'occurrence' and the 'base', 'ours'
+        and 'theirs' labels (None where the occurrence is unclassified), plus
+        'ours_metadata' and 'theirs_metadata'. A 'keyword' of None marks an ISP one
+        side deleted while the other changed it; the changed ISP is kept.
+        """
+        base_isps = {int(k): v for k, v in base.get('isps', {}).items()}
+        our_isps = {int(k): v for k, v in ours.get('isps', {}).items()}
+        their_isps = {int(k): v for k, v in theirs.get('isps', {}).items()}
+        analyzed = {side: {int(k): set(v) for k, v in session.get('analyzed_keywords', {}).items()}
+                    for side, session in (('base', base), ('ours', ours), ('theirs', theirs))}
+        metadata = {'base': cls._metadata_by_isp(base), 'ours': cls._metadata_by_isp(ours),
+                    'theirs': cls._metadata_by_isp(theirs)}
+
+        merged_isps: Dict[int, Dict[str, Any]] = {}
+        merged_analyzed: Dict[int, set] = {}
+        merged_metadata: Dict[str, Any] = {}
+        conflicts: List[Dict[str, Any]] = []
+        relocated: List[Tuple[Dict[str, Any], set, Dict]] = []
+
+        def take(isp_id: int, isp: Dict[str, Any], side: str) -> None:
+            merged_isps[isp_id] = isp
+            merged_analyzed[isp_id] = set(analyzed[side].get(isp_id, set()))
+            for (keyword, occurrence), value in metadata[side].get(isp_id, {}).items():
+                merged_metadata[f"{isp_id}::{keyword}::{occurrence}"] = value
+
+        for isp_id in sorted(set(base_isps) | set(our_isps) | set(their_isps)):
+            b, o, t = base_isps.get(isp_id), our_isps.get(isp_id), their_isps.get(isp_id)
+            b_id, o_id, t_id = cls._identity(b), cls._identity(o), cls._identity(t)
+
+            if o_id == b_id and t_id == b_id:
+                if b is not None:
+                    cls._merge_isp(isp_id, b, o, t, analyzed, metadata, merged_isps, merged_analyzed,
+                                   merged_metadata, conflicts)
+            elif o_id == t_id:
+                # Both sides added (or replaced it with) the same ISP: merge against an empty base.
+                empty = {'name': o['name'], 'text': o['text'], 'analysis_results': {}}
+                cls._merge_isp(isp_id, empty, o, t, analyzed, metadata, merged_isps, merged_analyzed,
+                               merged_metadata, conflicts, base_known=False)
+            elif o_id == b_id:
+                # Only theirs deleted or replaced it.
+                if t is not None:
+                    take(isp_id, t, 'theirs')
+                elif cls._labels(o) != cls._labels(b) or metadata['ours'].get(isp_id) != metadata['base'].get(isp_id):
+                    take(isp_id, o, 'ours')
+                    conflicts.append(cls._isp_conflict(isp_id, 'ours'))
+            elif t_id == b_id:
+                # Only ours deleted or replaced it.
+                if o is not None:
+                    take(isp_id, o, 'ours')
+                elif cls._labels(t) != cls._labels(b) or metadata['theirs'].get(isp_id) != metadata['base'].get(isp_id):
+                    take(isp_id, t, 'theirs')
+                    conflicts.append(cls._isp_conflict(isp_id, 'theirs'))
+            else:
+                # Both sides put a different ISP under this id: keep ours here and move theirs.
+                if o is not None:
+                    take(isp_id, o, 'ours')
+                if t is not None:
+                    relocated.append((t, analyzed['theirs'].get(isp_id, set()), metadata['theirs'].get(isp_id, {})))
+
+        next_isp_id = max([ours.get('next_isp_id') or 1, theirs.get('next_isp_id') or 1]
+                          + [isp_id + 1 for isp_id in merged_isps])
+        for isp, isp_analyzed, isp_metadata in relocated:
+            isp_id = next_isp_id
+            next_isp_id += 1
+            merged_isps[isp_id] = isp
+            merged_analyzed[isp_id] = set(isp_analyzed)
+            for (keyword, occurrence), value in isp_metadata.items():
+                merged_metadata[f"{isp_id}::{keyword}::{occurrence}"] = value
+
+        merged = {k: v for k, v in ours.items()
+                  if k not in ('isps', 'analyzed_keywords', 'classification_metadata')}
+        merged.update({
+            'isps': merged_isps,
+            'analyzed_keywords': merged_analyzed,
+            'classification_metadata': merged_metadata,
+            'next_isp_id': next_isp_id
+        })
+        if merged.get('current_isp_id') not in merged_isps:
+            merged['current_isp_id'] = next(iter(merged_isps), None)
+        return merged, conflicts
+
+    @staticmethod
+    def _isp_conflict(isp_id: int, kept: str) -> Dict[str, Any]:
+        return {'isp_id': isp_id, 'keyword': None, 'occurrence': None, 'base': None, 'ours': None,
+                'theirs': None, 'kept': kept, 'ours_metadata': None, 'theirs_metadata': None}
+
+    @classmethod
+    def _merge_isp(cls, isp_id, b, o, t, analyzed, metadata, merged_isps, merged_analyzed,
+                   merged_metadata, conflicts, base_known: bool = True) -> None:
+        base_labels = cls._labels(b)
+        our_labels = cls._labels(o)
+        their_labels = cls._labels(t)
+        base_meta = metadata['base'].get(isp_id, {}) if base_known else {}
+        our_meta = metadata['ours'].get(isp_id, {})
+        their_meta = metadata['theirs'].get(isp_id, {})
+
+        merged_labels = {}
+        for key in set(our_labels) | set(their_labels) | set(base_labels):
+            base_label = base_labels.get(key)
+            our_label = our_labels.get(key)
+            their_label = their_labels.get(key)
+            label, conflicting = cls._merge_values(base_label, our_label, their_label)
+            if conflicting:
+                conflicts.append({
+                    'isp_id': isp_id, 'keyword': key[0], 'occurrence': key[1], 'base': base_label,
+                    'ours': our_label, 'theirs': their_label, 'kept': 'ours',
+                    'ours_metadata': our_meta.get(key), 'theirs_metadata': their_meta.get(key)
+                })
+                value = our_meta.get(key)
+            elif label == our_label and label != their_label:
+                value = our_meta.get(key)
+            elif label == their_label and label != our_label:
+                value = their_meta.get(key)
+            else:
+                value, _ = cls._merge_values(base_meta.get(key), our_meta.get(key), their_meta.get(key))
+            if label is not None:
+                merged_labels[key] = label
+                if value is not None:
+                    merged_metadata[f"{isp_id}::{key[0]}::{key[1]}"] = value
+
+        # Keep the order of theirs, then append what ours added.
+        analysis_results: Dict[str, Dict[str, List[str]]] = {}
+        for source in (t, o):
+            for keyword, results in source.get('analysis_results', {}).items():
+                merged_results = analysis_results.setdefault(keyword, {'AA': [], 'OI': []})
+                for label in LABELS:
+                    for occurrence in results.get(label, []):
+                        if merged_labels.get((keyword, occurrence)) == label:
+                            merged_results[label].append(occurrence)
+                            merged_labels.pop((keyword, occurrence))
+        for keyword in b.get('analysis_results', {}):
+            if keyword not in t.get('analysis_results', {}) or keyword not in o.get('analysis_results', {}):
+                if not any(analysis_results.get(keyword, {}).get(label) for label in LABELS):
+                    analysis_results.pop(keyword, None)
+
+        isp = {k: v for k, v in o.items() if k != 'analysis_results'}
+        for k, v in t.items():
+            if k not in ('name', 'text', 'analysis_results') and o.get(k) == b.get(k):
+                isp[k] = v
+        isp['analysis_results'] = analysis_results
+        merged_isps[isp_id] = isp
+
+        base_done = analyzed['base'].get(isp_id, set()) if base_known else set()
+        our_done = analyzed['ours'].get(isp_id, set())
+        their_done = analyzed['theirs'].get(isp_id, set())
+        merged_analyzed[isp_id] = (our_done & their_done) | (our_done - base_done) | (their_done - base_done)
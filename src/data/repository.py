@@ -1,5 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Iterable, Optional
+
+class SessionConflictError(RuntimeError):
+    """Raised when a session is saved over a head that another analyst has moved since it was loaded."""
+
+    def __init__(self, expected_head: Optional[int], head_id: int):
+        super().__init__(f"Session {head_id} was saved by someone else after this session was loaded.")
+        self.expected_head = expected_head
+        self.head_id = head_id
+
 
 class SessionRepository(ABC):
     """Abstract interface for session data storage."""
@@ -10,16 +19,115 @@ class SessionRepository(ABC):
         pass
     
     @abstractmethod
-    def save_session(self, session_data: Dict[str, Any]) -> str:
-        """Save session data and return timestamp."""
+    def save_session(self, session_data: Dict[str, Any], parent_id: Optional[int] = None,
+                     expected_head: Optional[int] = None) -> Tuple[int, str]:
+        """Save session data and return (session id, timestamp).
+        
+        parent_id is the session the data was loaded from, if any; implementations
+        may use it to store only what changed since then. ISPs that are still stubs
+        (see isp_stub) are unchanged since parent_id and must be carried over from it.
+        
+        With expected_head, implementations that support get_head save only if the
+        head of parent_id's lineage is still expected_head, and raise
+        SessionConflictError otherwise.
+        """
         pass
     
+    def get_head(self, session_id: int) -> Optional[int]:
+        """Get the newest session saved in the same lineage as session_id.
+        
+        Returns None for backends that cannot compare-and-swap saves.
+        """
+        return None
+    
+    def classification_versions(self, session_id: int) -> Dict[Tuple[int, str, str], int]:
+        """Get the id of the session that last wrote each classification, keyed by (isp id, keyword, occurrence).
+        
+        Backends that do not track versions return an empty dict.
+        """
+        return {}
+    
     @abstractmethod
     def get_sessions(self) -> List[Tuple[int, str]]:
         """Get list of saved sessions (id, timestamp)."""
         pass
     
+    def get_lineage_heads(self) -> List[int]:
+        """Get the newest session of every lineage, newest first.
+        
+        Backends that do not record lineages treat every session as its own lineage.
+        """
+        return [session_id for session_id, _ in self.get_sessions()]
+    
+    def search_sessions(self, query: str = "", limit: int = 20,
+                        offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Get one page of session summaries matching query, newest first, and the total number of matches.
+        
+        Each summary has at least 'session_id', 'name' and 'timestamp'. This default
+        only matches on the session id and timestamp; backends with a catalog should override it.
+        """
+        terms = (query or "").lower().split()
+        matches = [
+            {'session_id': session_id, 'name': None, 'timestamp': timestamp}
+            for session_id, timestamp in self.get_sessions()
+            if all(term in f"{session_id} {timestamp}".lower() for term in terms)
+        ]
+        return matches[offset:offset + limit], len(matches)
+    
     @abstractmethod
     def load_session(self, session_id: int) -> Optional[Dict[str, Any]]:
         """Load session data by ID."""
-        pass
\ No newline at end of file
+        pass
+    
+    def load_session_manifest(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """Load session data with every ISP as a stub holding only its name and classification counts.
+        
+        Backends that can read the counts without loading whole ISPs should override this.
+        """
+        session_data = self.load_session(session_id)
+        if not session_data:
+            return session_data
+        session_data['isps'] = {isp_id: self.isp_stub(isp) for isp_id, isp in session_data.get('isps', {}).items()}
+        session_data['classification_metadata'] = {}
+        return session_data
+    
+    def load_isp(self, session_id: int, isp_id: int) -> Optional[Dict[str, Any]]:
+        """Load one ISP of a session as a dict with 'isp', 'analyzed_keywords' and 'classification_metadata'."""
+        session_data = self.load_session(session_id)
+        if not session_data:
+            return None
+        isp = {int(k): v for k, v in session_data.get('isps', {}).items()}.get(isp_id)
+        if isp is None:
+            return None
+        analyzed_keywords = {int(k): v for k, v in session_data.get('analyzed_keywords', {}).items()}
+        prefix = f"{isp_id}::"
+        return {
+            'isp': isp,
+            'analyzed_keywords': list(analyzed_keywords.get(isp_id, [])),
+            'classification_metadata': {k: v for k, v in session_data.get('classification_metadata', {}).items()
+                                        if k.startswith(prefix)}
+        }
+    
+    def schedule_maintenance(self, policy: Optional[Any] = None, protect: Iterable[int] = ()) -> bool:
+        """Start pruning old sessions by a RetentionPolicy in the background; returns whether it started.
+        
+        Sessions in protect must be kept. Backends without retention support do nothing.
+        """
+        return False
+    
+    @staticmethod
+    def is_stub(isp: Dict[str, Any]) -> bool:
+        """Whether an ISP dict is a stub that has not been hydrated yet."""
+        return isp.get('hydrated') is False
+    
+    @staticmethod
+    def isp_stub(isp: Dict[str, Any], summary: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, Any]:
+        """Build a stub for an ISP: its name and extra fields plus per-keyword AA/OI counts."""
+        if summary is None:
+            summary = {'AA': {}, 'OI': {}}
+            for keyword, results in isp.get('analysis_results', {}).items():
+                summary['AA'][keyword] = len(results.get('AA', []))
+                summary['OI'][keyword] = len(results.get('OI', []))
+        stub = {k: v for k, v in isp.items() if k not in ('text', 'analysis_results')}
+        stub.update({'hydrated': False, 'summary': summary})
+        return stub
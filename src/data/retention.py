@@ -0,0 +1,82 @@
+import os
+import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+class RetentionPolicy:
+    """Decides which saved sessions of a project to keep.
+
+    Sessions are grouped by lineage (the sessions saved from one another) and
+    within each lineage the policy keeps:
+
+    - the `keep_last` most recent sessions,
+    - the newest session of each day for the last `daily_days` days,
+    - the newest session of each month before that (if `monthly` is set).
+
+    Named sessions are always kept when `keep_named` is set. A value of 0 turns
+    the daily or monthly rule off. The defaults can be overridden with environment
+    variables; `ISP_ANALYZER_RETENTION=off` disables pruning altogether.
+    """
+
+    TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    ENV_ENABLED = "ISP_ANALYZER_RETENTION"
+    ENV_KEEP_LAST = "ISP_ANALYZER_KEEP_LAST"
+    ENV_DAILY_DAYS = "ISP_ANALYZER_KEEP_DAILY_DAYS"
+    ENV_MONTHLY = "ISP_ANALYZER_KEEP_MONTHLY"
+
+    def __init__(self, keep_last: int = 20, daily_days: int = 30, monthly: bool = True,
+                 keep_named: bool = True, enabled: bool = True):
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1.")
+        self.keep_last = keep_last
+        self.daily_days = daily_days
+        self.monthly = monthly
+        self.keep_named = keep_named
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        """Build the policy from environment variables, falling back to the defaults."""
+        enabled = os.environ.get(cls.ENV_ENABLED, "on").lower() not in ("off", "0", "false", "no")
+        return cls(
+            keep_last=int(os.environ.get(cls.ENV_KEEP_LAST) or 20),
+            daily_days=int(os.environ.get(cls.ENV_DAILY_DAYS) or 30),
+            monthly=os.environ.get(cls.ENV_MONTHLY, "1") not in ("0", "false", "no"),
+            enabled=enabled
+        )
+
+    def sessions_to_keep(self, sessions: Iterable[Tuple[int, str, Optional[str]]],
+                         now: Optional[datetime.datetime] = None) -> Set[int]:
+        """Select the sessions of one lineage to keep from (session id, timestamp, name) tuples."""
+        now = now or datetime.datetime.now()
+        ordered: List[Tuple[int, Optional[datetime.datetime], Optional[str]]] = sorted(
+            ((session_id, self._parse(timestamp), name) for session_id, timestamp, name in sessions),
+            key=lambda session: session[0], reverse=True
+        )
+        keep = {session_id for session_id, _, _ in ordered[:self.keep_last]}
+        daily_cutoff = (now - datetime.timedelta(days=self.daily_days)).date() if self.daily_days else None
+        seen_periods = set()
+        for session_id, saved_at, name in ordered:
+            if self.keep_named and name:
+                keep.add(session_id)
+            if saved_at is None:
+                # Unparseable timestamps are never pruned.
+                keep.add(session_id)
+                continue
+            if daily_cutoff is not None and saved_at.date() >= daily_cutoff:
+                period = ('day', saved_at.date())
+            elif self.monthly:
+                period = ('month', saved_at.year, saved_at.month)
+            else:
+                continue
+            if period not in seen_periods:
+                seen_periods.add(period)
+                keep.add(session_id)
+        return keep
+
+    @classmethod
+    def _parse(cls, timestamp: Optional[str]) -> Optional[datetime.datetime]:
+        try:
+            return datetime.datetime.strptime(timestamp, cls.TIMESTAMP_FORMAT)
+        except (TypeError, ValueError):
+            return None
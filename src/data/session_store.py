@@ -1,72 +1,1015 @@
+import sys
 import sqlite3
 import json
+import hashlib
 import datetime
-from typing import Dict, List, Tuple, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Any, Iterable, Iterator, Optional, BinaryIO, Callable
 import streamlit as st
-from src.data.repository import SessionRepository
+from src.data.repository import SessionRepository, SessionConflictError
+from src.data.connection import SQLiteConnectionManager
+from src.data.blob_store import BlobStore
+from src.data.catalog import SessionCatalog
+from src.data.retention import RetentionPolicy
+from src.data.journal import SessionJournal, EVENT_ADD_ISP, EVENT_CLASSIFY, EVENT_KEYWORD_DONE
+from src.data.archive import ProjectArchiveWriter, ProjectArchiveReader
+from src.data.lazy_session import LazySessionLoader
+from src.data.merge import SessionMerger
+from src.domain.metrics import MetricsAggregate
+
+SESSION_STATE_FIELDS = ('current_isp_id', 'next_isp_id', 'language', 'context_mode', 'selected_model', 'session_name',
+                        'metrics')
+ISP_CORE_FIELDS = ('name', 'text', 'analysis_results')
+ISP_TRANSIENT_FIELDS = ('hydrated', 'summary')
+
 
 class SQLiteSessionRepository(SessionRepository):
-    """SQLite implementation of session repository."""
-    
-    def __init__(self, database_file: str = "session_state.db"):
+    """SQLite implementation of session repository.
+
+    Sessions are stored in normalized tables, with ISP texts kept once each in a
+    compressed, content-addressed blob table. Each saved session only holds the rows
+    that changed relative to its parent session (the session the data was loaded
+    from); a session is rebuilt by walking its parent chain and keeping the newest
+    row for every key. A row with a NULL value marks a removal. A catalog row with
+    the name, counts and size of every session is written at save time, so sessions
+    can be listed and searched without resolving them.
+
+    Chains are capped at `max_chain_length` sessions: a save that would make its
+    chain longer is flattened into a new base, so loading any session reads a
+    bounded number of deltas. Old sessions are pruned by a RetentionPolicy; the
+    rows of a pruned session are folded into its children first, so every kept
+    session still resolves to exactly what was saved.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            session_data TEXT
+        );
+        CREATE TABLE IF NOT EXISTS isps (
+            session_id INTEGER NOT NULL,
+            isp_id INTEGER NOT NULL,
+            since_session_id INTEGER,
+            name TEXT,
+            text_hash TEXT,
+            keywords TEXT,
+            analyzed_keywords TEXT,
+            extra TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (session_id, isp_id)
+        );
+        CREATE TABLE IF NOT EXISTS occurrences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            occurrence_hash TEXT NOT NULL UNIQUE,
+            occurrence TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS classifications (
+            session_id INTEGER NOT NULL,
+            isp_id INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            occurrence_id INTEGER NOT NULL,
+            label TEXT,
+            seq INTEGER,
+            PRIMARY KEY (session_id, isp_id, keyword, occurrence_id)
+        );
+        CREATE TABLE IF NOT EXISTS classification_metadata (
+            session_id INTEGER NOT NULL,
+            isp_id INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            occurrence_id INTEGER NOT NULL,
+            data TEXT,
+            PRIMARY KEY (session_id, isp_id, keyword, occurrence_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_parent ON sessions (parent_id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_lineage ON sessions (lineage_id);
+    """
+
+    _CHAIN_CTE = """
+        WITH RECURSIVE chain(id) AS (
+            SELECT ?
+            UNION ALL
+            SELECT s.parent_id FROM sessions s JOIN chain ON s.id = chain.id
+            WHERE s.parent_id IS NOT NULL
+        )
+    """
+
+    # Resolved session rows are kept for the most recently saved/loaded sessions so a
+    # save does not need to re-read its parent from disk.
+    _resolved_cache: 'OrderedDict[Tuple[str, int], Dict[str, Any]]' = OrderedDict()
+    _resolved_cache_size = 4
+    _cache_lock = threading.Lock()
+
+    # At most one background maintenance run (pruning, garbage collection, VACUUM) at a time.
+    _maintenance_lock = threading.Lock()
+
+    # VACUUM once more than this share of the database file is free pages.
+    vacuum_free_ratio = 0.25
+
+    def __init__(self, database_file: str = "session_state.db", blob_codec: Optional[str] = None,
+                 blob_level: Optional[int] = None, max_chain_length: int = 32):
         self.database_file = database_file
-    
+        self.db = SQLiteConnectionManager.for_database(database_file)
+        self.blobs = BlobStore(blob_codec, blob_level)
+        self.catalog = SessionCatalog()
+        self.max_chain_length = max_chain_length
+        self._initialized = False
+
     def initialize(self) -> None:
-        """Initialize SQLite database and create sessions table if it does not exist."""
-        conn = sqlite3.connect(self.database_file, check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                session_data TEXT
+        """Initialize the SQLite database, upgrading older single-blob databases in place."""
+        if self._initialized:
+            return
+        with self.db.connection() as conn:
+            with self.db.transaction():
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp TEXT,
+                        session_data TEXT
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+                if 'parent_id' not in columns:
+                    conn.execute("ALTER TABLE sessions ADD COLUMN parent_id INTEGER")
+                if 'state' not in columns:
+                    conn.execute("ALTER TABLE sessions ADD COLUMN state TEXT")
+                if 'lineage_id' not in columns:
+                    conn.execute("ALTER TABLE sessions ADD COLUMN lineage_id INTEGER")
+                for statement in self._SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                self.blobs.initialize(conn)
+                self.blobs.migrate_table(conn, "isp_texts", "text_hash", "text")
+                self.catalog.initialize(conn)
+            self._migrate_legacy_sessions(conn)
+            self._backfill_lineage(conn)
+            self._backfill_catalog(conn)
+        self._initialized = True
+
+    def _migrate_legacy_sessions(self, conn: sqlite3.Connection) -> None:
+        """Convert sessions stored as a single JSON blob into normalized rows."""
+        legacy_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM sessions WHERE session_data IS NOT NULL ORDER BY id"
+        )]
+        for session_id in legacy_ids:
+            row = conn.execute("SELECT session_data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            session_data = json.loads(row[0])
+            with self.db.transaction():
+                conn.execute(
+                    "UPDATE sessions SET session_data = NULL, parent_id = NULL, state = ? WHERE id = ?",
+                    (self._encode_state(session_data), session_id)
+                )
+                self._write_rows(conn, session_id, session_data, self._empty_resolved())
+
+    def _backfill_lineage(self, conn: sqlite3.Connection) -> None:
+        """Give each session without a lineage the lineage of its parent, or its own id."""
+        rows = conn.execute("SELECT id, parent_id FROM sessions WHERE lineage_id IS NULL ORDER BY id").fetchall()
+        if not rows:
+            return
+        with self.db.transaction():
+            for session_id, parent_id in rows:
+                conn.execute(
+                    "UPDATE sessions SET lineage_id = COALESCE("
+                    "(SELECT lineage_id FROM sessions WHERE id = ?), ?) WHERE id = ?",
+                    (parent_id, session_id, session_id)
+                )
+
+    def _backfill_catalog(self, conn: sqlite3.Connection) -> None:
+        """Add catalog rows for sessions saved before the catalog existed."""
+        for session_id in self.catalog.missing_session_ids(conn):
+            with self.db.transaction():
+                row = conn.execute("SELECT timestamp, state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                resolved = self._resolve(conn, session_id, isp_ids=set())
+                self.catalog.record(conn, self._catalog_entry(
+                    conn, session_id, row[0], json.loads(row[1] or "{}"), resolved))
+
+    def _catalog_entry(self, conn: sqlite3.Connection, session_id: int, timestamp: str,
+                       state: Dict[str, Any], resolved: Dict[str, Any], parent_id: Optional[int] = None,
+                       parent: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Summarize a session for the catalog from its resolved ISP rows and label counts.
+
+        When the parent's resolved rows are given and the parent has a catalog row,
+        the counts and size are the parent's, adjusted by the ISPs this save
+        resolved; otherwise they are counted over the whole chain.
+        """
+        parent_entry = self.catalog.get(conn, parent_id) if parent is not None else None
+        if parent_entry is not None:
+            classified_count, byte_size = self._catalog_delta(conn, parent_id, parent, resolved)
+            classified_count += parent_entry['classified_count']
+            byte_size += parent_entry['byte_size']
+        else:
+            classified_count = 0
+            byte_size = self._blob_size(conn, {isp['text_hash'] for isp in resolved['isps'].values()})
+            for _, _, _, count, occurrence_bytes in self._count_classifications(conn, session_id):
+                classified_count += count
+                byte_size += occurrence_bytes or 0
+        isp_names = [resolved['isps'][isp_id]['name'] or "" for isp_id in sorted(resolved['isps'])]
+        return {
+            'session_id': session_id,
+            'name': state.get('session_name') or None,
+            'timestamp': timestamp,
+            'isp_count': len(isp_names),
+            'classified_count': classified_count,
+            'language': state.get('language'),
+            'model': state.get('selected_model'),
+            'byte_size': byte_size,
+            'isp_names': ", ".join(isp_names)
+        }
+
+    def _catalog_delta(self, conn: sqlite3.Connection, parent_id: int, parent: Dict[str, Any],
+                       resolved: Dict[str, Any]) -> Tuple[int, int]:
+        """Change in classified count and byte size from the resolved parent to the resolved session.
+
+        Stub ISPs resolved in neither state are unchanged and skipped; only deleted
+        ISPs outside the parent's resolved scope are counted from the chain.
+        """
+        def totals(keywords: Dict[str, Dict[str, Tuple]]) -> Tuple[int, int]:
+            count = sum(len(rows) for rows in keywords.values())
+            return count, sum(len(occurrence) for rows in keywords.values() for occurrence in rows)
+
+        classified_count = 0
+        byte_size = 0
+        uncounted = []
+        for isp_id in parent['isps']:
+            if isp_id in resolved['isps'] and isp_id not in resolved['classifications']:
+                continue
+            if parent['scope'] is not None and isp_id not in parent['scope']:
+                uncounted.append(isp_id)
+                continue
+            count, size = totals(parent['classifications'].get(isp_id, {}))
+            classified_count -= count
+            byte_size -= size
+        for keywords in resolved['classifications'].values():
+            count, size = totals(keywords)
+            classified_count += count
+            byte_size += size
+        if uncounted:
+            for _, _, _, count, occurrence_bytes in self._count_classifications(conn, parent_id, uncounted):
+                classified_count -= count
+                byte_size -= occurrence_bytes or 0
+
+        old_hashes = {isp['text_hash'] for isp in parent['isps'].values()}
+        new_hashes = {isp['text_hash'] for isp in resolved['isps'].values()}
+        byte_size += self._blob_size(conn, new_hashes - old_hashes) - self._blob_size(conn, old_hashes - new_hashes)
+        return classified_count, byte_size
+
+    @staticmethod
+    def _blob_size(conn: sqlite3.Connection, text_hashes: Iterable[str]) -> int:
+        """Total size of the stored texts with the given hashes."""
+        text_hashes = sorted(text_hash for text_hash in text_hashes if text_hash)
+        size = 0
+        for start in range(0, len(text_hashes), 500):
+            chunk = text_hashes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            size += conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM blobs WHERE hash IN ({placeholders})", chunk
+            ).fetchone()[0]
+        return size
+
+    def save_session(self, session_data: Dict[str, Any], parent_id: Optional[int] = None,
+                     expected_head: Optional[int] = None) -> Tuple[int, str]:
+        """Save the session data, writing only the rows that changed since the parent session.
+
+        With expected_head, the head of the parent's lineage is checked in the same
+        write transaction, so two analysts cannot both save over the same head.
+        """
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        isps = session_data.get('isps', {})
+        stub_ids = {int(isp_id) for isp_id, isp in isps.items() if self.is_stub(isp)}
+        scope = {int(isp_id) for isp_id in isps} - stub_ids if stub_ids else None
+
+        def write(conn: sqlite3.Connection) -> Tuple[int, Dict[str, Any]]:
+            parent = parent_id
+            if parent is not None and conn.execute(
+                    "SELECT 1 FROM sessions WHERE id = ?", (parent,)).fetchone() is None:
+                parent = None
+            if parent is None and stub_ids:
+                raise ValueError("Cannot save ISPs that were never loaded without the session they came from.")
+            if parent is not None and expected_head is not None:
+                head = self._head(conn, parent)
+                if head != expected_head:
+                    raise SessionConflictError(expected_head, head)
+            resolved_parent = self._resolve(conn, parent, scope) if parent is not None else self._empty_resolved()
+
+            cursor = conn.execute(
+                "INSERT INTO sessions (timestamp, parent_id, state, lineage_id) "
+                "VALUES (?, ?, ?, (SELECT lineage_id FROM sessions WHERE id = ?))",
+                (timestamp, parent, self._encode_state(session_data), parent)
             )
-        """)
-        conn.commit()
-        conn.close()
-    
-    def save_session(self, session_data: Dict[str, Any]) -> str:
-        """Save the session data to the SQLite database."""
-        json_data = json.dumps(session_data, ensure_ascii=False, indent=2)
+            session_id = cursor.lastrowid
+            if parent is None:
+                conn.execute("UPDATE sessions SET lineage_id = ? WHERE id = ?", (session_id, session_id))
+            resolved = self._write_rows(conn, session_id, session_data, resolved_parent)
+            if parent is not None and self._chain_length(conn, session_id) > self.max_chain_length:
+                self._flatten(conn, session_id)
+            self.catalog.record(conn, self._catalog_entry(
+                conn, session_id, timestamp, session_data, resolved, parent, resolved_parent))
+            return session_id, resolved
+
+        session_id, resolved = self.db.run(write, write=True)
+        self._cache_put(session_id, resolved)
+        return session_id, timestamp
+
+    def save_new_session(self, state: Dict[str, Any],
+                         read_isps: Callable[[], Iterator[Tuple[int, Dict[str, Any], List[str], Dict[str, Any]]]]
+                         ) -> Tuple[int, str]:
+        """Save a new session without a parent from ISPs that are read one at a time.
+
+        read_isps() yields (isp id, isp dict, analyzed keywords, metadata keyed by
+        'keyword::occurrence'); it is called again if the write has to be retried.
+        Each ISP's rows are written before the next one is read, so only one ISP is
+        held in memory, which suits importing large project archives.
+        """
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = sqlite3.connect(self.database_file, check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO sessions (timestamp, session_data) VALUES (?, ?)", 
-                      (timestamp, json_data))
-        conn.commit()
-        conn.close()
-        return timestamp
-    
+
+        def write(conn: sqlite3.Connection) -> int:
+            session_id = conn.execute(
+                "INSERT INTO sessions (timestamp, parent_id, state) VALUES (?, NULL, ?)",
+                (timestamp, self._encode_state(state))
+            ).lastrowid
+            conn.execute("UPDATE sessions SET lineage_id = ? WHERE id = ?", (session_id, session_id))
+            # Only the ISP rows are kept for the catalog; classifications are counted from the database.
+            resolved = self._empty_resolved()
+            for isp_id, isp, analyzed_keywords, metadata in read_isps():
+                written = self._write_rows(conn, session_id, {
+                    'isps': {isp_id: isp},
+                    'analyzed_keywords': {isp_id: analyzed_keywords},
+                    'classification_metadata': {f"{isp_id}::{key}": value for key, value in metadata.items()}
+                }, self._empty_resolved())
+                resolved['isps'].update(written['isps'])
+            self.catalog.record(conn, self._catalog_entry(conn, session_id, timestamp, state, resolved))
+            return session_id
+
+        return self.db.run(write, write=True), timestamp
+
+    def get_head(self, session_id: int) -> Optional[int]:
+        """Get the newest session in the lineage of session_id, or None if it no longer exists."""
+        self.initialize()
+        return self.db.run(lambda conn: self._head(conn, session_id))
+
+    @staticmethod
+    def _head(conn: sqlite3.Connection, session_id: int) -> Optional[int]:
+        return conn.execute(
+            "SELECT MAX(id) FROM sessions WHERE lineage_id = (SELECT lineage_id FROM sessions WHERE id = ?)",
+            (session_id,)
+        ).fetchone()[0]
+
+    def classification_versions(self, session_id: int) -> Dict[Tuple[int, str, str], int]:
+        """Get the session that last wrote each classification of a session.
+
+        A classification's version is the session its newest row in the chain
+        belongs to; rows folded into a new base by flattening or pruning take the
+        version of that base.
+        """
+        self.initialize()
+
+        def read(conn: sqlite3.Connection) -> Dict[Tuple[int, str, str], int]:
+            since = {isp_id: since_id for isp_id, since_id in conn.execute(
+                self._CHAIN_CTE + """
+                SELECT isp_id, since_session_id FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY isp_id ORDER BY session_id DESC) AS rn
+                    FROM isps WHERE session_id IN (SELECT id FROM chain)
+                ) WHERE rn = 1 AND deleted = 0
+                """, (session_id,))}
+            versions = {}
+            for row_session, isp_id, keyword, occurrence in conn.execute(
+                    self._CHAIN_CTE + """
+                    SELECT c.session_id, c.isp_id, c.keyword, o.occurrence
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (
+                            PARTITION BY isp_id, keyword, occurrence_id ORDER BY session_id DESC) AS rn
+                        FROM classifications WHERE session_id IN (SELECT id FROM chain)
+                    ) c JOIN occurrences o ON o.id = c.occurrence_id
+                    WHERE c.rn = 1 AND c.label IS NOT NULL
+                    """, (session_id,)):
+                if isp_id in since and row_session >= (since[isp_id] or 0):
+                    versions[(isp_id, keyword, occurrence)] = row_session
+            return versions
+
+        return self.db.run(read)
+
+    # Chains and retention
+
+    def _chain_length(self, conn: sqlite3.Connection, session_id: int) -> int:
+        return conn.execute(self._CHAIN_CTE + "SELECT COUNT(*) FROM chain", (session_id,)).fetchone()[0]
+
+    def _fold_parent(self, conn: sqlite3.Connection, session_id: int) -> None:
+        """Copy the rows of a session's parent into it and link it to its grandparent instead.
+
+        The session's own rows are newer and win. Classification and metadata rows of
+        an ISP that the session deleted or started over are skipped, since resolving
+        would have ignored them anyway.
+        """
+        parent_id = conn.execute("SELECT parent_id FROM sessions WHERE id = ?", (session_id,)).fetchone()[0]
+        if parent_id is None:
+            return
+        conn.execute(
+            "INSERT OR IGNORE INTO isps (session_id, isp_id, since_session_id, name, text_hash, keywords, "
+            "analyzed_keywords, extra, deleted) SELECT ?, isp_id, since_session_id, name, text_hash, keywords, "
+            "analyzed_keywords, extra, deleted FROM isps WHERE session_id = ?", (session_id, parent_id)
+        )
+        superseded = (
+            " NOT EXISTS (SELECT 1 FROM isps i WHERE i.session_id = ? AND i.isp_id = r.isp_id"
+            " AND (i.deleted = 1 OR i.since_session_id > ?))"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO classifications (session_id, isp_id, keyword, occurrence_id, label, seq) "
+            "SELECT ?, r.isp_id, r.keyword, r.occurrence_id, r.label, r.seq FROM classifications r "
+            "WHERE r.session_id = ? AND" + superseded, (session_id, parent_id, session_id, parent_id)
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO classification_metadata (session_id, isp_id, keyword, occurrence_id, data) "
+            "SELECT ?, r.isp_id, r.keyword, r.occurrence_id, r.data FROM classification_metadata r "
+            "WHERE r.session_id = ? AND" + superseded, (session_id, parent_id, session_id, parent_id)
+        )
+        grandparent_id = conn.execute("SELECT parent_id FROM sessions WHERE id = ?", (parent_id,)).fetchone()[0]
+        conn.execute("UPDATE sessions SET parent_id = ? WHERE id = ?", (grandparent_id, session_id))
+        if grandparent_id is None:
+            self._drop_tombstones(conn, session_id)
+
+    @staticmethod
+    def _drop_tombstones(conn: sqlite3.Connection, session_id: int) -> None:
+        """Remove removal markers from a session without a parent, where there is nothing to remove."""
+        conn.execute("DELETE FROM isps WHERE session_id = ? AND deleted = 1", (session_id,))
+        conn.execute("DELETE FROM classifications WHERE session_id = ? AND label IS NULL", (session_id,))
+        conn.execute("DELETE FROM classification_metadata WHERE session_id = ? AND data IS NULL", (session_id,))
+
+    def _flatten(self, conn: sqlite3.Connection, session_id: int) -> None:
+        """Turn a session into a base holding all of its rows, ending its parent chain."""
+        while conn.execute("SELECT parent_id FROM sessions WHERE id = ?", (session_id,)).fetchone()[0] is not None:
+            self._fold_parent(conn, session_id)
+
+    def delete_session(self, session_id: int) -> bool:
+        """Delete a session, folding its rows into its children so they stay intact."""
+        deleted = self.db.run(lambda conn: self._delete_session(conn, session_id), write=True)
+        self._cache_evict(session_id)
+        return deleted
+
+    def _delete_session(self, conn: sqlite3.Connection, session_id: int) -> bool:
+        if conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is None:
+            return False
+        for (child_id,) in conn.execute("SELECT id FROM sessions WHERE parent_id = ?", (session_id,)).fetchall():
+            self._fold_parent(conn, child_id)
+        for table in ("isps", "classifications", "classification_metadata"):
+            conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self.catalog.remove(conn, session_id)
+        return True
+
+    def prune_sessions(self, policy: Optional[RetentionPolicy] = None, protect: Iterable[int] = ()) -> List[int]:
+        """Delete the sessions the retention policy does not keep and return their ids.
+
+        Sessions in protect (for example sessions analysts currently have loaded)
+        are always kept.
+        """
+        policy = policy or RetentionPolicy.from_env()
+        if not policy.enabled:
+            return []
+        protected = set(protect)
+
+        def prune(conn: sqlite3.Connection) -> List[int]:
+            lineages: Dict[int, List[Tuple[int, str, Optional[str]]]] = {}
+            for session_id, lineage_id, timestamp, name in conn.execute(
+                    "SELECT s.id, s.lineage_id, s.timestamp, c.name FROM sessions s "
+                    "LEFT JOIN session_catalog c ON c.session_id = s.id"):
+                lineages.setdefault(lineage_id or session_id, []).append((session_id, timestamp, name))
+            deleted = []
+            for sessions in lineages.values():
+                keep = policy.sessions_to_keep(sessions) | protected
+                for session_id, _, _ in sorted(sessions):
+                    if session_id not in keep and self._delete_session(conn, session_id):
+                        deleted.append(session_id)
+            return deleted
+
+        deleted = self.db.run(prune, write=True)
+        for session_id in deleted:
+            self._cache_evict(session_id)
+        return deleted
+
+    def collect_garbage(self) -> Tuple[int, int]:
+        """Delete texts and occurrences no session refers to; return how many of each were removed."""
+        def collect(conn: sqlite3.Connection) -> Tuple[int, int]:
+            blobs = conn.execute(
+                "DELETE FROM blobs WHERE hash NOT IN (SELECT text_hash FROM isps WHERE text_hash IS NOT NULL)"
+            ).rowcount
+            occurrences = conn.execute(
+                "DELETE FROM occurrences WHERE id NOT IN ("
+                "SELECT occurrence_id FROM classifications UNION SELECT occurrence_id FROM classification_metadata)"
+            ).rowcount
+            return blobs, occurrences
+
+        return self.db.run(collect, write=True)
+
+    def compact(self) -> bool:
+        """Collect garbage and VACUUM if enough of the database file is free pages. Returns whether it vacuumed."""
+        self.collect_garbage()
+        page_count, free_pages = self.db.run(lambda conn: (
+            conn.execute("PRAGMA page_count").fetchone()[0],
+            conn.execute("PRAGMA freelist_count").fetchone()[0]
+        ))
+        if not page_count or free_pages / page_count < self.vacuum_free_ratio:
+            return False
+        self.db.vacuum()
+        return True
+
+    def run_maintenance(self, policy: Optional[RetentionPolicy] = None, protect: Iterable[int] = ()) -> List[int]:
+        """Prune sessions and, if any were pruned, compact the database."""
+        deleted = self.prune_sessions(policy, protect)
+        if deleted:
+            self.compact()
+        return deleted
+
+    def schedule_maintenance(self, policy: Optional[RetentionPolicy] = None, protect: Iterable[int] = ()) -> bool:
+        """Run maintenance on a background thread unless a run is already in progress."""
+        if not self._maintenance_lock.acquire(blocking=False):
+            return False
+        protect = set(protect)
+
+        def maintain():
+            try:
+                self.run_maintenance(policy, protect)
+            except sqlite3.Error as e:
+                print(f"Error during session maintenance: {e}", file=sys.stderr)
+            finally:
+                self._maintenance_lock.release()
+
+        threading.Thread(target=maintain, name="session-maintenance", daemon=True).start()
+        return True
+
     def get_sessions(self) -> List[Tuple[int, str]]:
         """Retrieve a list of saved sessions (id and timestamp) from the database."""
-        conn = sqlite3.connect(self.database_file, check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, timestamp FROM sessions ORDER BY id DESC")
-        sessions = cursor.fetchall()
-        conn.close()
-        return sessions
-    
+        return self.db.run(lambda conn: conn.execute(
+            "SELECT id, timestamp FROM sessions ORDER BY id DESC"
+        ).fetchall())
+
+    def get_lineage_heads(self) -> List[int]:
+        """Get the newest session of every lineage, newest first."""
+        return [row[0] for row in self.db.run(lambda conn: conn.execute(
+            "SELECT MAX(id) FROM sessions GROUP BY COALESCE(lineage_id, id) ORDER BY 1 DESC"
+        ).fetchall())]
+
+    def search_sessions(self, query: str = "", limit: int = 20,
+                        offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Search the session catalog by name, ISP names, language or model, newest first."""
+        return self.db.run(lambda conn: self.catalog.search(conn, query, limit, offset))
+
     def load_session(self, session_id: int) -> Optional[Dict[str, Any]]:
         """Load a session from the database using the provided session ID."""
-        conn = sqlite3.connect(self.database_file, check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute("SELECT session_data FROM sessions WHERE id = ?", (session_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return json.loads(row[0])
-        return None
+        def read(conn: sqlite3.Connection):
+            row = conn.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            resolved = self._resolve(conn, session_id)
+            texts = self.blobs.get_many(conn, (isp['text_hash'] for isp in resolved['isps'].values()))
+            return row, resolved, texts
+
+        loaded = self.db.run(read)
+        if loaded is None:
+            return None
+        row, resolved, texts = loaded
+        self._cache_put(session_id, resolved)
+        return self._build_session_data(json.loads(row[0] or "{}"), resolved, texts)
+
+    def load_session_manifest(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """Load session state and ISP stubs with per-keyword AA/OI counts, without texts or occurrences."""
+        def read(conn: sqlite3.Connection):
+            row = conn.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            resolved = self._resolve(conn, session_id, isp_ids=set())
+            summaries = {isp_id: {'AA': {}, 'OI': {}} for isp_id in resolved['isps']}
+            for isp_id, keyword, label, count, _ in self._count_classifications(conn, session_id):
+                summaries[isp_id][label][keyword] = count
+            return row, resolved, summaries
+
+        loaded = self.db.run(read)
+        if loaded is None:
+            return None
+        row, resolved, summaries = loaded
+        session_data = self._build_session_data(json.loads(row[0] or "{}"), resolved, {})
+        for isp_id, isp in session_data['isps'].items():
+            summary = summaries[isp_id]
+            for keyword in json.loads(resolved['isps'][isp_id]['keywords'] or "[]"):
+                summary['AA'].setdefault(keyword, 0)
+                summary['OI'].setdefault(keyword, 0)
+            session_data['isps'][isp_id] = self.isp_stub(isp, summary)
+        return session_data
+
+    def _count_classifications(self, conn: sqlite3.Connection, session_id: int,
+                               isp_ids: Optional[Iterable[int]] = None) -> List[Tuple]:
+        """Count the resolved labels of a session as (isp_id, keyword, label, count, occurrence bytes).
+
+        When isp_ids is given, only the labels of those ISPs are counted.
+        """
+        scope_filter = ""
+        scope_params = ()
+        if isp_ids is not None:
+            scope_filter = " AND isp_id IN (SELECT value FROM json_each(?))"
+            scope_params = (json.dumps(sorted(isp_ids)),)
+        return conn.execute(
+            self._CHAIN_CTE + """,
+            live AS (
+                SELECT isp_id, since_session_id FROM (
+                    SELECT isp_id, since_session_id, deleted,
+                           ROW_NUMBER() OVER (PARTITION BY isp_id ORDER BY session_id DESC) AS rn
+                    FROM isps WHERE session_id IN (SELECT id FROM chain)
+                ) WHERE rn = 1 AND deleted = 0
+            )
+            SELECT c.isp_id, c.keyword, c.label, COUNT(*), SUM(length(o.occurrence))
+            FROM (
+                SELECT isp_id, keyword, occurrence_id, label, session_id, ROW_NUMBER() OVER (
+                    PARTITION BY isp_id, keyword, occurrence_id ORDER BY session_id DESC) AS rn
+                FROM classifications WHERE session_id IN (SELECT id FROM chain)""" + scope_filter + """
+            ) c JOIN live ON live.isp_id = c.isp_id
+            JOIN occurrences o ON o.id = c.occurrence_id
+            WHERE c.rn = 1 AND c.label IS NOT NULL AND c.session_id >= live.since_session_id
+            GROUP BY c.isp_id, c.keyword, c.label
+            """, (session_id,) + scope_params).fetchall()
+
+    def load_isp(self, session_id: int, isp_id: int) -> Optional[Dict[str, Any]]:
+        """Load a single ISP of a session with its text, occurrences and metadata."""
+        def read(conn: sqlite3.Connection):
+            resolved = self._resolve(conn, session_id, isp_ids={isp_id})
+            row = resolved['isps'].get(isp_id)
+            if row is None:
+                return None
+            return resolved, self.blobs.get_many(conn, [row['text_hash']])
+
+        loaded = self.db.run(read)
+        if loaded is None:
+            return None
+        resolved, texts = loaded
+        single = self._empty_resolved()
+        single['isps'][isp_id] = resolved['isps'][isp_id]
+        single['classifications'][isp_id] = resolved['classifications'].get(isp_id, {})
+        single['metadata'][isp_id] = resolved['metadata'].get(isp_id, {})
+        session_data = self._build_session_data({}, single, texts)
+        return {
+            'isp': session_data['isps'][isp_id],
+            'analyzed_keywords': session_data['analyzed_keywords'][isp_id],
+            'classification_metadata': session_data['classification_metadata']
+        }
+
+    # Writing
+
+    @staticmethod
+    def _encode_state(session_data: Dict[str, Any]) -> str:
+        return json.dumps({field: session_data.get(field) for field in SESSION_STATE_FIELDS}, ensure_ascii=False)
+
+    @staticmethod
+    def _hash(value: str) -> str:
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _empty_resolved() -> Dict[str, Any]:
+        """Resolved session rows.
+
+        'isps' maps isp_id to its row fields, 'classifications' maps
+        isp_id -> keyword -> occurrence -> (label, seq, occurrence_id) and
+        'metadata' maps isp_id -> (keyword, occurrence) -> (data, occurrence_id).
+        'scope' is None when classifications and metadata were resolved for every
+        ISP, or the set of ISP ids they were resolved for.
+        """
+        return {'isps': {}, 'classifications': {}, 'metadata': {}, 'scope': None}
+
+    def _occurrence_ids(self, conn: sqlite3.Connection, occurrences: List[str]) -> Dict[str, int]:
+        """Return ids for occurrence strings, inserting the ones not stored yet."""
+        hashes = {occurrence: self._hash(occurrence) for occurrence in set(occurrences)}
+        conn.executemany(
+            "INSERT OR IGNORE INTO occurrences (occurrence_hash, occurrence) VALUES (?, ?)",
+            [(occurrence_hash, occurrence) for occurrence, occurrence_hash in hashes.items()]
+        )
+        by_hash = {occurrence_hash: occurrence for occurrence, occurrence_hash in hashes.items()}
+        hash_list = list(by_hash)
+        ids = {}
+        for i in range(0, len(hash_list), 500):
+            chunk = hash_list[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for occurrence_id, occurrence_hash in conn.execute(
+                    f"SELECT id, occurrence_hash FROM occurrences WHERE occurrence_hash IN ({placeholders})", chunk):
+                ids[by_hash[occurrence_hash]] = occurrence_id
+        return ids
+
+    @staticmethod
+    def _plan_keyword(results: Dict[str, List[str]], previous: Dict[str, Tuple]) -> Dict[str, Tuple]:
+        """Assign (label, seq, occurrence_id, changed) to every occurrence of one keyword.
+
+        Unchanged occurrences keep their previous seq as long as list order is preserved;
+        appended or reordered occurrences get new, larger seq values.
+        """
+        planned = {}
+        next_seq = max((value[1] for value in previous.values()), default=-1) + 1
+        for label in ("AA", "OI"):
+            last_seq = -1
+            for occurrence in results.get(label, []):
+                if occurrence in planned:
+                    continue
+                prev = previous.get(occurrence)
+                if prev is not None and prev[0] == label and prev[1] > last_seq:
+                    planned[occurrence] = (label, prev[1], prev[2], False)
+                else:
+                    planned[occurrence] = (label, next_seq, prev[2] if prev else None, True)
+                    next_seq += 1
+                last_seq = planned[occurrence][1]
+        return planned
+
+    def _write_rows(self, conn: sqlite3.Connection, session_id: int, session_data: Dict[str, Any],
+                    parent: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the rows of session_data that differ from the resolved parent state.
+
+        Returns the resolved state of the new session.
+        """
+        resolved = self._empty_resolved()
+        isp_rows = []
+        class_changes = []
+        meta_changes = []
+        analyzed_keywords = {str(k): v for k, v in session_data.get('analyzed_keywords', {}).items()}
+        isps = {int(isp_id): isp for isp_id, isp in session_data.get('isps', {}).items()}
+
+        stubs = {isp_id for isp_id, isp in isps.items() if self.is_stub(isp) and isp_id in parent['isps']}
+        if stubs:
+            resolved['scope'] = set(isps) - stubs
+
+        for isp_id, isp in isps.items():
+            if isp_id in stubs:
+                # Not hydrated, so unchanged since the parent: nothing to write.
+                resolved['isps'][isp_id] = parent['isps'][isp_id]
+                if parent['scope'] is None or isp_id in parent['scope']:
+                    resolved['classifications'][isp_id] = parent['classifications'].get(isp_id, {})
+                    resolved['metadata'][isp_id] = parent['metadata'].get(isp_id, {})
+                    if resolved['scope'] is not None:
+                        resolved['scope'].add(isp_id)
+                continue
+
+            text = isp.get('text', '')
+            text_hash = self.blobs.hash(text)
+            previous = parent['isps'].get(isp_id)
+            if previous is None or previous['text_hash'] != text_hash:
+                self.blobs.put(conn, text, text_hash)
+
+            analysis_results = isp.get('analysis_results', {})
+            row = {
+                'name': isp.get('name'),
+                'text_hash': text_hash,
+                'keywords': json.dumps(list(analysis_results.keys()), ensure_ascii=False),
+                'analyzed_keywords': json.dumps(sorted(analyzed_keywords.get(str(isp_id), [])), ensure_ascii=False),
+                'extra': json.dumps({k: v for k, v in isp.items()
+                                     if k not in ISP_CORE_FIELDS and k not in ISP_TRANSIENT_FIELDS},
+                                    ensure_ascii=False, sort_keys=True)
+            }
+            same_instance = previous is not None and previous['text_hash'] == text_hash and previous['name'] == row['name']
+            row['since_session_id'] = previous['since_session_id'] if same_instance else session_id
+            resolved['isps'][isp_id] = row
+
+            if not same_instance or any(previous[k] != row[k] for k in ('keywords', 'analyzed_keywords', 'extra')):
+                isp_rows.append((session_id, isp_id, row['since_session_id'], row['name'], text_hash,
+                                 row['keywords'], row['analyzed_keywords'], row['extra'], 0))
+
+            previous_keywords = parent['classifications'].get(isp_id, {}) if same_instance else {}
+            isp_classifications = resolved['classifications'].setdefault(isp_id, {})
+            for keyword, results in analysis_results.items():
+                previous_rows = previous_keywords.get(keyword, {})
+                planned = self._plan_keyword(results, previous_rows)
+                isp_classifications[keyword] = {}
+                for occurrence, (label, seq, occurrence_id, changed) in planned.items():
+                    isp_classifications[keyword][occurrence] = (label, seq, occurrence_id)
+                    if changed:
+                        class_changes.append((isp_id, keyword, occurrence, label, seq))
+            for keyword, previous_rows in previous_keywords.items():
+                current = isp_classifications.get(keyword, {})
+                for occurrence, (label, seq, occurrence_id) in previous_rows.items():
+                    if occurrence not in current:
+                        class_changes.append((isp_id, keyword, occurrence, None, None))
+
+            resolved['metadata'][isp_id] = {}
+
+        for isp_id in parent['isps']:
+            if isp_id not in isps:
+                isp_rows.append((session_id, isp_id, None, None, None, None, None, None, 1))
+
+        for key, value in session_data.get('classification_metadata', {}).items():
+            parts = key.split("::", 2)
+            if len(parts) < 3 or not parts[0].isdigit() or int(parts[0]) not in resolved['isps'] \
+                    or int(parts[0]) in stubs:
+                continue
+            isp_id, keyword, occurrence = int(parts[0]), parts[1], parts[2]
+            data = json.dumps(value, ensure_ascii=False, sort_keys=True)
+            same_instance = resolved['isps'][isp_id]['since_session_id'] != session_id
+            previous = parent['metadata'].get(isp_id, {}).get((keyword, occurrence)) if same_instance else None
+            resolved['metadata'][isp_id][(keyword, occurrence)] = (data, previous[1] if previous else None)
+            if previous is None or previous[0] != data:
+                meta_changes.append((isp_id, keyword, occurrence, data))
+        for isp_id, previous_metadata in parent['metadata'].items():
+            if isp_id not in resolved['isps'] or isp_id in stubs \
+                    or resolved['isps'][isp_id]['since_session_id'] == session_id:
+                continue
+            for (keyword, occurrence), (data, occurrence_id) in previous_metadata.items():
+                if (keyword, occurrence) not in resolved['metadata'][isp_id]:
+                    meta_changes.append((isp_id, keyword, occurrence, None))
+
+        occurrence_ids = self._known_occurrence_ids(parent, resolved)
+        missing = [change[2] for change in class_changes + meta_changes if change[2] not in occurrence_ids]
+        if missing:
+            occurrence_ids.update(self._occurrence_ids(conn, missing))
+        self._fill_occurrence_ids(resolved, occurrence_ids)
+
+        conn.executemany(
+            "INSERT INTO isps (session_id, isp_id, since_session_id, name, text_hash, keywords, "
+            "analyzed_keywords, extra, deleted) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", isp_rows
+        )
+        conn.executemany(
+            "INSERT INTO classifications (session_id, isp_id, keyword, occurrence_id, label, seq) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(session_id, isp_id, keyword, occurrence_ids[occurrence], label, seq)
+             for isp_id, keyword, occurrence, label, seq in class_changes]
+        )
+        conn.executemany(
+            "INSERT INTO classification_metadata (session_id, isp_id, keyword, occurrence_id, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(session_id, isp_id, keyword, occurrence_ids[occurrence], data)
+             for isp_id, keyword, occurrence, data in meta_changes]
+        )
+        return resolved
+
+    @staticmethod
+    def _known_occurrence_ids(*states: Dict[str, Any]) -> Dict[str, int]:
+        """Collect occurrence ids already known from resolved states."""
+        ids = {}
+        for state in states:
+            for keywords in state['classifications'].values():
+                for rows in keywords.values():
+                    for occurrence, value in rows.items():
+                        if value[2] is not None:
+                            ids[occurrence] = value[2]
+            for rows in state['metadata'].values():
+                for (keyword, occurrence), value in rows.items():
+                    if value[1] is not None:
+                        ids[occurrence] = value[1]
+        return ids
+
+    @staticmethod
+    def _fill_occurrence_ids(resolved: Dict[str, Any], occurrence_ids: Dict[str, int]) -> None:
+        """Replace missing occurrence ids in a resolved state."""
+        for keywords in resolved['classifications'].values():
+            for rows in keywords.values():
+                for occurrence, (label, seq, occurrence_id) in rows.items():
+                    if occurrence_id is None:
+                        rows[occurrence] = (label, seq, occurrence_ids[occurrence])
+        for rows in resolved['metadata'].values():
+            for key, (data, occurrence_id) in rows.items():
+                if occurrence_id is None:
+                    rows[key] = (data, occurrence_ids[key[1]])
+
+    # Reading
+
+    def _resolve(self, conn: sqlite3.Connection, session_id: int, isp_ids: Optional[set] = None) -> Dict[str, Any]:
+        """Rebuild the rows of a session by applying its parent chain, newest row first.
+
+        When isp_ids is given, classifications and metadata are only resolved for those ISPs.
+        """
+        cached = self._cache_get(session_id, isp_ids)
+        if cached is not None:
+            return cached
+
+        resolved = self._empty_resolved()
+        scope_filter = ""
+        scope_params = ()
+        if isp_ids is not None:
+            resolved['scope'] = set(isp_ids)
+            scope_filter = " AND isp_id IN (SELECT value FROM json_each(?))"
+            scope_params = (json.dumps(sorted(isp_ids)),)
+
+        for (isp_id, since, name, text_hash, keywords, analyzed, extra, deleted) in conn.execute(
+                self._CHAIN_CTE + """
+                SELECT isp_id, since_session_id, name, text_hash, keywords, analyzed_keywords, extra, deleted
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY isp_id ORDER BY session_id DESC) AS rn
+                    FROM isps WHERE session_id IN (SELECT id FROM chain)
+                ) WHERE rn = 1
+                """, (session_id,)):
+            if deleted:
+                continue
+            resolved['isps'][isp_id] = {
+                'since_session_id': since,
+                'name': name,
+                'text_hash': text_hash,
+                'keywords': keywords,
+                'analyzed_keywords': analyzed,
+                'extra': extra
+            }
+            if isp_ids is None or isp_id in isp_ids:
+                resolved['classifications'][isp_id] = {keyword: {} for keyword in json.loads(keywords)}
+                resolved['metadata'][isp_id] = {}
+
+        for (row_session, isp_id, keyword, occurrence_id, occurrence, label, seq) in conn.execute(
+                self._CHAIN_CTE + """
+                SELECT c.session_id, c.isp_id, c.keyword, c.occurrence_id, o.occurrence, c.label, c.seq
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY isp_id, keyword, occurrence_id ORDER BY session_id DESC) AS rn
+                    FROM classifications WHERE session_id IN (SELECT id FROM chain)""" + scope_filter + """
+                ) c JOIN occurrences o ON o.id = c.occurrence_id
+                WHERE c.rn = 1 AND c.label IS NOT NULL
+                """, (session_id,) + scope_params):
+            isp = resolved['isps'].get(isp_id)
+            if isp is None or row_session < isp['since_session_id']:
+                continue
+            resolved['classifications'][isp_id].setdefault(keyword, {})[occurrence] = (label, seq, occurrence_id)
+
+        for (row_session, isp_id, keyword, occurrence_id, occurrence, data) in conn.execute(
+                self._CHAIN_CTE + """
+                SELECT m.session_id, m.isp_id, m.keyword, m.occurrence_id, o.occurrence, m.data
+                FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY isp_id, keyword, occurrence_id ORDER BY session_id DESC) AS rn
+                    FROM classification_metadata WHERE session_id IN (SELECT id FROM chain)""" + scope_filter + """
+                ) m JOIN occurrences o ON o.id = m.occurrence_id
+                WHERE m.rn = 1 AND m.data IS NOT NULL
+                """, (session_id,) + scope_params):
+            isp = resolved['isps'].get(isp_id)
+            if isp is None or row_session < isp['since_session_id']:
+                continue
+            resolved['metadata'][isp_id][(keyword, occurrence)] = (data, occurrence_id)
+
+        return resolved
+
+    @staticmethod
+    def _build_session_data(state: Dict[str, Any], resolved: Dict[str, Any], texts: Dict[str, str]) -> Dict[str, Any]:
+        """Turn resolved rows back into the session dictionary used by SessionManager."""
+        isps = {}
+        analyzed_keywords = {}
+        classification_metadata = {}
+
+        for isp_id, row in sorted(resolved['isps'].items()):
+            analysis_results = {}
+            for keyword, rows in resolved['classifications'].get(isp_id, {}).items():
+                ordered = sorted(rows.items(), key=lambda item: item[1][1])
+                analysis_results[keyword] = {
+                    'AA': [occurrence for occurrence, value in ordered if value[0] == "AA"],
+                    'OI': [occurrence for occurrence, value in ordered if value[0] == "OI"]
+                }
+            isp = {
+                'name': row['name'],
+                'text': texts.get(row['text_hash'], ''),
+                'analysis_results': analysis_results
+            }
+            isp.update(json.loads(row['extra'] or "{}"))
+            isps[isp_id] = isp
+            analyzed_keywords[isp_id] = json.loads(row['analyzed_keywords'] or "[]")
+
+            for (keyword, occurrence), (data, _) in resolved['metadata'].get(isp_id, {}).items():
+                classification_metadata[f"{isp_id}::{keyword}::{occurrence}"] = json.loads(data)
+
+        session_data = dict(state)
+        session_data.update({
+            'isps': isps,
+            'analyzed_keywords': analyzed_keywords,
+            'classification_metadata': classification_metadata
+        })
+        return session_data
+
+    # Cache
+
+    def _cache_get(self, session_id: int, isp_ids: Optional[set] = None) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            key = (self.database_file, session_id)
+            resolved = self._resolved_cache.get(key)
+            if resolved is None:
+                return None
+            if resolved['scope'] is not None and (isp_ids is None or not set(isp_ids) <= resolved['scope']):
+                return None
+            self._resolved_cache.move_to_end(key)
+            return resolved
+
+    def _cache_evict(self, session_id: int) -> None:
+        with self._cache_lock:
+            self._resolved_cache.pop((self.database_file, session_id), None)
+
+    def _cache_put(self, session_id: int, resolved: Dict[str, Any]) -> None:
+        with self._cache_lock:
+            key = (self.database_file, session_id)
+            self._resolved_cache[key] = resolved
+            self._resolved_cache.move_to_end(key)
+            while len(self._resolved_cache) > self._resolved_cache_size:
+                self._resolved_cache.popitem(last=False)
 
 
 class SessionManager:
     """Manages session state in the application."""
     
+    LAZY_LOAD_MIN_ISPS = 10
+    
     def __init__(self, repository: SessionRepository):
         self.repository = repository
         self.repository.initialize()
     
     def save_current_session(self) -> str:
-        """Save the current session state."""
+        """Save the current session state.
+        
+        The session is saved as a child of the session it was loaded from (or last
+        saved as), so the repository only has to store what changed since then.
+        """
         session_data = {
             'isps': st.session_state.isps,
             'current_isp_id': st.session_state.current_isp_id,
@@ -75,20 +1018,46 @@ class SessionManager:
             'language': st.session_state.language,
             'context_mode': st.session_state.context_mode,
             'classification_metadata': st.session_state.classification_metadata,
-            'selected_model': st.session_state.selected_model
+            'selected_model': st.session_state.selected_model,
+            'session_name': st.session_state.get('session_name') or None,
+            'metrics': st.session_state.metrics.to_dict()
         }
-        return self.repository.save_session(session_data)
+        session_id, timestamp = self.repository.save_session(
+            session_data, parent_id=st.session_state.get('loaded_session_id'),
+            expected_head=st.session_state.get('loaded_head_id')
+        )
+        st.session_state.loaded_session_id = session_id
+        st.session_state.loaded_head_id = self.repository.get_head(session_id)
+        loader = st.session_state.get('isp_loader')
+        if loader is not None:
+            loader.mark_saved(session_id)
+        self.reset_journal(session_id)
+        self.repository.schedule_maintenance(protect=SessionJournal.referenced_session_ids() | {session_id})
+        return timestamp
     
     def get_available_sessions(self) -> List[Tuple[int, str]]:
         """Get list of available sessions."""
         return self.repository.get_sessions()
     
+    def search_sessions(self, query: str = "", limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Get one page of catalog entries matching query and the total number of matches."""
+        return self.repository.search_sessions(query, limit, offset)
+    
     def load_session(self, session_id: int) -> bool:
-        """Load a session and update app state."""
-        session_data = self.repository.load_session(session_id)
+        """Load a session and update app state.
+        
+        Sessions with more than LAZY_LOAD_MIN_ISPS ISPs are loaded lazily: only the
+        manifest (ISP names and AA/OI counts) is read, and each ISP is hydrated when
+        it is first selected.
+        """
+        session_data = self.repository.load_session_manifest(session_id)
         if not session_data:
             return False
-            
+        lazy = len(session_data.get('isps', {})) > self.LAZY_LOAD_MIN_ISPS
+        if not lazy:
+            session_data = self.repository.load_session(session_id)
+        st.session_state.isp_loader = LazySessionLoader(self.repository, session_id) if lazy else None
+        
         st.session_state.isps = session_data.get('isps', {})
         st.session_state.current_isp_id = session_data.get('current_isp_id')
         st.session_state.next_isp_id = session_data.get('next_isp_id', 1)
@@ -98,6 +1067,10 @@ class SessionManager:
         st.session_state.analyzed_keywords = {k: set(v) for k, v in analyzed_keywords.items()}
         st.session_state.language = session_data.get('language', 'Swedish')
         st.session_state.selected_model = session_data.get('selected_model')
+        st.session_state.session_name = session_data.get('session_name') or ""
+        st.session_state.loaded_session_id = session_id
+        st.session_state.loaded_head_id = self.repository.get_head(session_id)
+        st.session_state.merge_conflicts = []
         st.session_state.current_keyword = None
         st.session_state.current_sentences = []
         st.session_state.current_index = 0
@@ -115,4 +1088,180 @@ class SessionManager:
             st.session_state.analyzed_keywords = {}
             for isp_id, keywords in old_analyzed_keywords.items():
                 st.session_state.analyzed_keywords[int(isp_id)] = keywords
-        return True
\ No newline at end of file
+        # Sessions saved before the counters were stored have them rebuilt from their ISPs.
+        st.session_state.metrics = (MetricsAggregate.from_dict(session_data.get('metrics'), st.session_state.isps)
+                                    or MetricsAggregate.from_isps(st.session_state.isps))
+        if lazy and st.session_state.current_isp_id is not None:
+            st.session_state.isp_loader.hydrate(st.session_state.current_isp_id)
+        self.reset_journal(session_id)
+        return True
+
+    def merge_with_head(self) -> str:
+        """Merge the current session with what others saved since it was loaded, then save the result.
+        
+        The session the current work was loaded from is the merge base and the
+        newest session in its lineage is the other side. Occurrences both sides
+        labeled differently keep the current label and are listed in
+        st.session_state.merge_conflicts for review. Returns the save timestamp.
+        """
+        base_id = st.session_state.get('loaded_session_id')
+        head_id = self.repository.get_head(base_id) if base_id is not None else None
+        if head_id is None:
+            raise ValueError("The session this work was loaded from no longer exists.")
+        base = self.repository.load_session(base_id)
+        theirs = self.repository.load_session(head_id)
+        
+        isps = {}
+        metadata = dict(st.session_state.classification_metadata)
+        for isp_id, isp in st.session_state.isps.items():
+            if self.repository.is_stub(isp):
+                # Never opened, so unchanged since the base.
+                isp = base['isps'][isp_id]
+                prefix = f"{isp_id}::"
+                metadata.update({k: v for k, v in base['classification_metadata'].items() if k.startswith(prefix)})
+            isps[isp_id] = isp
+        ours = {
+            'isps': isps,
+            'current_isp_id': st.session_state.current_isp_id,
+            'next_isp_id': st.session_state.next_isp_id,
+            'analyzed_keywords': st.session_state.analyzed_keywords,
+            'classification_metadata': metadata
+        }
+        merged, conflicts = SessionMerger.merge(base, ours, theirs)
+        if conflicts:
+            versions = self.repository.classification_versions(head_id)
+            for conflict in conflicts:
+                conflict['theirs_version'] = versions.get(
+                    (conflict['isp_id'], conflict['keyword'], conflict['occurrence']))
+        
+        st.session_state.isps = merged['isps']
+        st.session_state.current_isp_id = merged['current_isp_id']
+        st.session_state.next_isp_id = merged['next_isp_id']
+        st.session_state.analyzed_keywords = merged['analyzed_keywords']
+        st.session_state.classification_metadata = merged['classification_metadata']
+        st.session_state.metrics = MetricsAggregate.from_isps(merged['isps'])
+        st.session_state.isp_loader = None
+        st.session_state.loaded_session_id = head_id
+        st.session_state.loaded_head_id = head_id
+        if st.session_state.get('current_keyword') is not None and \
+                st.session_state.current_isp_id not in st.session_state.isps:
+            st.session_state.current_keyword = None
+            st.session_state.current_sentences = []
+            st.session_state.current_index = 0
+        timestamp = self.save_current_session()
+        st.session_state.merge_conflicts = conflicts
+        return timestamp
+
+    def reset_journal(self, base_session_id: Optional[int] = None) -> None:
+        """Clear the autosave journal once its work is safely stored or discarded."""
+        journal = st.session_state.get('journal')
+        if journal is not None:
+            journal.reset(base_session_id)
+
+    def export_archive(self, fileobj: BinaryIO) -> None:
+        """Write the current session to a project archive, one ISP at a time.
+        
+        ISPs of a lazily loaded session that were never opened are read from the
+        saved session without being added to the app state.
+        """
+        state = {
+            'language': st.session_state.language,
+            'context_mode': st.session_state.context_mode,
+            'selected_model': st.session_state.selected_model,
+            'session_name': st.session_state.get('session_name') or None
+        }
+        with ProjectArchiveWriter(fileobj, state) as writer:
+            for isp_id in sorted(st.session_state.isps):
+                isp = st.session_state.isps[isp_id]
+                analyzed_keywords = st.session_state.analyzed_keywords.get(isp_id, set())
+                metadata = st.session_state.classification_metadata
+                if self.repository.is_stub(isp):
+                    loaded = self.repository.load_isp(st.session_state.loaded_session_id, isp_id)
+                    isp, analyzed_keywords, metadata = (
+                        loaded['isp'], loaded['analyzed_keywords'], loaded['classification_metadata'])
+                writer.add_isp(isp_id, isp, list(analyzed_keywords), metadata)
+    
+    def import_archive_isps(self, reader: ProjectArchiveReader, isp_ids: List[int]) -> List[str]:
+        """Add ISPs from a project archive to the current session as new ISPs; returns their names.
+        
+        ISPs get ids from next_isp_id, so ids of deleted ISPs are not reused. ISPs
+        whose name is already taken get an "(imported)" suffix.
+        """
+        imported = []
+        for archive_isp_id in isp_ids:
+            isp, analyzed_keywords, metadata = reader.read_isp(archive_isp_id)
+            names = {existing.get('name') for existing in st.session_state.isps.values()}
+            name = isp.get('name') or f"ISP {archive_isp_id}"
+            base_name, suffix = name, 1
+            while name in names:
+                name = f"{base_name} (imported)" if suffix == 1 else f"{base_name} (imported {suffix})"
+                suffix += 1
+            isp['name'] = name
+            
+            isp_id = st.session_state.next_isp_id
+            while isp_id in st.session_state.isps:
+                isp_id += 1
+            st.session_state.next_isp_id = isp_id + 1
+            st.session_state.isps[isp_id] = isp
+            st.session_state.analyzed_keywords[isp_id] = set(analyzed_keywords)
+            for key, value in metadata.items():
+                st.session_state.classification_metadata[f"{isp_id}::{key}"] = value
+            st.session_state.metrics.set_isp(isp_id, isp)
+            
+            journal = st.session_state.get('journal')
+            if journal is not None:
+                journal.append(EVENT_ADD_ISP, isp_id=isp_id, name=name, text=isp['text'])
+                for keyword, results in isp['analysis_results'].items():
+                    for label in ('AA', 'OI'):
+                        for occurrence in results[label]:
+                            journal.append(EVENT_CLASSIFY, isp_id=isp_id, keyword=keyword, occurrence=occurrence,
+                                           label=label, metadata=metadata.get(f"{keyword}::{occurrence}"))
+                for keyword in analyzed_keywords:
+                    journal.append(EVENT_KEYWORD_DONE, isp_id=isp_id, keyword=keyword)
+            imported.append(name)
+        return imported
+    
+    def get_recoverable_work(self) -> List[Dict[str, Any]]:
+        """Get unsaved work left in autosave journals by sessions that ended without saving."""
+        return SessionJournal.find_orphaned()
+
+    def recover_work(self, recoverable: Dict[str, Any]) -> bool:
+        """Restore unsaved work from an orphaned journal on top of the session it was based on."""
+        base_session_id = recoverable.get('base_session_id')
+        if base_session_id is None or not self.load_session(base_session_id):
+            base_session_id = None
+            st.session_state.isps = {}
+            st.session_state.current_isp_id = None
+            st.session_state.next_isp_id = 1
+            st.session_state.analyzed_keywords = {}
+            st.session_state.classification_metadata = {}
+            st.session_state.loaded_session_id = None
+            st.session_state.loaded_head_id = None
+            st.session_state.current_keyword = None
+            st.session_state.current_sentences = []
+            st.session_state.current_index = 0
+            st.session_state.classifications = []
+            st.session_state.isp_loader = None
+
+        loader = st.session_state.get('isp_loader')
+        if loader is not None:
+            for isp_id in {event.get('isp_id') for event in recoverable['events']}:
+                loader.hydrate(isp_id)
+
+        state = {
+            'isps': st.session_state.isps,
+            'analyzed_keywords': st.session_state.analyzed_keywords,
+            'classification_metadata': st.session_state.classification_metadata,
+            'next_isp_id': st.session_state.next_isp_id
+        }
+        SessionJournal.apply_events(state, recoverable['events'])
+        st.session_state.next_isp_id = state['next_isp_id']
+        st.session_state.metrics = MetricsAggregate.from_isps(st.session_state.isps)
+        if st.session_state.current_isp_id not in st.session_state.isps:
+            st.session_state.current_isp_id = next(iter(st.session_state.isps), None)
+
+        journal = st.session_state.get('journal')
+        if journal is not None:
+            journal.reset(base_session_id, recoverable['events'])
+        SessionJournal.discard(recoverable['journal_id'])
+        return True
@@ -1,7 +1,24 @@
 """
 Domain logic for the ISP Keyword Analyzer.
 """
-from src.domain.analyzer import SentenceExtractor
-from src.domain.metrics import MetricsCalculator
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
 
-__all__ = ['SentenceExtractor', 'MetricsCalculator']
\ No newline at end of file
+if TYPE_CHECKING:
+    from src.domain.analyzer import SentenceExtractor
+    from src.domain.metrics import MetricsCalculator, MetricsAggregate
+    from src.domain.corpus import OccurrenceTable
+    from src.domain.intervals import LossIntervals
+    from src.domain.agreement import AgreementAnalyzer
+
+__all__ = ['SentenceExtractor', 'MetricsCalculator', 'MetricsAggregate', 'OccurrenceTable', 'LossIntervals',
+           'AgreementAnalyzer']
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.domain.analyzer': ['SentenceExtractor'],
+    'src.domain.metrics': ['MetricsCalculator', 'MetricsAggregate'],
+    'src.domain.corpus': ['OccurrenceTable'],
+    'src.domain.intervals': ['LossIntervals'],
+    'src.domain.agreement': ['AgreementAnalyzer']
+})
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.domain.corpus import LABELS, OccurrenceTable
+from src.domain.intervals import LossIntervals
+
+
+class AgreementAnalyzer:
+    """Agreement between AI labels and the labels the occurrences have after human review.
+
+    Works on the 'ai_label' and 'label' columns of an OccurrenceTable: every
+    occurrence with a reviewed AI label is one (AI, reviewed) pair. AI labels no
+    human has looked at are not pairs; they are counted separately per keyword
+    from the 'ai_unreviewed' column. Pairs are counted
+    per keyword into 2x2 confusion matrices with a single np.bincount, and Cohen's
+    kappa, the disagreement rate and its Wilson interval are computed from those
+    matrices for all keywords at once. Results are cached per table version.
+    """
+
+    COLUMNS = ('Keyword', 'Pairs', 'Unreviewed AI labels', 'Agreements', 'AI AA, reviewed OI', 'AI OI, reviewed AA',
+               'Disagreement (%)', 'Disagreement low (%)', 'Disagreement high (%)', "Cohen's kappa")
+    ALL_KEYWORDS = "All keywords"
+
+    _cache: 'OrderedDict[int, Tuple[np.ndarray, pd.Index]]' = OrderedDict()
+    _cache_size = 8
+    _cache_lock = threading.Lock()
+
+    def __init__(self, intervals: Optional[LossIntervals] = None):
+        self.intervals = intervals or LossIntervals()
+
+    def confusion_matrices(self, table: OccurrenceTable) -> Tuple[np.ndarray, pd.Index]:
+        """Counts of shape (keywords, 2, 2) indexed by [keyword, AI label, reviewed label], and the keywords."""
+        key = table.version
+        if key is not None:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    return cached
+
+        keywords = table.frame['keyword'].cat.categories
+        ai_codes = table.frame['ai_label'].cat.codes.to_numpy()
+        paired = ai_codes >= 0
+        keyword_codes = table.frame['keyword'].cat.codes.to_numpy()[paired].astype(np.int64)
+        label_codes = table.frame['label'].cat.codes.to_numpy()[paired].astype(np.int64)
+        cells = keyword_codes * 4 + ai_codes[paired].astype(np.int64) * 2 + label_codes
+        counts = np.bincount(cells, weights=table.frame['count'].to_numpy()[paired],
+                             minlength=len(keywords) * 4).astype(np.int64).reshape(len(keywords), 2, 2)
+        result = (counts, keywords)
+
+        if key is not None:
+            with self._cache_lock:
+                self._cache[key] = result
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def unreviewed_counts(table: OccurrenceTable) -> np.ndarray:
+        """Number of AI labels no human has reviewed, per keyword in the order of the keyword categories."""
+        keywords = table.frame['keyword'].cat.categories
+        unreviewed = table.frame['ai_unreviewed'].to_numpy(dtype=bool)
+        return np.bincount(table.frame['keyword'].cat.codes.to_numpy()[unreviewed].astype(np.int64),
+                           weights=table.frame['count'].to_numpy()[unreviewed],
+                           minlength=len(keywords)).astype(np.int64)
+
+    @staticmethod
+    def kappa(counts: np.ndarray) -> np.ndarray:
+        """Cohen's kappa of each 2x2 matrix in counts; NaN where it is undefined (no pairs or a single label)."""
+        counts = np.asarray(counts, dtype=np.float64)
+        total = counts.sum(axis=(-2, -1))
+        n = np.where(total > 0, total, 1)
+        observed = (counts[..., 0, 0] + counts[..., 1, 1]) / n
+        expected = (counts.sum(axis=-1) * counts.sum(axis=-2)).sum(axis=-1) / (n * n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kappa = (observed - expected) / (1 - expected)
+        return np.where((total > 0) & (expected < 1), kappa, np.nan)
+
+    def by_keyword(self, table: OccurrenceTable) -> pd.DataFrame:
+        """One row per keyword with AI labels, plus an 'All keywords' row, with the columns in COLUMNS.
+
+        Disagreement is NaN for keywords whose AI labels are all unreviewed.
+        """
+        counts, keywords = self.confusion_matrices(table)
+        unreviewed = self.unreviewed_counts(table)
+        used = (counts.sum(axis=(1, 2)) > 0) | (unreviewed > 0)
+        counts = np.concatenate([counts[used], counts.sum(axis=0, keepdims=True)])
+        unreviewed = np.append(unreviewed[used], unreviewed.sum())
+        pairs = counts.sum(axis=(1, 2))
+        disagreements = counts[:, 0, 1] + counts[:, 1, 0]
+        low, high = self.intervals.wilson(disagreements, pairs)
+        return pd.DataFrame({
+            'Keyword': list(keywords[used]) + [self.ALL_KEYWORDS],
+            'Pairs': pairs,
+            'Unreviewed AI labels': unreviewed,
+            'Agreements': counts[:, 0, 0] + counts[:, 1, 1],
+            'AI AA, reviewed OI': counts[:, 0, 1],
+            'AI OI, reviewed AA': counts[:, 1, 0],
+            'Disagreement (%)': np.where(pairs > 0, disagreements / np.where(pairs > 0, pairs, 1) * 100, np.nan),
+            'Disagreement low (%)': low,
+            'Disagreement high (%)': high,
+            "Cohen's kappa": self.kappa(counts)
+        })
+
+    def confusion_matrix(self, table: OccurrenceTable, keyword: Optional[str] = None) -> pd.DataFrame:
+        """The confusion matrix of one keyword, or of all keywords, as a labelled 2x2 frame."""
+        counts, keywords = self.confusion_matrices(table)
+        if keyword is None:
+            matrix = counts.sum(axis=0)
+        elif keyword in keywords:
+            matrix = counts[keywords.get_loc(keyword)]
+        else:
+            matrix = np.zeros((2, 2), dtype=np.int64)
+        return pd.DataFrame(matrix, index=[f"AI {label}" for label in LABELS],
+                            columns=[f"Reviewed {label}" for label in LABELS])
@@ -1,7 +1,26 @@
 """
 AI analysis functionality for the ISP Keyword Analyzer.
 """
-from src.domain.ai.model import ModelManager
-from src.domain.ai.classifier import SentenceClassifier, BatchClassifier
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
 
-__all__ = ['ModelManager', 'SentenceClassifier', 'BatchClassifier']
\ No newline at end of file
+if TYPE_CHECKING:
+    from src.domain.ai.model import ModelManager
+    from src.domain.ai.classifier import SentenceClassifier, BatchClassifier
+    from src.domain.ai.backend import FakeLLMBackend
+    from src.domain.ai.rules import RuleEngine
+    from src.domain.ai.trained import HashedNgramClassifier, train_from_sessions
+    from src.domain.ai.scheduler import InferenceScheduler, SchedulerBusyError
+
+__all__ = ['ModelManager', 'SentenceClassifier', 'BatchClassifier', 'FakeLLMBackend', 'RuleEngine',
+           'HashedNgramClassifier', 'train_from_sessions', 'InferenceScheduler', 'SchedulerBusyError']
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.domain.ai.model': ['ModelManager'],
+    'src.domain.ai.classifier': ['SentenceClassifier', 'BatchClassifier'],
+    'src.domain.ai.backend': ['FakeLLMBackend'],
+    'src.domain.ai.rules': ['RuleEngine'],
+    'src.domain.ai.trained': ['HashedNgramClassifier', 'train_from_sessions'],
+    'src.domain.ai.scheduler': ['InferenceScheduler', 'SchedulerBusyError']
+})
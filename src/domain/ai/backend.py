@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+class FakeLLMBackend:
+    """Stand-in for llama_cpp.Llama that records, replays or synthesizes responses."""
+
+    MODES = ("record", "replay", "synthesize")
+
+    ENV_MODE = "ISP_ANALYZER_FAKE_LLM"
+    ENV_FIXTURE = "ISP_ANALYZER_FAKE_LLM_FIXTURE"
+    ENV_LATENCY = "ISP_ANALYZER_FAKE_LLM_LATENCY"
+
+    DEFAULT_FIXTURE = Path("test_data/llm_fixtures.json")
+
+    def __init__(self, mode: str, fixture_path: Optional[Path] = None, latency: float = 0.0, model=None):
+        """Create a fake backend.
+
+        Args:
+            mode: One of "record", "replay" or "synthesize"
+            fixture_path: JSON file that recorded responses are written to / read from
+            latency: Seconds to sleep per call, to simulate realistic inference timings
+            model: Real llama_cpp.Llama instance (required in record mode)
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported fake LLM mode: {mode}")
+        if mode == "record" and model is None:
+            raise ValueError("Record mode requires a real model to forward calls to.")
+
+        self.mode = mode
+        self.fixture_path = Path(fixture_path) if fixture_path else self.DEFAULT_FIXTURE
+        self.latency = max(0.0, float(latency))
+        self.model = model
+        self._lock = threading.Lock()
+        self._fixtures = self._read_fixtures() if mode in ("record", "replay") else {}
+
+    @classmethod
+    def configured_mode(cls) -> Optional[str]:
+        """Return the fake backend mode selected through the environment, if any."""
+        mode = os.environ.get(cls.ENV_MODE, "").strip().lower()
+        return mode if mode in cls.MODES else None
+
+    @classmethod
+    def from_env(cls, model=None) -> 'FakeLLMBackend':
+        """Create a backend from the ISP_ANALYZER_FAKE_LLM* environment variables."""
+        mode = cls.configured_mode()
+        if mode is None:
+            raise ValueError(f"{cls.ENV_MODE} must be one of: {', '.join(cls.MODES)}")
+        fixture = os.environ.get(cls.ENV_FIXTURE) or None
+        latency = float(os.environ.get(cls.ENV_LATENCY, "0") or 0)
+        return cls(mode, fixture_path=fixture, latency=latency, model=model)
+
+    @staticmethod
+    def prompt_hash(messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    temperature: Optional[float] = None) -> str:
+        """Stable key for a chat request, used to look up recorded responses."""
+        payload = json.dumps(
+            {"messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def create_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 300,
+                               temperature: float = 0.1, **kwargs) -> Dict[str, Any]:
+        """Mirror of Llama.create_chat_completion."""
+        key = self.prompt_hash(messages, max_tokens, temperature)
+
+        if self.mode == "record":
+            response = self.model.create_chat_completion(
+                messages=messages, max_tokens=max_tokens, temperature=temperature, **kwargs
+            )
+            self._store_fixture(key, messages, response)
+            return response
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.mode == "replay":
+            entry = self._fixtures.get(key)
+            if entry is None:
+                raise LookupError(f"No recorded response for prompt {key[:12]} in {self.fixture_path}")
+            return entry["response"]
+
+        return self._synthesize(key)
+
+    def create_completion(self, prompt: str, max_tokens: int = 16, **kwargs) -> Dict[str, Any]:
+        """Mirror of Llama.create_completion, used by the GPU smoke test in ModelManager."""
+        if self.mode == "record":
+            return self.model.create_completion(prompt=prompt, max_tokens=max_tokens, **kwargs)
+        if self.latency:
+            time.sleep(self.latency)
+        return {"choices": [{"text": "", "index": 0, "finish_reason": "length"}]}
+
+    def _synthesize(self, key: str) -> Dict[str, Any]:
+        """Build a deterministic chat response from the prompt hash."""
+        classification = "AA" if int(key[:8], 16) % 2 == 0 else "OI"
+        content = (
+            f"{classification}\n"
+            f"Synthetic response generated by the fake LLM backend (prompt {key[:12]}). "
+            f"No model was consulted."
+        )
+        return {
+            "id": f"fake-{key[:12]}",
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }]
+        }
+
+    def _read_fixtures(self) -> Dict[str, Any]:
+        """Read the fixture file, returning an empty mapping if it does not exist yet."""
+        if not self.fixture_path.is_file():
+            return {}
+        with open(self.fixture_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _store_fixture(self, key: str, messages: List[Dict[str, str]], response: Dict[str, Any]) -> None:
+        """Add a recorded response and atomically rewrite the fixture file."""
+        with self._lock:
+            self._fixtures[key] = {"messages": messages, "response": response}
+            self.fixture_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.fixture_path.with_suffix(self.fixture_path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._fixtures, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.fixture_path)
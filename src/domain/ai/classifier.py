@@ -1,12 +1,29 @@
+import uuid
 from typing import Dict, List, Any, Optional, Callable
 import streamlit as st
 from src.domain.ai.model import ModelManager
+from src.domain.ai.rules import RuleEngine
+from src.domain.ai.trained import HashedNgramClassifier
+from src.domain.ai.scheduler import InferenceScheduler, SchedulerBusyError
 
 class SentenceClassifier:
-    """Classifies sentences using AI assistance."""
+    """Classifies sentences using AI assistance.
     
-    def __init__(self):
+    The strategy selects how sentences are classified:
+    - "llm": the local language model, falling back to the trained classifier or rules
+    - "trained": the lightweight classifier trained from saved sessions
+    - "rules": the rule-based engine only
+    """
+    
+    STRATEGIES = ("llm", "trained", "rules")
+    
+    def __init__(self, strategy: str = "llm", priority: int = InferenceScheduler.INTERACTIVE):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown classification strategy: {strategy}")
+        self.strategy = strategy
+        self.priority = priority
         self.model = None
+        self.model_id = None
     
     def ensure_model_loaded(self):
         """Ensure the model is loaded."""
@@ -14,14 +31,25 @@ class SentenceClassifier:
         if not st.session_state.get("ai_available", False):
             return False
 
-        if self.model is None:
-            self.model = ModelManager.load_model()
+        model_id = st.session_state.get("selected_model") or "4B"
+        if self.model is None or self.model_id != model_id:
+            self.model = ModelManager.get_shared_model(model_id)
+            self.model_id = model_id
         return self.model is not None
     
+    @staticmethod
+    def _session_key() -> str:
+        """Identify the Streamlit session for fair scheduling."""
+        if 'inference_session_id' not in st.session_state:
+            st.session_state.inference_session_id = uuid.uuid4().hex
+        return st.session_state.inference_session_id
+    
     def get_classification_with_rationale(self, sentence_data: Dict[str, Any], keyword: str) -> Dict[str, str]:
         """Get classification with rationale for a sentence in a single model call."""
-        if not st.session_state.get("ai_available", False) or not self.ensure_model_loaded():
+        if self.strategy == "rules":
             return self._rule_based_classification(sentence_data, keyword)
+        if self.strategy == "trained" or not st.session_state.get("ai_available", False) or not self.ensure_model_loaded():
+            return self._fallback_classification(sentence_data, keyword)
         
         sentence = sentence_data['sentence']
         before_context = sentence_data.get('before_context', '')
@@ -100,12 +128,16 @@ This sentence provides clear, specific instructions that can be directly impleme
 """
         
         try:
-            response = self.model.create_chat_completion(
+            response = InferenceScheduler.instance().run(
+                self._session_key(),
+                self.priority,
+                self.model.create_chat_completion,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=300,
                 temperature=0.1,
+                block=self.priority == InferenceScheduler.BULK,
             )
             
             response_text = response["choices"][0]["message"]["content"].strip()
@@ -130,9 +162,12 @@ This sentence provides clear, specific instructions that can be directly impleme
                 else:
                     return {"classification": "OI", "rationale": "Based on AI analysis."}
                 
+        except SchedulerBusyError as e:
+            st.warning(f"{e} Using the fallback classifier for this suggestion.")
+            return self._fallback_classification(sentence_data, keyword)
         except Exception as e:
             st.error(f"Error in model inference: {e}")
-            return self._rule_based_classification(sentence_data, keyword)
+            return self._fallback_classification(sentence_data, keyword)
     
     def classify_sentence(self, sentence_data: Dict[str, Any], keyword: str) -> str:
         """Classify a sentence as 'AA' or 'OI'."""
@@ -140,56 +175,24 @@ This sentence provides clear, specific instructions that can be directly impleme
         return result["classification"]
     
     # Fallback
-    def _rule_based_classification(self, sentence_data: Dict[str, Any], keyword: str) -> Dict[str, str]:
+    def _fallback_classification(self, sentence_data: Dict[str, Any], keyword: str) -> Dict[str, Any]:
+        """Use the trained classifier when a model file exists, otherwise the rule engine."""
+        trained_model = HashedNgramClassifier.load_default()
+        if trained_model is None:
+            return self._rule_based_classification(sentence_data, keyword)
+        return trained_model.classify_batch([sentence_data], keyword)[0]
+    
+    def _rule_based_classification(self, sentence_data: Dict[str, Any], keyword: str) -> Dict[str, Any]:
         """Rule-based fallback classification method."""
-        sentence = sentence_data['sentence'].lower()
-        
-        start_pos = sentence_data['start']
-        end_pos = sentence_data['end']
-        match_text = sentence_data['match_text']
-        
-        highlighted_sentence = (
-            sentence[:start_pos] + 
-            "[" + match_text + "]" + 
-            sentence[end_pos:]
-        )
-        
-        action_markers = ["must ", "shall ", "required to ", "always ", "never ", 
-                        "do not ", "should ", "is prohibited", "is not permitted"]
-        
-        vague_terms = ["good time", "exercise caution", "be careful", "as appropriate",
-                    "when necessary", "as needed", "reasonable", "proper"]
-        
-        is_actionable = False
-        if any(marker in sentence for marker in action_markers):
-            if not any(term in sentence for term in vague_terms):
-                is_actionable = True
-        
-        classification = "AA" if is_actionable else "OI"
-        
-        if classification == "AA":
-            action_words = [marker for marker in action_markers if marker in sentence]
-            rationale = f"This sentence contains clear action words ({', '.join(action_words)}) without ambiguous terms, making it specific enough to be actionable. The instruction is clear and provides concrete guidance that can be directly implemented. The highlighted keyword [{match_text}] appears in a context that provides definite direction."
-        else:
-            if any(term in sentence for term in vague_terms):
-                vague_found = [term for term in vague_terms if term in sentence]
-                rationale = f"Although the sentence contains the highlighted keyword [{match_text}], it uses vague terminology ({', '.join(vague_found)}) that makes the guidance ambiguous. This lack of specificity means it cannot be directly acted upon without additional interpretation."
-            elif not any(marker in sentence for marker in action_markers):
-                rationale = f"This sentence lacks clear action words that would make it actionable. The highlighted keyword [{match_text}] appears in a context that is more informational rather than providing specific guidance. Without explicit direction on what to do, it should be classified as Other Information."
-            else:
-                rationale = f"While the sentence contains the highlighted keyword [{match_text}], it does not provide clear, specific instructions that can be directly implemented. The statement is more informational than actionable."
-        
-        return {
-            "classification": classification,
-            "rationale": rationale
-        }
+        engine = RuleEngine.for_language(st.session_state.get("language", "English"))
+        return engine.classify(sentence_data)
 
 
 class BatchClassifier:
     """Handles batch classification of sentences."""
     
     def __init__(self):
-        self.classifier = SentenceClassifier()
+        self.classifier = SentenceClassifier(priority=InferenceScheduler.BULK)
     
     def classify_sentences(self, sentences: List[Dict], keyword: str, 
                           progress_callback: Optional[Callable] = None) -> List[str]:
@@ -230,23 +233,14 @@ class BatchClassifier:
         st.info(f"Using rule-based classification for {len(sentences)} sentences with keyword '{keyword}'")
         progress_bar = st.progress(0)
         
+        engine = RuleEngine.for_language(st.session_state.get("language", "English"))
+        results = engine.classify_batch(sentences)
+        
         aa_count = 0
         oi_count = 0
         
-        for i, item in enumerate(sentences):
-            sentence = item['sentence'].lower()
-            is_actionable = False
-            
-            action_markers = ["must ", "shall ", "required to ", "always ", "never ", 
-                             "do not ", "should ", "is prohibited", "is not permitted"]
-            
-            vague_terms = ["good time", "exercise caution", "be careful", "as appropriate",
-                         "when necessary", "as needed", "reasonable", "proper"]
-            
-            if any(marker in sentence for marker in action_markers):
-                if not any(term in sentence for term in vague_terms):
-                    is_actionable = True
-            
+        for i, (item, result) in enumerate(zip(sentences, results)):
+            is_actionable = result['classification'] == "AA"
             occurrence_id = f"{item['sentence']}::{item['start']}::{item['end']}"
             
             if is_actionable:
@@ -1,9 +1,11 @@
 import os
 import sys
 import platform
+import threading
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 import streamlit as st
+from src.domain.ai.backend import FakeLLMBackend
 
 class ModelManager:
     """Manages the loading and finding of AI models."""
@@ -35,6 +37,9 @@ class ModelManager:
         }
     }
     
+    _shared_models: Dict[str, Any] = {}
+    _shared_lock = threading.Lock()
+    
     @staticmethod
     def get_available_models() -> Dict[str, Dict[str, Any]]:
         """Returns a dictionary of available models with their status (available or not)."""
@@ -43,8 +48,17 @@ class ModelManager:
             return {}
 
         available_models = {}
+        fake_mode = FakeLLMBackend.configured_mode()
         
         for model_id, config in ModelManager.MODEL_CONFIGS.items():
+            if fake_mode in ("replay", "synthesize"):
+                available_models[model_id] = {
+                    "name": config["name"],
+                    "description": f"{config['description']} (fake backend: {fake_mode})",
+                    "available": True,
+                    "path": None
+                }
+                continue
             model_exists = any(path.is_file() for path in config["search_paths"])
             available_models[model_id] = {
                 "name": config["name"],
@@ -92,6 +106,11 @@ class ModelManager:
         if model_id is None:
             model_id = st.session_state.get("selected_model", "4B")
         
+        fake_mode = FakeLLMBackend.configured_mode()
+        if fake_mode in ("replay", "synthesize"):
+            st.info(f"Using fake LLM backend in {fake_mode} mode instead of {model_id}.")
+            return FakeLLMBackend.from_env()
+        
         try:
             from llama_cpp import Llama
             LLAMA_CPP_AVAILABLE = True
@@ -136,12 +155,34 @@ class ModelManager:
                     n_threads=8      # More CPU threads for CPU-only mode
                 )
                 st.success(f"{config['name']} model loaded successfully on CPU!")
+            
+            if fake_mode == "record":
+                st.info("Recording model responses for the fake LLM backend.")
+                llm = FakeLLMBackend.from_env(model=llm)
                 
             return llm
         except Exception as e:
             st.error(f"Error loading model: {e}")
             return None
 
+    @staticmethod
+    def get_shared_model(model_id: str = None):
+        """Return the process-wide instance of a model, loading it on first use.
+        
+        All sessions share one instance per model; access to it is serialized by the
+        InferenceScheduler.
+        """
+        if model_id is None:
+            model_id = st.session_state.get("selected_model", "4B")
+        
+        with ModelManager._shared_lock:
+            model = ModelManager._shared_models.get(model_id)
+            if model is None:
+                model = ModelManager.load_model(model_id)
+                if model is not None:
+                    ModelManager._shared_models[model_id] = model
+        return model
+
     @staticmethod
     def debug_cuda_availability():
         """Check if CUDA is available and print diagnostic information without requiring PyTorch."""
@@ -0,0 +1,112 @@
+import re
+from bisect import bisect_right
+from typing import Dict, List, Any
+from src.config.settings import RuleMarkerSets
+
+class RuleEngine:
+    """Rule-based AA/OI classifier compiled from a language marker pack.
+
+    Markers only match as whole words, so "ska" does not match inside "svenska":
+
+    >>> engine = RuleEngine.for_language("Swedish")
+    >>> engine.classify({'sentence': "Svenska myndigheter omfattas av lagen om informationssäkerhet.",
+    ...                  'match_text': "informationssäkerhet"})['classification']
+    'OI'
+    >>> engine.classify({'sentence': "Rutinen för fysiska skydd beskrivs nedan.",
+    ...                  'match_text': "skydd"})['classification']
+    'OI'
+    >>> engine.classify({'sentence': "Lösenord ska bytas var tredje månad.",
+    ...                  'match_text': "Lösenord"})['classification']
+    'AA'
+    """
+
+    _SEPARATOR = "\x00"
+    _engines: Dict[str, 'RuleEngine'] = {}
+
+    def __init__(self, action_markers: List[str], vague_terms: List[str]):
+        self.action_markers = list(action_markers)
+        self.vague_terms = list(vague_terms)
+        self.pattern = re.compile(
+            rf"(?<!\w)(?:(?P<action>{self._alternation(self.action_markers)})"
+            rf"|(?P<vague>{self._alternation(self.vague_terms)}))(?!\w)",
+            re.IGNORECASE
+        )
+
+    @classmethod
+    def for_language(cls, language: str) -> 'RuleEngine':
+        """Get the compiled engine for a language, compiling it on first use."""
+        engine = cls._engines.get(language)
+        if engine is None:
+            markers = RuleMarkerSets.get_markers(language)
+            engine = cls(markers["action_markers"], markers["vague_terms"])
+            cls._engines[language] = engine
+        return engine
+
+    @staticmethod
+    def _alternation(markers: List[str]) -> str:
+        """Build a regex alternation that prefers the longest marker at each position."""
+        ordered = sorted(set(markers), key=len, reverse=True)
+        return "|".join(re.escape(marker) for marker in ordered) or "(?!)"
+
+    def find_evidence(self, sentences: List[str]) -> List[List[Dict[str, Any]]]:
+        """Find marker spans for every sentence with a single scan over the whole batch.
+
+        Returns one list per sentence with dicts holding 'kind' ("action" or "vague"),
+        'marker', 'start', 'end' and 'text', where positions are relative to the sentence.
+        """
+        evidence = [[] for _ in sentences]
+        if not sentences:
+            return evidence
+
+        offsets = []
+        position = 0
+        for sentence in sentences:
+            offsets.append(position)
+            position += len(sentence) + len(self._SEPARATOR)
+
+        joined = self._SEPARATOR.join(sentences)
+        for match in self.pattern.finditer(joined):
+            index = bisect_right(offsets, match.start()) - 1
+            base = offsets[index]
+            evidence[index].append({
+                'kind': match.lastgroup,
+                'marker': match.group().lower(),
+                'start': match.start() - base,
+                'end': match.end() - base,
+                'text': match.group()
+            })
+        return evidence
+
+    def classify_batch(self, sentences: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Classify a batch of sentence dicts (as produced by SentenceExtractor) in one pass."""
+        evidence = self.find_evidence([item['sentence'] for item in sentences])
+        return [self._build_result(item, spans) for item, spans in zip(sentences, evidence)]
+
+    def classify(self, sentence_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Classify a single sentence dict."""
+        return self.classify_batch([sentence_data])[0]
+
+    def _build_result(self, sentence_data: Dict[str, Any], spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Turn the matched spans for one sentence into a classification with rationale."""
+        match_text = sentence_data['match_text']
+        found_actions = {span['marker'] for span in spans if span['kind'] == 'action'}
+        found_vague = {span['marker'] for span in spans if span['kind'] == 'vague'}
+
+        action_words = [marker for marker in self.action_markers if marker in found_actions]
+        vague_found = [term for term in self.vague_terms if term in found_vague]
+
+        if action_words and not vague_found:
+            classification = "AA"
+            rationale = f"This sentence contains clear action words ({', '.join(action_words)}) without ambiguous terms, making it specific enough to be actionable. The instruction is clear and provides concrete guidance that can be directly implemented. The highlighted keyword [{match_text}] appears in a context that provides definite direction."
+        elif vague_found:
+            classification = "OI"
+            rationale = f"Although the sentence contains the highlighted keyword [{match_text}], it uses vague terminology ({', '.join(vague_found)}) that makes the guidance ambiguous. This lack of specificity means it cannot be directly acted upon without additional interpretation."
+        else:
+            classification = "OI"
+            rationale = f"This sentence lacks clear action words that would make it actionable. The highlighted keyword [{match_text}] appears in a context that is more informational rather than providing specific guidance. Without explicit direction on what to do, it should be classified as Other Information."
+
+        return {
+            "classification": classification,
+            "rationale": rationale,
+            "evidence": spans
+        }
@@ -0,0 +1,158 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, Callable
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when the inference queue is full and the caller does not want to wait."""
+
+
+class InferenceScheduler:
+    """Serializes inference on the shared model with priority classes and per-session fairness.
+
+    Interactive requests (suggestions) are always dispatched before bulk requests
+    (AI analysis of whole keywords). Within a priority class, sessions are served
+    round-robin so one analyst's bulk run cannot starve another's.
+    """
+
+    INTERACTIVE = 0
+    BULK = 1
+    PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+    _instance: Optional['InferenceScheduler'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_queue_per_session: int = 8, max_queue_total: int = 64, wait_samples: int = 500):
+        self.max_queue_per_session = max_queue_per_session
+        self.max_queue_total = max_queue_total
+        self._queues = {priority: OrderedDict() for priority in self.PRIORITY_NAMES}
+        self._queued_total = 0
+        self._condition = threading.Condition()
+        self._active: Optional[Dict[str, Any]] = None
+        self._waits = {priority: deque(maxlen=wait_samples) for priority in self.PRIORITY_NAMES}
+        self._completed = {priority: 0 for priority in self.PRIORITY_NAMES}
+        self._rejected = {priority: 0 for priority in self.PRIORITY_NAMES}
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def instance(cls) -> 'InferenceScheduler':
+        """Process-wide scheduler shared by all Streamlit sessions."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, session_id: str, priority: int, fn: Callable, *args,
+               block: bool = False, timeout: Optional[float] = None, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) for execution and return a Future for its result.
+
+        When the session's or the global queue is full, the call either waits for
+        room (block=True, up to timeout seconds) or raises SchedulerBusyError.
+        """
+        if priority not in self.PRIORITY_NAMES:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        future = Future()
+        job = {
+            'future': future,
+            'fn': fn,
+            'args': args,
+            'kwargs': kwargs,
+            'session_id': session_id,
+            'priority': priority,
+            'queued_at': time.monotonic()
+        }
+
+        with self._condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._is_full(session_id, priority):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    self._rejected[priority] += 1
+                    raise SchedulerBusyError("The AI model is busy. Please try again shortly.")
+                self._condition.wait(remaining)
+
+            self._queues[priority].setdefault(session_id, deque()).append(job)
+            self._queued_total += 1
+            self._condition.notify_all()
+        return future
+
+    def run(self, session_id: str, priority: int, fn: Callable, *args,
+            block: bool = False, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Submit a job and wait for its result."""
+        return self.submit(session_id, priority, fn, *args, block=block, timeout=timeout, **kwargs).result()
+
+    def _is_full(self, session_id: str, priority: int) -> bool:
+        session_depth = sum(len(queues.get(session_id, ())) for queues in self._queues.values())
+        return self._queued_total >= self.max_queue_total or session_depth >= self.max_queue_per_session
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """Pop the next job: highest priority first, round-robin over sessions within a priority."""
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session_id, jobs = next(iter(sessions.items()))
+            job = jobs.popleft()
+            del sessions[session_id]
+            if jobs:
+                sessions[session_id] = jobs
+            self._queued_total -= 1
+            return job
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._condition.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+                self._active = job
+                self._waits[job['priority']].append(time.monotonic() - job['queued_at'])
+                self._condition.notify_all()
+
+            future = job['future']
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(job['fn'](*job['args'], **job['kwargs']))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                self._active = None
+                self._completed[job['priority']] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time metrics per priority class."""
+        with self._condition:
+            stats = {'queued_total': self._queued_total, 'active': None, 'priorities': {}}
+            if self._active is not None:
+                stats['active'] = {
+                    'session_id': self._active['session_id'],
+                    'priority': self.PRIORITY_NAMES[self._active['priority']]
+                }
+            for priority, name in self.PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                stats['priorities'][name] = {
+                    'queue_depth': sum(len(jobs) for jobs in self._queues[priority].values()),
+                    'sessions_waiting': len(self._queues[priority]),
+                    'completed': self._completed[priority],
+                    'rejected': self._rejected[priority],
+                    'avg_wait': sum(waits) / len(waits) if waits else 0.0,
+                    'p95_wait': waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                    'max_wait': waits[-1] if waits else 0.0
+                }
+            return stats
+
+    def shutdown(self) -> None:
+        """Stop the worker once the queues have drained."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._worker.join()
@@ -0,0 +1,314 @@
+import re
+import json
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple, Any, Optional, Iterable, Callable
+import numpy as np
+
+HUMAN_METHODS = ("Manual", "Manual (Switched)", "Suggestion")
+
+
+def iter_labeled_examples(session_data: Dict[str, Any], methods: Optional[Iterable[str]] = HUMAN_METHODS):
+    """Yield (example, label) pairs from a stored session.
+
+    An example is a dict with 'sentence', 'start', 'end' and 'keyword'; the label is
+    "AA" or "OI". Only classifications whose metadata method is in `methods` are used
+    (classifications without metadata count as "Manual"). Pass methods=None to use all.
+    """
+    allowed = set(methods) if methods is not None else None
+    metadata = session_data.get('classification_metadata', {})
+
+    for isp_id, isp_data in session_data.get('isps', {}).items():
+        for keyword, results in isp_data.get('analysis_results', {}).items():
+            for label in ("AA", "OI"):
+                for occurrence in results.get(label, []):
+                    parts = occurrence.split("::")
+                    if len(parts) < 3:
+                        continue
+                    method = metadata.get(f"{isp_id}::{keyword}::{occurrence}", {}).get("method", "Manual")
+                    if allowed is not None and method not in allowed:
+                        continue
+                    yield {
+                        'sentence': parts[0],
+                        'start': int(parts[1]),
+                        'end': int(parts[2]),
+                        'keyword': keyword
+                    }, label
+
+
+class HashedNgramClassifier:
+    """Logistic regression over hashed word n-grams, implemented with NumPy only."""
+
+    DEFAULT_PATH = Path("models/label_classifier.npz")
+
+    _TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+    _loaded: Dict[str, Tuple[float, 'HashedNgramClassifier']] = {}
+
+    def __init__(self, n_features: int = 2 ** 18, l2: float = 1e-4):
+        self.n_features = n_features
+        self.l2 = l2
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+        self.platt = (1.0, 0.0)
+        self.info: Dict[str, Any] = {}
+
+    # Features
+
+    def _tokens(self, example: Dict[str, Any]) -> List[str]:
+        """Turn an example into n-gram feature strings around the highlighted keyword."""
+        sentence = example['sentence']
+        start, end = example['start'], example['end']
+        before = self._TOKEN_PATTERN.findall(sentence[:start].lower())
+        after = self._TOKEN_PATTERN.findall(sentence[end:].lower())
+        words = before + ["<kw>"] + after
+
+        features = [f"kw={example.get('keyword', '').lower()}"]
+        features.extend(f"w={word}" for word in words)
+        features.extend(f"b={a} {b}" for a, b in zip(words, words[1:]))
+        features.extend(f"prev={word}" for word in before[-2:])
+        features.extend(f"next={word}" for word in after[:2])
+        return features
+
+    def _hash(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.n_features
+
+    def _vectorize(self, examples: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Build an L2-normalized binary CSR matrix (indptr, indices, values)."""
+        indptr = [0]
+        indices: List[int] = []
+        for example in examples:
+            row = sorted({self._hash(feature) for feature in self._tokens(example)})
+            indices.extend(row)
+            indptr.append(len(indices))
+
+        indptr_arr = np.asarray(indptr, dtype=np.int64)
+        lengths = np.diff(indptr_arr)
+        values = np.repeat(1.0 / np.sqrt(np.maximum(lengths, 1)), lengths).astype(np.float32)
+        return indptr_arr, np.asarray(indices, dtype=np.int64), values
+
+    @staticmethod
+    def _row_dot(weights: np.ndarray, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Dot product of every CSR row with a weight vector."""
+        products = weights[indices] * values
+        cumulative = np.concatenate(([0.0], np.cumsum(products, dtype=np.float64)))
+        return cumulative[indptr[1:]] - cumulative[indptr[:-1]]
+
+    @staticmethod
+    def _sigmoid(z: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+    # Training
+
+    def fit(self, examples: List[Dict[str, Any]], labels: List[str], iterations: int = 300,
+            learning_rate: float = 0.1, calibration_fraction: float = 0.2, seed: int = 0) -> 'HashedNgramClassifier':
+        """Fit the model with full-batch Adam and calibrate it with Platt scaling on a held-out split."""
+        if not examples:
+            raise ValueError("Cannot train a classifier without labeled examples.")
+
+        y = np.asarray([1.0 if label == "AA" else 0.0 for label in labels])
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(examples))
+
+        n_calibration = int(len(examples) * calibration_fraction) if len(examples) >= 50 else 0
+        calibration_idx, train_idx = order[:n_calibration], order[n_calibration:]
+
+        self._fit_weights([examples[i] for i in train_idx], y[train_idx], iterations, learning_rate)
+
+        if n_calibration and 0 < y[calibration_idx].sum() < n_calibration:
+            scores = self.decision_function([examples[i] for i in calibration_idx])
+            self.platt = self._fit_platt(scores, y[calibration_idx])
+        else:
+            self.platt = (1.0, 0.0)
+
+        self.info = {
+            'n_examples': int(len(examples)),
+            'n_aa': int(y.sum()),
+            'n_oi': int(len(y) - y.sum()),
+            'n_calibration': int(n_calibration)
+        }
+        return self
+
+    def _fit_weights(self, examples: List[Dict[str, Any]], y: np.ndarray, iterations: int, learning_rate: float) -> None:
+        indptr, indices, values = self._vectorize(examples)
+        lengths = np.diff(indptr)
+        n = len(examples)
+
+        w = np.zeros(self.n_features, dtype=np.float64)
+        b = float(np.log((y.sum() + 1) / (n - y.sum() + 1)))
+        m_w, v_w = np.zeros_like(w), np.zeros_like(w)
+        m_b = v_b = 0.0
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+        for t in range(1, iterations + 1):
+            error = self._sigmoid(self._row_dot(w, indptr, indices, values) + b) - y
+            grad_w = np.bincount(indices, weights=values * np.repeat(error, lengths),
+                                 minlength=self.n_features) / n + self.l2 * w
+            grad_b = error.mean()
+
+            m_w = beta1 * m_w + (1 - beta1) * grad_w
+            v_w = beta2 * v_w + (1 - beta2) * grad_w ** 2
+            m_b = beta1 * m_b + (1 - beta1) * grad_b
+            v_b = beta2 * v_b + (1 - beta2) * grad_b ** 2
+            step = learning_rate * np.sqrt(1 - beta2 ** t) / (1 - beta1 ** t)
+            w -= step * m_w / (np.sqrt(v_w) + eps)
+            b -= step * m_b / (np.sqrt(v_b) + eps)
+
+        self.weights = w.astype(np.float32)
+        self.bias = b
+
+    def _fit_platt(self, scores: np.ndarray, y: np.ndarray, iterations: int = 50) -> Tuple[float, float]:
+        """Fit sigmoid(a * score + b) to held-out labels with damped Newton steps."""
+        # Platt's smoothed targets keep the fit from diverging on separable data
+        n_pos, n_neg = y.sum(), len(y) - y.sum()
+        target = np.where(y > 0, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+
+        def loss(params):
+            z = params[0] * scores + params[1]
+            return np.sum(np.logaddexp(0, z) - target * z)
+
+        params = np.array([1.0, 0.0])
+        current = loss(params)
+        for _ in range(iterations):
+            p = self._sigmoid(params[0] * scores + params[1])
+            grad = np.array([np.sum((p - target) * scores), np.sum(p - target)])
+            weight = p * (1 - p)
+            hessian = np.array([
+                [np.sum(weight * scores * scores), np.sum(weight * scores)],
+                [np.sum(weight * scores), np.sum(weight)]
+            ]) + np.eye(2) * 1e-3
+            delta = np.linalg.solve(hessian, grad)
+
+            step = 1.0
+            while step > 1e-4 and loss(params - step * delta) > current:
+                step /= 2
+            if step <= 1e-4:
+                break
+            params = params - step * delta
+            improved = loss(params)
+            if current - improved < 1e-10:
+                break
+            current = improved
+        return float(params[0]), float(params[1])
+
+    # Prediction
+
+    def decision_function(self, examples: List[Dict[str, Any]]) -> np.ndarray:
+        """Raw (uncalibrated) logit for every example."""
+        if not examples:
+            return np.zeros(0)
+        indptr, indices, values = self._vectorize(examples)
+        return self._row_dot(self.weights, indptr, indices, values) + self.bias
+
+    def predict_proba(self, examples: List[Dict[str, Any]]) -> np.ndarray:
+        """Calibrated probability that each example is Actionable Advice."""
+        a, b = self.platt
+        return self._sigmoid(a * self.decision_function(examples) + b)
+
+    def classify_batch(self, sentences: List[Dict[str, Any]], keyword: str) -> List[Dict[str, Any]]:
+        """Classify sentence dicts (as produced by SentenceExtractor) for one keyword."""
+        examples = [dict(item, keyword=keyword) for item in sentences]
+        probabilities = self.predict_proba(examples)
+        results = []
+        for example, probability in zip(examples, probabilities):
+            classification = "AA" if probability >= 0.5 else "OI"
+            cues = self._top_cues(example, 1 if classification == "AA" else -1)
+            rationale = (
+                f"Predicted by the classifier trained on {self.info.get('n_examples', 0)} reviewed labels "
+                f"(probability of AA: {probability:.0%})."
+            )
+            if cues:
+                rationale += f" Strongest cues: {', '.join(cues)}."
+            results.append({
+                "classification": classification,
+                "rationale": rationale,
+                "probability": float(probability)
+            })
+        return results
+
+    def _top_cues(self, example: Dict[str, Any], direction: int, limit: int = 3) -> List[str]:
+        """Readable features that pushed the prediction the most towards its label."""
+        contributions = {}
+        for feature in self._tokens(example):
+            if feature.startswith(("w=", "b=")):
+                contributions[feature[2:]] = direction * float(self.weights[self._hash(feature)])
+        contributions.pop("<kw>", None)
+        ranked = sorted(contributions.items(), key=lambda item: item[1], reverse=True)
+        keyword = f"[{example.get('keyword', '')}]"
+        return [f"'{text.replace('<kw>', keyword)}'" for text, weight in ranked[:limit] if weight > 0]
+
+    # Persistence
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        """Persist the model as a compressed .npz holding only non-zero weights."""
+        path = Path(path) if path else self.DEFAULT_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        nonzero = np.flatnonzero(self.weights)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                indices=nonzero.astype(np.int32),
+                weights=self.weights[nonzero],
+                params=np.array([self.bias, self.platt[0], self.platt[1]], dtype=np.float64),
+                config=np.array(json.dumps({'n_features': self.n_features, 'l2': self.l2, 'info': self.info}))
+            )
+        self._loaded.pop(str(path), None)
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> 'HashedNgramClassifier':
+        """Load a model written by save()."""
+        path = Path(path) if path else cls.DEFAULT_PATH
+        with np.load(path) as data:
+            config = json.loads(str(data['config']))
+            model = cls(n_features=config['n_features'], l2=config['l2'])
+            model.weights[data['indices']] = data['weights']
+            model.bias, a, b = (float(v) for v in data['params'])
+        model.platt = (a, b)
+        model.info = config.get('info', {})
+        return model
+
+    @classmethod
+    def load_default(cls) -> Optional['HashedNgramClassifier']:
+        """Load the default model file, reusing the cached instance while the file is unchanged."""
+        path = cls.DEFAULT_PATH
+        if not path.is_file():
+            return None
+        mtime = path.stat().st_mtime
+        cached = cls._loaded.get(str(path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        model = cls.load(path)
+        cls._loaded[str(path)] = (mtime, model)
+        return model
+
+
+def train_from_sessions(repository, methods: Optional[Iterable[str]] = HUMAN_METHODS,
+                        path: Optional[Path] = None,
+                        progress: Optional[Callable[[int, int], None]] = None) -> HashedNgramClassifier:
+    """Train a classifier from the saved sessions in a repository and persist it.
+
+    Only the newest session of each lineage is read, since it already holds the
+    labels of the sessions it was saved from. When the same occurrence is labeled
+    in several lineages, the newest session wins. progress(done, total) is called
+    after each session is read.
+    """
+    seen = set()
+    examples, labels = [], []
+    heads = repository.get_lineage_heads()
+    for done, session_id in enumerate(heads, start=1):
+        session_data = repository.load_session(session_id)
+        if progress is not None:
+            progress(done, len(heads))
+        if not session_data:
+            continue
+        for example, label in iter_labeled_examples(session_data, methods):
+            key = (example['keyword'], example['sentence'], example['start'], example['end'])
+            if key in seen:
+                continue
+            seen.add(key)
+            examples.append(example)
+            labels.append(label)
+
+    model = HashedNgramClassifier().fit(examples, labels)
+    model.save(path)
+    return model
@@ -0,0 +1,187 @@
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from src.domain.intervals import LossIntervals
+
+LABELS = ("AA", "OI")
+ISP_INTERNAL_FIELDS = ('name', 'text', 'analysis_results', 'hydrated', 'summary')
+UNKNOWN = "(unknown)"
+AI_METHODS = ("AI", "Suggestion")
+SWITCHED_METHOD = "Manual (Switched)"
+REVIEWED_FLAG = "reviewed"
+SAME_AS_LABEL = 2
+UNREVIEWED = 3
+
+
+class OccurrenceTable:
+    """Columnar table of the classified occurrences of a session, for corpus-level metrics.
+
+    Each row is one classified occurrence with its ISP, keyword, label and the
+    method and model from its classification metadata. ISPs that are still stubs
+    contribute one row per keyword and label with the stored count in 'count' and
+    an unknown method and model. 'ai_label' holds the label an AI method proposed
+    for the occurrence where a human has reviewed it, and 'ai_unreviewed' marks AI
+    labels nobody has looked at yet (see _ai_prediction). ISP attributes (any extra ISP fields, such as
+    sector, year or version, plus the ISP name) are kept in a separate frame and
+    joined only when a breakdown groups by them.
+
+    The table is built once per data version; breakdowns are computed with
+    pandas group-bys and memoized for the lifetime of the table.
+    """
+
+    BASE_DIMENSIONS = ('keyword', 'isp_id', 'method', 'model')
+
+    def __init__(self, frame: pd.DataFrame, attributes: pd.DataFrame, version: Optional[int] = None):
+        self.frame = frame
+        self.attributes = attributes
+        self.version = version
+        self._results: Dict[Tuple, pd.DataFrame] = {}
+        self._isp_rows: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_session(cls, isps: Dict[int, Dict[str, Any]], classification_metadata: Dict[str, Any],
+                     version: Optional[int] = None) -> 'OccurrenceTable':
+        """Build the table from the ISPs and classification metadata of a session."""
+        # One entry per run of occurrences with the same ISP, keyword and label, expanded with np.repeat.
+        run_isps: List[int] = []
+        run_keywords: List[str] = []
+        run_labels: List[int] = []
+        run_lengths: List[int] = []
+        counts: List[np.ndarray] = []
+        metadata: List[Optional[Dict[str, Any]]] = []
+        attribute_rows = {}
+
+        for isp_id, isp in isps.items():
+            attribute_rows[isp_id] = {'isp_name': isp.get('name') or f"ISP {isp_id}"}
+            attribute_rows[isp_id].update({
+                key: str(value) for key, value in isp.items()
+                if key not in ISP_INTERNAL_FIELDS and isinstance(value, (str, int, float, bool))
+            })
+            if isp.get('hydrated') is False:
+                for label_code, label in enumerate(LABELS):
+                    for keyword, count in isp['summary'][label].items():
+                        if count:
+                            run_isps.append(isp_id)
+                            run_keywords.append(keyword)
+                            run_labels.append(label_code)
+                            run_lengths.append(1)
+                            counts.append(np.array([count], dtype=np.int64))
+                            metadata.append(None)
+                continue
+            for keyword, results in isp.get('analysis_results', {}).items():
+                prefix = f"{isp_id}::{keyword}::"
+                for label_code, label in enumerate(LABELS):
+                    occurrences = results.get(label, [])
+                    if not occurrences:
+                        continue
+                    run_isps.append(isp_id)
+                    run_keywords.append(keyword)
+                    run_labels.append(label_code)
+                    run_lengths.append(len(occurrences))
+                    counts.append(np.ones(len(occurrences), dtype=np.int64))
+                    metadata.extend([classification_metadata.get(prefix + occurrence) for occurrence in occurrences])
+
+        lengths = np.asarray(run_lengths, dtype=np.int64)
+        keyword_codes, keyword_names = pd.factorize(pd.Series(run_keywords, dtype=object), sort=True)
+        methods = [entry.get('method') if entry else None for entry in metadata]
+        models = [entry.get('model') if entry else None for entry in metadata]
+        label_codes = np.repeat(np.asarray(run_labels, dtype=np.int8), lengths)
+        ai_codes = np.fromiter((cls._ai_prediction(entry) for entry in metadata), dtype=np.int8, count=len(metadata))
+        ai_unreviewed = ai_codes == UNREVIEWED
+        ai_codes = np.where(ai_codes == SAME_AS_LABEL, label_codes, np.where(ai_unreviewed, -1, ai_codes))
+        frame = pd.DataFrame({
+            'isp_id': np.repeat(np.asarray(run_isps, dtype=np.int64), lengths),
+            'keyword': pd.Categorical.from_codes(np.repeat(keyword_codes, lengths), categories=keyword_names),
+            'label': pd.Categorical.from_codes(label_codes, categories=list(LABELS)),
+            'method': cls._categorical(methods),
+            'model': cls._categorical(models),
+            'ai_label': pd.Categorical.from_codes(ai_codes, categories=list(LABELS)),
+            'ai_unreviewed': ai_unreviewed,
+            'count': np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+        })
+        attributes = pd.DataFrame.from_dict(attribute_rows, orient='index')
+        attributes.index.name = 'isp_id'
+        return cls(frame, attributes, version)
+
+    @staticmethod
+    def _ai_prediction(entry: Optional[Dict[str, Any]]) -> int:
+        """Code of the reviewed AI label of an occurrence: an index into LABELS, SAME_AS_LABEL
+        when the current label is the AI's, UNREVIEWED for an AI label no human has
+        reviewed, or -1 when there is no AI label.
+
+        An AI label counts as reviewed when a suggestion was shown while the user
+        classified (recorded in the metadata), when the suggestion was accepted, when
+        the AI label was switched (the original label and method are kept) or when
+        the user confirmed it, which sets the 'reviewed' flag.
+        """
+        if not entry:
+            return -1
+        suggested = entry.get('suggested_classification')
+        if suggested in LABELS:
+            return LABELS.index(suggested)
+        method = entry.get('method')
+        if method == SWITCHED_METHOD:
+            if entry.get('original_method') in AI_METHODS and entry.get('original_classification') in LABELS:
+                return LABELS.index(entry['original_classification'])
+            return -1
+        if method == "Suggestion" or (method in AI_METHODS and entry.get(REVIEWED_FLAG)):
+            return SAME_AS_LABEL
+        return UNREVIEWED if method in AI_METHODS else -1
+
+    @staticmethod
+    def _categorical(values: List[Optional[str]]) -> pd.Categorical:
+        codes, categories = pd.factorize(pd.Series(values, dtype=object), sort=True)
+        if (codes < 0).any():
+            codes = np.where(codes < 0, len(categories), codes)
+            categories = list(categories) + [UNKNOWN]
+        return pd.Categorical.from_codes(codes, categories=list(categories))
+
+    @property
+    def dimensions(self) -> List[str]:
+        """Columns results can be grouped by: the base dimensions followed by the ISP attributes."""
+        return list(self.BASE_DIMENSIONS) + list(self.attributes.columns)
+
+    def _column(self, dimension: str) -> pd.Series:
+        if dimension in self.frame.columns:
+            return self.frame[dimension]
+        if dimension not in self.attributes.columns:
+            raise KeyError(f"Unknown dimension: {dimension}")
+        if self._isp_rows is None:
+            self._isp_rows = self.attributes.index.get_indexer(self.frame['isp_id'])
+        attribute_codes, categories = pd.factorize(self.attributes[dimension].fillna(UNKNOWN), sort=True)
+        return pd.Series(pd.Categorical.from_codes(attribute_codes[self._isp_rows], categories=categories),
+                         index=self.frame.index, name=dimension)
+
+    def breakdown(self, by: Sequence[str] = ('keyword',), intervals: Optional[LossIntervals] = None) -> pd.DataFrame:
+        """AA and OI counts and loss of specificity per combination of the given dimensions.
+
+        Returns one row per group with the dimension columns, 'AA', 'OI', 'Total'
+        and 'Loss of specificity (%)', plus confidence interval columns when
+        intervals is given. With no dimensions, the single row holds the corpus
+        totals. The result is shared between callers and must not be modified.
+        """
+        if intervals is not None:
+            key = (tuple(by), intervals.resamples, intervals.seed, intervals.confidence)
+            if key not in self._results:
+                self._results[key] = intervals.add_columns(self.breakdown(by))
+            return self._results[key]
+
+        key = tuple(by)
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        counts = self.frame['count']
+        if key:
+            columns = [self._column(dimension) for dimension in key]
+            grouped = counts.groupby(columns + [self.frame['label']], observed=True).sum()
+            result = grouped.unstack('label', fill_value=0).reindex(columns=list(LABELS), fill_value=0)
+            result.columns = list(LABELS)
+            result = result.reset_index()
+        else:
+            sums = counts.groupby(self.frame['label'], observed=False).sum()
+            result = pd.DataFrame({label: [int(sums.get(label, 0))] for label in LABELS})
+        result['Total'] = result['AA'] + result['OI']
+        result['Loss of specificity (%)'] = (result['OI'] / result['Total'].where(result['Total'] > 0)) * 100
+        self._results[key] = result
+        return result
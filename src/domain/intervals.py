@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class LossIntervals:
+    """Confidence intervals for loss of specificity (the share of OI among classified occurrences).
+
+    Wilson score intervals are computed in closed form. Bootstrap intervals treat
+    the occurrences of a cell as a sample and resample them: the number of OI in a
+    resample of n occurrences with observed share p is Binomial(n, p), so the
+    resamples of all cells are drawn as one array with NumPy's binomial generator
+    (in batches of at most `batch_size` values) and reduced with percentiles.
+
+    The number of resamples, the seed and the confidence level can be set with
+    environment variables; a fixed seed makes the intervals reproducible.
+    """
+
+    ENV_RESAMPLES = "ISP_ANALYZER_BOOTSTRAP_RESAMPLES"
+    ENV_SEED = "ISP_ANALYZER_BOOTSTRAP_SEED"
+    ENV_CONFIDENCE = "ISP_ANALYZER_CONFIDENCE"
+    DEFAULT_RESAMPLES = 2000
+    DEFAULT_SEED = 0
+    DEFAULT_CONFIDENCE = 0.95
+
+    COLUMNS = ('Wilson low (%)', 'Wilson high (%)', 'Bootstrap low (%)', 'Bootstrap high (%)')
+
+    # Interval tables per metrics version, so reruns and exports reuse them until a classification changes.
+    _cache: 'OrderedDict[Tuple, pd.DataFrame]' = OrderedDict()
+    _cache_size = 8
+    _cache_lock = threading.Lock()
+
+    def __init__(self, resamples: Optional[int] = None, seed: Optional[int] = None,
+                 confidence: Optional[float] = None, batch_size: int = 4_000_000):
+        self.resamples = int(resamples if resamples is not None
+                             else os.environ.get(self.ENV_RESAMPLES) or self.DEFAULT_RESAMPLES)
+        self.seed = int(seed if seed is not None else os.environ.get(self.ENV_SEED) or self.DEFAULT_SEED)
+        self.confidence = float(confidence if confidence is not None
+                                else os.environ.get(self.ENV_CONFIDENCE) or self.DEFAULT_CONFIDENCE)
+        if self.resamples < 1:
+            raise ValueError("The number of bootstrap resamples must be at least 1.")
+        if not 0 < self.confidence < 1:
+            raise ValueError("The confidence level must be between 0 and 1.")
+        self.batch_size = batch_size
+
+    @property
+    def label(self) -> str:
+        return f"{self.confidence * 100:g}%"
+
+    def wilson(self, oi: np.ndarray, total: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Wilson score interval bounds in percent; NaN where total is 0."""
+        oi = np.asarray(oi, dtype=np.float64)
+        total = np.asarray(total, dtype=np.float64)
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        n = np.where(total > 0, total, 1)
+        p = oi / n
+        denominator = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / denominator
+        margin = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+        low = np.where(total > 0, np.clip(center - margin, 0, 1) * 100, np.nan)
+        high = np.where(total > 0, np.clip(center + margin, 0, 1) * 100, np.nan)
+        return low, high
+
+    def bootstrap(self, oi: np.ndarray, total: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Percentile bootstrap interval bounds in percent; NaN where total is 0.
+
+        Cells with the same OI count and total have the same bootstrap distribution,
+        so resamples are drawn once per distinct (OI, total) pair.
+        """
+        oi = np.asarray(oi, dtype=np.int64)
+        total = np.asarray(total, dtype=np.int64)
+        low = np.full(len(total), np.nan)
+        high = np.full(len(total), np.nan)
+        cells = np.flatnonzero(total > 0)
+        if not len(cells):
+            return low, high
+        pairs, inverse = np.unique(np.stack([oi[cells], total[cells]], axis=1), axis=0, return_inverse=True)
+        pair_low = np.empty(len(pairs))
+        pair_high = np.empty(len(pairs))
+        rng = np.random.default_rng(self.seed)
+        quantiles = [(1 - self.confidence) / 2, (1 + self.confidence) / 2]
+        rows_per_batch = max(1, self.batch_size // self.resamples)
+        for start in range(0, len(pairs), rows_per_batch):
+            batch = slice(start, start + rows_per_batch)
+            successes, n = pairs[batch, 0], pairs[batch, 1]
+            draws = rng.binomial(n[:, None], (successes / n)[:, None], size=(len(n), self.resamples))
+            bounds = np.quantile(draws / n[:, None], quantiles, axis=1) * 100
+            pair_low[batch], pair_high[batch] = bounds[0], bounds[1]
+        inverse = inverse.ravel()
+        low[cells] = pair_low[inverse]
+        high[cells] = pair_high[inverse]
+        return low, high
+
+    def add_columns(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Copy a frame with 'OI' and 'Total' columns and add the Wilson and bootstrap interval columns."""
+        result = frame.copy()
+        wilson_low, wilson_high = self.wilson(result['OI'].to_numpy(), result['Total'].to_numpy())
+        boot_low, boot_high = self.bootstrap(result['OI'].to_numpy(), result['Total'].to_numpy())
+        for column, values in zip(self.COLUMNS, (wilson_low, wilson_high, boot_low, boot_high)):
+            result[column] = values
+        return result
+
+    def for_metrics(self, metrics, keywords: Dict[str, str]) -> pd.DataFrame:
+        """Intervals for every ISP and keyword of a MetricsAggregate, plus one 'Sum' row per keyword.
+
+        Columns are 'ISP', 'Keyword', 'AA', 'OI', 'Total', 'Loss of specificity (%)'
+        and the interval columns. Cached per metrics version; the result is shared
+        between callers and must not be modified.
+        """
+        key = (metrics.version, tuple(keywords), self.resamples, self.seed, self.confidence)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        isp_ids = sorted(metrics.counts)
+        keyword_names = list(keywords)
+        counts = np.zeros((len(isp_ids) + 1, len(keyword_names), 2), dtype=np.int64)
+        for row, isp_id in enumerate(isp_ids):
+            isp_counts = metrics.counts[isp_id]
+            for column, keyword in enumerate(keyword_names):
+                if keyword in isp_counts:
+                    counts[row, column] = isp_counts[keyword]
+        counts[-1] = counts[:-1].sum(axis=0)
+
+        frame = pd.DataFrame({
+            'ISP': np.repeat(np.array(isp_ids + ['Sum'], dtype=object), len(keyword_names)),
+            'Keyword': np.tile(np.array(keyword_names, dtype=object), len(isp_ids) + 1),
+            'AA': counts[:, :, 0].ravel(),
+            'OI': counts[:, :, 1].ravel()
+        })
+        frame['Total'] = frame['AA'] + frame['OI']
+        frame['Loss of specificity (%)'] = frame['OI'] / frame['Total'].where(frame['Total'] > 0) * 100
+        result = self.add_columns(frame)
+
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
@@ -1,4 +1,5 @@
-from typing import Dict, List, Any, Optional
+import itertools
+from typing import Dict, List, Any, Iterable, Optional
 
 class MetricsCalculator:
     """Responsible for calculating analysis metrics."""
@@ -13,6 +14,11 @@ class MetricsCalculator:
         keyword_aa_counts = {}
         keyword_oi_counts = {}
         
+        if isp_data.get('hydrated') is False:
+            # Stub of a lazily loaded session: use the stored counts.
+            keyword_aa_counts.update(isp_data['summary']['AA'])
+            keyword_oi_counts.update(isp_data['summary']['OI'])
+        
         for keyword, data in isp_data.get('analysis_results', {}).items():
             aa_count = len(data.get('AA', []))
             oi_count = len(data.get('OI', []))
@@ -47,4 +53,141 @@ class MetricsCalculator:
         all_metrics = {}
         for isp_id in isps:
             all_metrics[isp_id] = MetricsCalculator.calculate_metrics(isp_id, isps, keywords)
-        return all_metrics
\ No newline at end of file
+        return all_metrics
+
+
+class MetricsAggregate:
+    """AA/OI counters per ISP and keyword, updated as classifications change.
+    
+    Every change to a classification is recorded with `record`, which adjusts the
+    counters of one ISP and keyword and the corpus totals in constant time, so
+    showing metrics does not have to walk the ISPs. The metrics dicts built from
+    the counters are cached until the next change.
+    
+    `version` changes whenever the classifications, their metadata or the ISPs
+    change and is unique within the process, so it can key caches of anything
+    derived from the session's data.
+    """
+    
+    LABEL_INDEX = {'AA': 0, 'OI': 1}
+    _versions = itertools.count(1)
+    
+    def __init__(self):
+        self.counts: Dict[int, Dict[str, List[int]]] = {}
+        self.isp_totals: Dict[int, List[int]] = {}
+        self.keyword_totals: Dict[str, List[int]] = {}
+        self.version = next(self._versions)
+        self._cache = None
+    
+    @classmethod
+    def from_isps(cls, isps: Dict[int, Dict]) -> 'MetricsAggregate':
+        """Count the classifications of all ISPs, using the stored counts of ISPs that are stubs."""
+        aggregate = cls()
+        for isp_id, isp in isps.items():
+            aggregate.set_isp(isp_id, isp)
+        return aggregate
+    
+    def _add(self, isp_id: int, keyword: str, index: int, amount: int) -> None:
+        self.counts.setdefault(isp_id, {}).setdefault(keyword, [0, 0])[index] += amount
+        self.isp_totals.setdefault(isp_id, [0, 0])[index] += amount
+        self.keyword_totals.setdefault(keyword, [0, 0])[index] += amount
+    
+    def set_isp(self, isp_id: int, isp: Dict[str, Any]) -> None:
+        """Replace the counters of one ISP with counts taken from its classification lists."""
+        self.remove_isp(isp_id)
+        self.counts[isp_id] = {}
+        self.isp_totals[isp_id] = [0, 0]
+        if isp.get('hydrated') is False:
+            for label, index in self.LABEL_INDEX.items():
+                for keyword, count in isp['summary'][label].items():
+                    self._add(isp_id, keyword, index, count)
+        for keyword, data in isp.get('analysis_results', {}).items():
+            self.counts[isp_id][keyword] = [0, 0]
+            for label, index in self.LABEL_INDEX.items():
+                self._add(isp_id, keyword, index, len(data.get(label, [])))
+        self.version = next(self._versions)
+    
+    def remove_isp(self, isp_id: int) -> None:
+        """Drop the counters of a deleted ISP."""
+        for keyword, counts in self.counts.pop(isp_id, {}).items():
+            totals = self.keyword_totals[keyword]
+            totals[0] -= counts[0]
+            totals[1] -= counts[1]
+        self.isp_totals.pop(isp_id, None)
+        self.version = next(self._versions)
+    
+    def record(self, isp_id: int, keyword: str, old_label: Optional[str], new_label: Optional[str]) -> None:
+        """Count an occurrence moving from old_label to new_label; None means unclassified."""
+        if old_label == new_label:
+            return
+        if old_label is not None:
+            self._add(isp_id, keyword, self.LABEL_INDEX[old_label], -1)
+        if new_label is not None:
+            self._add(isp_id, keyword, self.LABEL_INDEX[new_label], 1)
+        self.version = next(self._versions)
+    
+    def touch(self) -> None:
+        """Start a new data version for a change that leaves the counts as they are, such as new metadata."""
+        self.version = next(self._versions)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Counters in a compact JSON form: one [AA counts, OI counts] pair per ISP, aligned with 'keywords'."""
+        keywords = sorted(self.keyword_totals)
+        return {
+            'keywords': keywords,
+            'isps': {
+                str(isp_id): [[counts.get(kw, [0, 0])[0] for kw in keywords],
+                              [counts.get(kw, [0, 0])[1] for kw in keywords]]
+                for isp_id, counts in self.counts.items()
+            }
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], isp_ids: Iterable[int]) -> Optional['MetricsAggregate']:
+        """Restore counters saved with to_dict; returns None if they do not cover exactly isp_ids."""
+        if not data or {int(isp_id) for isp_id in data.get('isps', {})} != set(isp_ids):
+            return None
+        aggregate = cls()
+        keywords = data['keywords']
+        for isp_id, (aa_counts, oi_counts) in data['isps'].items():
+            isp_id = int(isp_id)
+            aggregate.counts[isp_id] = {}
+            aggregate.isp_totals[isp_id] = [0, 0]
+            for keyword, aa, oi in zip(keywords, aa_counts, oi_counts):
+                aggregate.counts[isp_id][keyword] = [0, 0]
+                aggregate._add(isp_id, keyword, 0, aa)
+                aggregate._add(isp_id, keyword, 1, oi)
+        return aggregate
+    
+    def isp_metrics(self, isp_id: int, keywords: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Metrics of one ISP in the form returned by MetricsCalculator.calculate_metrics."""
+        if isp_id not in self.counts:
+            return None
+        counts = self.counts[isp_id]
+        total_aa, total_oi = self.isp_totals[isp_id]
+        total_all = total_aa + total_oi
+        metrics = {
+            'total_aa': total_aa,
+            'total_oi': total_oi,
+            'total_count': total_all,
+            'total_loss_specificity': (total_oi / total_all * 100) if total_all > 0 else 0,
+            'aa_count': {},
+            'oi_count': {},
+            'keyword_loss_specificity': {}
+        }
+        for kw in keywords.keys():
+            aa, oi = counts.get(kw, (0, 0))
+            metrics['aa_count'][kw] = aa
+            metrics['oi_count'][kw] = oi
+            metrics['keyword_loss_specificity'][kw] = (oi / (aa + oi) * 100) if aa + oi > 0 else None
+        return metrics
+    
+    def all_metrics(self, keywords: Dict[str, str]) -> Dict[int, Dict]:
+        """Metrics of all ISPs, as MetricsCalculator.calculate_all_metrics; cached until the counters change.
+        
+        The returned dict is shared between callers and must not be modified.
+        """
+        key = (self.version, tuple(keywords))
+        if self._cache is None or self._cache[0] != key:
+            self._cache = (key, {isp_id: self.isp_metrics(isp_id, keywords) for isp_id in self.counts})
+        return self._cache[1]
@@ -0,0 +1,10 @@
+"""
+Startup support for the ISP Keyword Analyzer: lazy package exports, capability
+probes and import-time profiling. Only uses the standard library, so it can be
+imported before anything else.
+"""
+from src.startup.lazy import lazy_exports
+from src.startup.capabilities import Capabilities
+from src.startup.profiling import ImportProfiler
+
+__all__ = ['lazy_exports', 'Capabilities', 'ImportProfiler']
@@ -0,0 +1,47 @@
+import threading
+import importlib.util
+from typing import Dict
+
+
+class Capabilities:
+    """Which optional libraries are installed, checked without importing them.
+
+    importlib.util.find_spec only locates a module on the import path, so probing
+    llama_cpp does not load its native library. A library that is found can still
+    fail to import; the code using it handles ImportError at first use.
+    """
+
+    OPTIONAL_MODULES = {
+        'llama_cpp': "AI classification with local models",
+        'PyPDF2': "PDF upload",
+        'xlsxwriter': "Excel export",
+        'pyarrow': "Parquet export"
+    }
+
+    _cache: Dict[str, bool] = {}
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def available(cls, module: str) -> bool:
+        """Whether a module can be found on the import path; cached for the process."""
+        with cls._cache_lock:
+            if module in cls._cache:
+                return cls._cache[module]
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except (ImportError, ValueError):
+            # A missing parent package of a dotted name, or a module whose __spec__ is None.
+            found = False
+        with cls._cache_lock:
+            cls._cache[module] = found
+        return found
+
+    @classmethod
+    def llm_available(cls) -> bool:
+        """Whether llama-cpp-python is installed."""
+        return cls.available('llama_cpp')
+
+    @classmethod
+    def report(cls) -> Dict[str, bool]:
+        """Availability of every optional module."""
+        return {module: cls.available(module) for module in cls.OPTIONAL_MODULES}
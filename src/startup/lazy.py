@@ -0,0 +1,26 @@
+import sys
+import importlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+
+def lazy_exports(package: str, exports: Dict[str, Iterable[str]]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Module-level __getattr__ and __dir__ (PEP 562) that import a package's exports at first use.
+
+    `exports` maps each submodule to the names the package re-exports from it.
+    `from package import Name` imports only the submodule defining Name, and the
+    value is stored on the package so later lookups skip __getattr__.
+    """
+    modules = {name: module for module, names in exports.items() for name in names}
+
+    def __getattr__(name: str) -> Any:
+        module = modules.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(modules))
+
+    return __getattr__, __dir__
@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import threading
+import importlib.abc
+from typing import Any, List, Optional, TextIO, Tuple
+
+# One imported module: (name, self time in microseconds, cumulative time in microseconds, nesting level).
+ImportRecord = Tuple[str, int, int, int]
+
+
+class _TimingLoader(importlib.abc.Loader):
+    """Wraps a module's loader to time its execution; everything else is delegated to the wrapped loader."""
+
+    def __init__(self, loader, profiler: 'ImportProfiler', find_time: float):
+        self.loader = loader
+        self.profiler = profiler
+        self.find_time = find_time
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        stack = self.profiler._stack()
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            # Hand the module its real loader back, so nothing downstream sees the wrapper.
+            module.__loader__ = self.loader
+            if getattr(module, '__spec__', None) is not None:
+                module.__spec__.loader = self.loader
+            children = stack.pop()
+            elapsed = time.perf_counter() - started + self.find_time
+            if stack:
+                stack[-1] += elapsed
+            self.profiler._record(module.__name__, elapsed - children, elapsed, len(stack))
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """First finder on sys.meta_path: finds modules with the other finders and wraps their loaders."""
+
+    def __init__(self, profiler: 'ImportProfiler'):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        started = time.perf_counter()
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimingLoader(spec.loader, self.profiler, time.perf_counter() - started)
+        return spec
+
+
+class ImportProfiler:
+    """Import-time profile of the modules imported after install(), like `python -X importtime`.
+
+    Each newly imported module gets a self time (finding and executing the module)
+    and a cumulative time (including the modules it imported in turn), in
+    microseconds. Modules imported before install() or already cached in
+    sys.modules are not listed. Set ISP_ANALYZER_IMPORT_PROFILE=1 to profile the
+    app's imports; the report is written to stderr and shown at the bottom of the
+    page, and modules loaded lazily at first use appear as they are imported.
+    """
+
+    ENV_ENABLED = "ISP_ANALYZER_IMPORT_PROFILE"
+    HEADER = "import time: self [us] | cumulative | imported package"
+
+    _active: Optional['ImportProfiler'] = None
+    _install_lock = threading.Lock()
+
+    def __init__(self):
+        self.records: List[ImportRecord] = []
+        self._finder = _TimingFinder(self)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._written = 0
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return os.environ.get(cls.ENV_ENABLED, "").strip().lower() not in ("", "0", "off", "false", "no")
+
+    @classmethod
+    def install(cls) -> 'ImportProfiler':
+        """Start profiling imports in this process; returns the running profiler if there is one."""
+        with cls._install_lock:
+            if cls._active is None:
+                cls._active = cls()
+                sys.meta_path.insert(0, cls._active._finder)
+            return cls._active
+
+    @classmethod
+    def install_from_env(cls) -> Optional['ImportProfiler']:
+        """Install the profiler if ISP_ANALYZER_IMPORT_PROFILE is set."""
+        return cls.install() if cls.enabled() else None
+
+    @classmethod
+    def active(cls) -> Optional['ImportProfiler']:
+        return cls._active
+
+    @classmethod
+    def uninstall(cls) -> None:
+        with cls._install_lock:
+            if cls._active is not None:
+                if cls._active._finder in sys.meta_path:
+                    sys.meta_path.remove(cls._active._finder)
+                cls._active = None
+
+    def _stack(self) -> List[float]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, name: str, self_time: float, cumulative: float, level: int) -> None:
+        with self._lock:
+            self.records.append((name, int(self_time * 1e6), int(cumulative * 1e6), level))
+
+    def total(self) -> float:
+        """Seconds spent importing top-level modules (those not imported by another profiled module)."""
+        with self._lock:
+            return sum(cumulative for _, _, cumulative, level in self.records if level == 0) / 1e6
+
+    def slowest(self, count: int = 10) -> List[ImportRecord]:
+        """The modules with the largest cumulative import time."""
+        with self._lock:
+            return sorted(self.records, key=lambda record: record[2], reverse=True)[:count]
+
+    def format(self, records: Optional[List[ImportRecord]] = None) -> str:
+        """Records in the format of `python -X importtime`, in the order the imports finished."""
+        if records is None:
+            with self._lock:
+                records = list(self.records)
+        lines = [self.HEADER]
+        lines.extend(f"import time: {self_us:>9} | {cumulative:>10} | {'  ' * level}{name}"
+                     for name, self_us, cumulative, level in records)
+        return "\n".join(lines)
+
+    def write_new(self, stream: Optional[TextIO] = None) -> int:
+        """Write the records added since the last call to stream (stderr by default). Returns how many."""
+        with self._lock:
+            records = self.records[self._written:]
+            self._written = len(self.records)
+        if records:
+            print(self.format(records), file=stream or sys.stderr, flush=True)
+        return len(records)
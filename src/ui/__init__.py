@@ -1,6 +1,15 @@
 """
 User interface components for the ISP Keyword Analyzer.
 """
-from src.ui.app import setup_app_ui
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
 
-__all__ = ['setup_app_ui']
\ No newline at end of file
+if TYPE_CHECKING:
+    from src.ui.app import setup_app_ui
+
+__all__ = ['setup_app_ui']
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.ui.app': ['setup_app_ui']
+})
@@ -7,10 +7,9 @@ from src.domain.metrics import MetricsCalculator
 from src.domain.ai.classifier import SentenceClassifier, BatchClassifier
 from src.config.settings import KeywordSets
 from src.ui.components.sidebar import render_sidebar
-from src.ui.pages.analysis import render_sentence_analysis_ui, render_analysis_complete_ui
+from src.ui.pages.analysis import render_sentence_analysis_ui, render_analysis_complete_ui, render_isp_counters
 from src.ui.pages.upload import render_upload_ui
-from src.ui.pages.export import render_export_ui
-from src.ui.utils import show_congratulations
+from src.ui.utils import show_congratulations, mark_keyword_analyzed, ensure_isp_loaded
 
 def setup_app_ui(session_manager):
     """Setup the main application UI."""
@@ -31,25 +30,42 @@ def setup_app_ui(session_manager):
             st.session_state.file_uploaded = False
             st.session_state.uploaded_filename = ""
     
-    def get_current_isp():
-        """Get the currently selected ISP data."""
-        if st.session_state.current_isp_id is None:
-            return None
-        try:
-            st.session_state.current_isp_id = int(st.session_state.current_isp_id)
-        except ValueError:
-            st.error(f"Invalid ISP ID: {st.session_state.current_isp_id}")
-            return None
-        return st.session_state.isps.get(st.session_state.current_isp_id)
-    
-    # Render sidebar
-    render_sidebar(on_file_upload, get_current_isp, session_manager)
+    # Render sidebar; it is a fragment, which can only write to the sidebar from inside it
+    with st.sidebar:
+        render_sidebar(on_file_upload, get_current_isp, session_manager)
     
     # Main content area
     # AI processing status indicator
     if st.session_state.ai_analysis_in_progress:
         st.info("AI analysis in progress... Please wait.")
     
+    render_main_content(classifier)
+    
+    # Analysis results section (if applicable)
+    if st.session_state.isps and any(isp.get('analysis_results') or isp.get('summary')
+                                     for isp in st.session_state.isps.values()):
+        render_results()
+
+def get_current_isp():
+    """Get the currently selected ISP data."""
+    if st.session_state.current_isp_id is None:
+        return None
+    try:
+        st.session_state.current_isp_id = int(st.session_state.current_isp_id)
+    except ValueError:
+        st.error(f"Invalid ISP ID: {st.session_state.current_isp_id}")
+        return None
+    return ensure_isp_loaded(st.session_state.current_isp_id)
+
+@st.fragment
+def render_main_content(classifier: SentenceClassifier):
+    """Render the classification panel.
+    
+    This is a fragment: moving between sentences and classifying them reruns only
+    this panel, including the AA/OI counts of the keyword and the ISP below it.
+    Finishing or changing a keyword reruns the whole app, which also redraws the
+    sidebar and the results.
+    """
     # Get current ISP
     current_isp = get_current_isp()
     
@@ -73,12 +89,13 @@ def setup_app_ui(session_manager):
                 render_sentence_analysis_ui(current_isp, classifier)
             else:
                 render_analysis_complete_ui(current_isp)
+            render_isp_counters(st.session_state.current_isp_id, st.session_state.current_keyword)
         else:
             # No sentences found - automatic analysis complete
             st.info(f"No sentences with '{st.session_state.current_keyword}' were found.")
             
             # Mark this keyword as analyzed
-            st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(st.session_state.current_keyword)
+            mark_keyword_analyzed(st.session_state.current_isp_id, st.session_state.current_keyword)
             
             # Check if all keywords have been analyzed
             all_keywords = list(KeywordSets.get_keywords(st.session_state.language).keys())
@@ -109,10 +126,17 @@ def setup_app_ui(session_manager):
         st.info("Select a keyword from the sidebar to begin analysis.")
     elif not current_isp:
         render_upload_ui()
+
+@st.fragment
+def render_results():
+    """Render the results area as a fragment, so paging and filtering rerun only the results.
     
-    # Analysis results section (if applicable)
-    if st.session_state.isps and any(isp.get('analysis_results') for isp in st.session_state.isps.values()):
-        render_export_ui(st.session_state.isps, st.session_state.language)
+    The results are redrawn on every full rerun of the app: when a keyword is
+    finished, after sidebar actions that change the data and on Refresh Metrics.
+    """
+    # Imported here so pandas and the exporters are only loaded once there are results to show.
+    from src.ui.pages.export import render_export_ui
+    render_export_ui(st.session_state.isps, st.session_state.language)
 
 def get_next_keyword(all_keywords, analyzed_keywords, current_keyword):
     """Get the next keyword to analyze."""
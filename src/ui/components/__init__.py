@@ -1,20 +1,33 @@
 """
 Reusable UI components for the ISP Keyword Analyzer.
 """
-from src.ui.components.sidebar import render_sidebar
-from src.ui.components.tables import (
-    render_total_loss_table,
-    render_aa_keywords_table,
-    render_oi_keywords_table,
-    render_keyword_loss_table,
-    render_raw_data_table
-)
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from src.ui.components.sidebar import render_sidebar
+    from src.ui.components.downloads import render_prepared_download
+    from src.ui.components.tables import (
+        render_total_loss_table,
+        render_aa_keywords_table,
+        render_oi_keywords_table,
+        render_keyword_loss_table,
+        render_raw_data_table
+    )
 
 __all__ = [
     'render_sidebar',
+    'render_prepared_download',
     'render_total_loss_table',
     'render_aa_keywords_table',
     'render_oi_keywords_table',
     'render_keyword_loss_table',
     'render_raw_data_table'
-]
\ No newline at end of file
+]
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.ui.components.sidebar': ['render_sidebar'],
+    'src.ui.components.downloads': ['render_prepared_download'],
+    'src.ui.components.tables': ['render_total_loss_table', 'render_aa_keywords_table', 'render_oi_keywords_table', 'render_keyword_loss_table', 'render_raw_data_table']
+})
@@ -0,0 +1,76 @@
+import os
+import atexit
+import datetime
+import tempfile
+import threading
+import streamlit as st
+from typing import Any, Callable, Set
+
+# Temporary files being written by an export in this process, removed at exit if a write never finished.
+_pending_files: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+@atexit.register
+def _remove_pending_files() -> None:
+    with _pending_lock:
+        paths = list(_pending_files)
+        _pending_files.clear()
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_prepared_file(suffix: str, write: Callable[[str], None]) -> bytes:
+    """Write an export to a temporary file with write(path) and return its contents.
+
+    The file only exists while it is written and read: it is deleted right
+    after, also when write fails, and at process exit if the export never finished.
+    """
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as export_file:
+        path = export_file.name
+    with _pending_lock:
+        _pending_files.add(path)
+    try:
+        write(path)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        with _pending_lock:
+            _pending_files.discard(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def render_prepared_download(state_key: str, version: Any, prepare_label: str, download_label: str,
+                             suffix: str, mime: str, write: Callable[[str], None], file_name: str = None,
+                             use_container_width: bool = False) -> None:
+    """Write an export file on request and serve it until its version changes.
+
+    The contents are read once, when the export is prepared, and kept with the
+    version they were written for in st.session_state[state_key], so reruns pass
+    the same bytes to the download button instead of reading the file again. They
+    are dropped when the version changes or the browser session ends.
+    """
+    export = st.session_state.get(state_key)
+    if export is not None and export['version'] != version:
+        del st.session_state[state_key]
+        export = None
+
+    if export is None:
+        if not st.button(prepare_label, key=f"{state_key}_btn", use_container_width=use_container_width):
+            return
+        with st.spinner("Generating export..."):
+            export = {
+                'version': version,
+                'data': read_prepared_file(suffix, write),
+                'file_name': file_name or f"isp_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+            }
+        st.session_state[state_key] = export
+
+    st.download_button(download_label, export['data'], file_name=export['file_name'], mime=mime,
+                       key=f"{state_key}_download_btn", use_container_width=use_container_width)
@@ -5,17 +5,45 @@ from src.data.file.reader import FileReader
 from src.domain.analyzer import SentenceExtractor
 from src.domain.ai.classifier import BatchClassifier
 from src.domain.ai.model import ModelManager
-from src.ui.utils import show_congratulations
+from src.domain.ai.scheduler import InferenceScheduler
+from src.domain.ai.trained import HashedNgramClassifier, train_from_sessions
+from src.domain.metrics import MetricsAggregate
+from src.data.journal import SessionJournal, EVENT_ADD_ISP, EVENT_DELETE_ISP, EVENT_SET_ATTRIBUTES
+from src.data.archive import ProjectArchiveReader, ArchiveError
+from src.data.repository import SessionConflictError
+from src.ui.components.downloads import render_prepared_download
+from src.ui.utils import show_congratulations, journal_event, apply_classification, remove_classification, mark_keyword_analyzed, ensure_isp_loaded
 
+SESSION_PAGE_SIZE = 20
+ISP_ATTRIBUTES = ("sector", "year", "version")
+MERGE_CONFLICTS_SHOWN = 20
+
+def rerun_app(message: str) -> None:
+    """Rerun the whole app, not only the sidebar, and show message at the top of the sidebar."""
+    st.session_state.sidebar_message = message
+    st.rerun()
+
+
+@st.fragment
 def render_sidebar(on_file_upload: Callable, get_current_isp: Callable, session_manager) -> None:
-    """Render the sidebar UI."""
-    st.sidebar.header("Settings")
+    """Render the sidebar UI; call it inside `with st.sidebar`.
+    
+    This is a fragment, so widgets in the sidebar rerun only the sidebar. Actions
+    that change what the main area shows (the language, the ISP or keyword, adding,
+    deleting, loading or recovering data, AI analysis) rerun the whole app with
+    rerun_app.
+    """
+    message = st.session_state.pop('sidebar_message', None)
+    if message:
+        st.success(message)
+    
+    st.header("Settings")
     
-    st.sidebar.subheader("Language")
+    st.subheader("Language")
     language_options = KeywordSets.get_available_languages()
     
     if not st.session_state.isps:
-        selected_language = st.sidebar.selectbox(
+        selected_language = st.selectbox(
             "Select keyword language",
             language_options,
             index=language_options.index(st.session_state.language)
@@ -26,12 +54,13 @@ def render_sidebar(on_file_upload: Callable, get_current_isp: Callable, session_
             st.session_state.current_sentences = []
             st.session_state.current_index = 0
             st.session_state.classifications = []
+            st.rerun()
     else:
-        st.sidebar.info(f"Language: {st.session_state.language} (cannot change after adding ISPs)")
+        st.info(f"Language: {st.session_state.language} (cannot change after adding ISPs)")
     
-    st.sidebar.subheader("ISP Management")
+    st.subheader("ISP Management")
     
-    with st.sidebar.expander("Add New ISP", expanded=(st.session_state.current_isp_id is None)):
+    with st.expander("Add New ISP", expanded=(st.session_state.current_isp_id is None)):
         new_isp_name = st.text_input(
             "ISP Name", 
             disabled=not st.session_state.file_uploaded,
@@ -64,13 +93,13 @@ def render_model_selector():
     """Render the model selection UI component."""
     
     if not st.session_state.get("ai_available", False):
-        st.sidebar.error("AI functionality is disabled because the llama-cpp-python library is not installed.")
+        st.error("AI functionality is disabled because the llama-cpp-python library is not installed.")
         return
     
     available_models = ModelManager.get_available_models()
     
     if not any(model_info.get("available", False) for model_info in available_models.values()):
-        st.sidebar.error("No AI models found. Please download at least one model file.")
+        st.error("No AI models found. Please download at least one model file.")
         return
     
     if st.session_state.get("selected_model") is None:
@@ -85,7 +114,7 @@ def render_model_selector():
             model_options.append(model_id)
     
     if model_options:
-        selected_model = st.sidebar.radio(
+        selected_model = st.radio(
             "Select model:",
             model_options,
             format_func=lambda x: f"{available_models[x]['name']} - {available_models[x]['description']}",
@@ -102,25 +131,39 @@ def render_model_selector():
     missing_models = [model_id for model_id, info in available_models.items() if not info["available"]]
     if missing_models:
         missing_names = [available_models[model_id]['name'] for model_id in missing_models]
-        st.sidebar.warning(f"Missing model(s): {', '.join(missing_names)}. See download links in the models directory.")
+        st.warning(f"Missing model(s): {', '.join(missing_names)}. See download links in the models directory.")
     
-    if st.sidebar.button("Check GPU Availability", key="check_gpu_btn"):
-        with st.sidebar.expander("GPU Diagnostics", expanded=True):
+    if st.button("Check GPU Availability", key="check_gpu_btn"):
+        with st.expander("GPU Diagnostics", expanded=True):
             ModelManager.debug_cuda_availability()
 
 
+def render_inference_queue_status():
+    """Render queue depth and wait times of the model shared by all analysts."""
+    stats = InferenceScheduler.instance().stats()
+    interactive = stats['priorities']['interactive']
+    bulk = stats['priorities']['bulk']
+    
+    status = "busy" if stats['active'] else "idle"
+    st.caption(
+        f"Model {status} · waiting: {interactive['queue_depth']} suggestion(s), "
+        f"{bulk['queue_depth']} bulk request(s) · avg wait: "
+        f"{interactive['avg_wait']:.1f}s suggestions, {bulk['avg_wait']:.1f}s bulk"
+    )
+
+
 def handle_add_isp(new_isp_name, uploaded_file):
     """Handle adding a new ISP document."""
     if not new_isp_name:
-        st.sidebar.error("Please enter an ISP name")
+        st.error("Please enter an ISP name")
         return
     elif not uploaded_file:
-        st.sidebar.error("Please upload an ISP file")
+        st.error("Please upload an ISP file")
         return
 
     existing_names = [isp.get('name', f"ISP {isp_id}") for isp_id, isp in st.session_state.isps.items()]
     if new_isp_name in existing_names:
-        st.sidebar.error(f"An ISP with the name '{new_isp_name}' already exists. Please choose a different name.")
+        st.error(f"An ISP with the name '{new_isp_name}' already exists. Please choose a different name.")
         return
 
     reader = FileReader.get_reader_for_type(uploaded_file.type)
@@ -141,6 +184,8 @@ def handle_add_isp(new_isp_name, uploaded_file):
             'analysis_results': {}
         }
         st.session_state.analyzed_keywords[new_isp_id] = set()
+        st.session_state.metrics.set_isp(new_isp_id, st.session_state.isps[new_isp_id])
+        journal_event(EVENT_ADD_ISP, isp_id=new_isp_id, name=new_isp_name, text=isp_text)
         st.session_state.current_isp_id = new_isp_id
         st.session_state.current_keyword = None
         st.session_state.current_sentences = []
@@ -153,7 +198,7 @@ def handle_add_isp(new_isp_name, uploaded_file):
 
 def render_isp_selector(get_current_isp):
     """Render ISP selection component."""
-    st.sidebar.subheader("Select ISP")
+    st.subheader("Select ISP")
     isp_options = [(isp_id, data.get('name', f"ISP {isp_id}"))
                   for isp_id, data in st.session_state.isps.items()]
     selected_isp_index = 0
@@ -163,7 +208,7 @@ def render_isp_selector(get_current_isp):
                 selected_isp_index = i
                 break
                 
-    selected_isp_id = st.sidebar.selectbox(
+    selected_isp_id = st.selectbox(
         "Choose an ISP to analyze",
         [isp_id for isp_id, _ in isp_options],
         format_func=lambda x: next((name for id, name in isp_options if id == x), "Unknown"),
@@ -172,7 +217,7 @@ def render_isp_selector(get_current_isp):
     )
     
     if selected_isp_id is not None:
-        with st.sidebar.expander("Delete ISP", expanded=False):
+        with st.expander("Delete ISP", expanded=False):
             isp_name = st.session_state.isps[selected_isp_id].get('name', f"ISP {selected_isp_id}")
             st.warning(f"You are about to delete '{isp_name}'. This action cannot be undone.")
             st.info("Note: Deleting an ISP will remove all its analysis data.")
@@ -193,9 +238,12 @@ def render_isp_selector(get_current_isp):
             }
             </style>
             """, unsafe_allow_html=True)
+        
+        render_isp_attributes(selected_isp_id)
     
     if selected_isp_id != st.session_state.current_isp_id:
         st.session_state.current_isp_id = selected_isp_id
+        ensure_isp_loaded(selected_isp_id)
         st.session_state.current_keyword = None
         st.session_state.current_sentences = []
         st.session_state.current_index = 0
@@ -203,9 +251,33 @@ def render_isp_selector(get_current_isp):
         st.rerun()
 
 
+def render_isp_attributes(isp_id):
+    """Edit the sector, year and version of an ISP, which results can be grouped by on the export page."""
+    with st.expander("ISP Attributes", expanded=False):
+        isp = st.session_state.isps[isp_id]
+        values = {}
+        for attribute in ISP_ATTRIBUTES:
+            current = isp.get(attribute)
+            values[attribute] = st.text_input(
+                attribute.capitalize(),
+                value="" if current is None else str(current),
+                key=f"isp_attribute_{attribute}_{isp_id}"
+            ).strip() or None
+        
+        if st.button("Save Attributes", key=f"isp_attributes_btn_{isp_id}", use_container_width=True):
+            isp = ensure_isp_loaded(isp_id)
+            changed = {attribute: value for attribute, value in values.items()
+                       if value != (None if isp.get(attribute) is None else str(isp.get(attribute)))}
+            if changed:
+                isp.update(changed)
+                st.session_state.metrics.touch()
+                journal_event(EVENT_SET_ATTRIBUTES, isp_id=isp_id, attributes=changed)
+            st.success("Attributes saved.")
+
+
 def render_keyword_selector(current_isp):
     """Render keyword selection component."""
-    st.sidebar.subheader("Select Keyword")
+    st.subheader("Select Keyword")
     
     if st.session_state.current_isp_id not in st.session_state.analyzed_keywords:
         st.session_state.analyzed_keywords[st.session_state.current_isp_id] = set()
@@ -215,11 +287,11 @@ def render_keyword_selector(current_isp):
     
     analyzed = len(analyzed_for_isp)
     total = len(keywords)
-    st.sidebar.progress(analyzed / total if total > 0 else 0)
-    st.sidebar.write(f"Analyzed: {analyzed}/{total} keywords")
+    st.progress(analyzed / total if total > 0 else 0)
+    st.write(f"Analyzed: {analyzed}/{total} keywords")
     
     if analyzed == total:
-        st.sidebar.success("All keywords analyzed! 🎉")
+        st.success("All keywords analyzed! 🎉")
     
     remaining_keywords = [k for k in keywords.keys() if k not in analyzed_for_isp]
     default_selected = remaining_keywords[0] if remaining_keywords else list(keywords.keys())[0]
@@ -227,7 +299,7 @@ def render_keyword_selector(current_isp):
     if st.session_state.current_keyword is None:
         st.session_state.current_keyword = default_selected
     
-    selected_keyword = st.sidebar.selectbox(
+    selected_keyword = st.selectbox(
         "Select keyword to analyze",
         list(keywords.keys()),
         format_func=lambda x: f"{x} {' ✓' if x in analyzed_for_isp else ''}",
@@ -235,12 +307,10 @@ def render_keyword_selector(current_isp):
     )
     
     if selected_keyword != st.session_state.current_keyword:
-        st.sidebar.info(f"Loading keyword: {selected_keyword}")
         st.session_state.current_keyword = selected_keyword
         st.session_state.current_sentences = SentenceExtractor.find_sentences_with_keyword(
             current_isp.get('text', ''), selected_keyword
         )
-        st.sidebar.write(f"Found {len(st.session_state.current_sentences)} sentences with '{selected_keyword}'")
         st.session_state.current_index = 0
         st.session_state.classifications = []
         
@@ -249,8 +319,7 @@ def render_keyword_selector(current_isp):
         if selected_keyword not in current_isp['analysis_results']:
             current_isp['analysis_results'][selected_keyword] = {'AA': [], 'OI': []}
             
-        if st.sidebar.button("Start analyzing this keyword"):
-            st.rerun()
+        rerun_app(f"Found {len(st.session_state.current_sentences)} sentences with '{selected_keyword}'")
 
 
 def render_ai_analysis_section(current_isp):
@@ -258,22 +327,24 @@ def render_ai_analysis_section(current_isp):
     if not current_isp:
         return
         
-    st.sidebar.subheader("AI-Assisted Analysis")
+    st.subheader("AI-Assisted Analysis")
 
     if not st.session_state.get("ai_available", False):
-        st.sidebar.error("AI functionality is disabled because the llama-cpp-python library is not installed.")
+        st.error("AI functionality is disabled because the llama-cpp-python library is not installed.")
         return
     
     render_model_selector()
     
     if not st.session_state.get("selected_model"):
-        st.sidebar.error("No AI model is available. Please download at least one model file.")
+        st.error("No AI model is available. Please download at least one model file.")
         return
     
+    render_inference_queue_status()
+    
     if st.session_state.show_ai_current_warning:
-        st.sidebar.warning(f"⚠️ WARNING: AI analysis of '{st.session_state.current_keyword}' may produce inaccurate classifications and could introduce bias. Please review all results carefully after processing is complete.")
+        st.warning(f"⚠️ WARNING: AI analysis of '{st.session_state.current_keyword}' may produce inaccurate classifications and could introduce bias. Please review all results carefully after processing is complete.")
         
-        c1, c2 = st.sidebar.columns(2)
+        c1, c2 = st.columns(2)
         with c1:
             if st.button("Cancel", key="cancel_ai_current", use_container_width=True):
                 st.session_state.show_ai_current_warning = False
@@ -294,13 +365,13 @@ def render_ai_analysis_section(current_isp):
                 if len(analyzed_for_isp) == len(all_keywords):
                     show_congratulations()
                 
-                st.sidebar.success(f"AI analysis of '{keyword_to_analyze}' complete! Please review the results.")
+                st.success(f"AI analysis of '{keyword_to_analyze}' complete! Please review the results.")
                 st.rerun()
                 
     elif st.session_state.show_ai_warning:
-        st.sidebar.warning("⚠️ WARNING: Bulk AI analysis may produce inaccurate classifications and could introduce bias. Please review all results carefully after processing is complete.")
+        st.warning("⚠️ WARNING: Bulk AI analysis may produce inaccurate classifications and could introduce bias. Please review all results carefully after processing is complete.")
         
-        c1, c2 = st.sidebar.columns(2)
+        c1, c2 = st.columns(2)
         with c1:
             if st.button("Cancel", key="cancel_ai_all", use_container_width=True):
                 st.session_state.show_ai_warning = False
@@ -327,11 +398,11 @@ def render_ai_analysis_section(current_isp):
                 if len(analyzed_for_isp) == len(all_keywords):
                     show_congratulations()
                     
-                st.sidebar.success("AI analysis complete! Please review the results.")
+                st.success("AI analysis complete! Please review the results.")
                 st.rerun() 
                 
     else:
-        ai_col1, ai_col2 = st.sidebar.columns(2)
+        ai_col1, ai_col2 = st.columns(2)
         with ai_col1:
             if st.button("Analyze Current Keyword with AI", key="ai_current_button",
                          use_container_width=True,
@@ -355,15 +426,15 @@ def handle_ai_analysis_for_keyword(current_isp, keyword):
     sentences = SentenceExtractor.find_sentences_with_keyword(current_isp.get('text', ''), keyword)
     
     if not sentences:
-        st.sidebar.warning(f"No sentences found with keyword '{keyword}'")
+        st.warning(f"No sentences found with keyword '{keyword}'")
         if keyword not in current_isp['analysis_results']:
             current_isp['analysis_results'][keyword] = {'AA': [], 'OI': []}
-        st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(keyword)
+        mark_keyword_analyzed(st.session_state.current_isp_id, keyword)
         return
     
-    st.sidebar.info(f"Found {len(sentences)} sentences containing keyword '{keyword}'")
+    st.info(f"Found {len(sentences)} sentences containing keyword '{keyword}'")
     
-    progress_placeholder = st.sidebar.empty()
+    progress_placeholder = st.empty()
     progress_bar = progress_placeholder.progress(0, text="Initializing...")
     
     def update_progress(progress, text):
@@ -387,34 +458,25 @@ def handle_ai_analysis_for_keyword(current_isp, keyword):
         classification = result['classification']
         rationale = result['rationale']
         
-        metadata_key = f"{st.session_state.current_isp_id}::{keyword}::{occurrence_id}"
-        st.session_state.classification_metadata[metadata_key] = {
-            "method": "AI",
-            "rationale": rationale
-        }
+        apply_classification(
+            st.session_state.current_isp_id, keyword, occurrence_id, classification,
+            metadata={"method": "AI", "rationale": rationale, "model": st.session_state.get("selected_model")}
+        )
         
         if classification == "AA":
             aa_count += 1
-            if occurrence_id not in current_isp['analysis_results'][keyword]['AA']:
-                current_isp['analysis_results'][keyword]['AA'].append(occurrence_id)
-            if occurrence_id in current_isp['analysis_results'][keyword]['OI']:
-                current_isp['analysis_results'][keyword]['OI'].remove(occurrence_id)
         else:
             oi_count += 1
-            if occurrence_id not in current_isp['analysis_results'][keyword]['OI']:
-                current_isp['analysis_results'][keyword]['OI'].append(occurrence_id)
-            if occurrence_id in current_isp['analysis_results'][keyword]['AA']:
-                current_isp['analysis_results'][keyword]['AA'].remove(occurrence_id)
     
     progress_placeholder.empty()
     
-    st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(keyword)
+    mark_keyword_analyzed(st.session_state.current_isp_id, keyword)
     
     st.session_state.current_keyword = keyword
     st.session_state.current_sentences = sentences
     st.session_state.current_index = len(sentences)
     
-    st.sidebar.success(f"Analysis complete for '{keyword}':\n"
+    st.success(f"Analysis complete for '{keyword}':\n"
               f"- Actionable Advice (AA): {aa_count}\n"
               f"- Other Information (OI): {oi_count}")
 
@@ -425,8 +487,8 @@ def handle_ai_analysis_for_all_keywords(current_isp, keywords):
         return
         
     total = len(keywords)
-    progress_placeholder = st.sidebar.empty()
-    progress_text = st.sidebar.empty()
+    progress_placeholder = st.empty()
+    progress_text = st.empty()
     
     for i, keyword in enumerate(keywords):
         progress_text.text(f"Analyzing keyword {i+1}/{total}: '{keyword}'")
@@ -439,7 +501,7 @@ def handle_ai_analysis_for_all_keywords(current_isp, keywords):
             sentences = SentenceExtractor.find_sentences_with_keyword(current_isp.get('text', ''), keyword)
             
             if sentences:
-                inner_progress = st.sidebar.progress(0)
+                inner_progress = st.progress(0)
                 
                 classifications = []
                 for i, item in enumerate(sentences):
@@ -455,27 +517,15 @@ def handle_ai_analysis_for_all_keywords(current_isp, keywords):
                     classification = result['classification']
                     rationale = result['rationale']
                     
-                    metadata_key = f"{st.session_state.current_isp_id}::{keyword}::{occurrence_id}"
-                    st.session_state.classification_metadata[metadata_key] = {
-                        "method": "AI",
-                        "rationale": rationale
-                    }
-                    
-                    if classification == "AA":
-                        if occurrence_id not in current_isp['analysis_results'][keyword]['AA']:
-                            current_isp['analysis_results'][keyword]['AA'].append(occurrence_id)
-                        if occurrence_id in current_isp['analysis_results'][keyword]['OI']:
-                            current_isp['analysis_results'][keyword]['OI'].remove(occurrence_id)
-                    else:
-                        if occurrence_id not in current_isp['analysis_results'][keyword]['OI']:
-                            current_isp['analysis_results'][keyword]['OI'].append(occurrence_id)
-                        if occurrence_id in current_isp['analysis_results'][keyword]['AA']:
-                            current_isp['analysis_results'][keyword]['AA'].remove(occurrence_id)
+                    apply_classification(
+                        st.session_state.current_isp_id, keyword, occurrence_id, classification,
+                        metadata={"method": "AI", "rationale": rationale, "model": st.session_state.get("selected_model")}
+                    )
             else:
                 if keyword not in current_isp['analysis_results']:
                     current_isp['analysis_results'][keyword] = {'AA': [], 'OI': []}
             
-            st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(keyword)
+            mark_keyword_analyzed(st.session_state.current_isp_id, keyword)
         else:
             handle_ai_analysis_for_keyword(current_isp, keyword)
         
@@ -489,11 +539,24 @@ def handle_ai_analysis_for_all_keywords(current_isp, keywords):
         show_congratulations()
 
 
+def format_session_entry(entry: Dict[str, Any]) -> str:
+    """Label for a session in the load list, built from its catalog entry."""
+    parts = [f"ID: {entry['session_id']}"]
+    title = entry.get('name') or entry.get('isp_names')
+    if title:
+        parts.append(title if len(title) <= 40 else title[:37] + "...")
+    parts.append(entry.get('timestamp') or "")
+    if entry.get('isp_count') is not None:
+        parts.append(f"{entry['isp_count']} ISPs")
+    if entry.get('classified_count') is not None:
+        parts.append(f"{entry['classified_count']} classified")
+    return " · ".join(parts)
+
 def render_session_panel(session_manager, get_current_isp):
     """Render session save/load panel."""
-    st.sidebar.subheader("Save/Load Session")
+    st.subheader("Save/Load Session")
 
-    with st.sidebar.container():
+    with st.container():
         st.markdown("""
         <style>
         .session-container {
@@ -509,16 +572,56 @@ def render_session_panel(session_manager, get_current_isp):
         <div class="session-container"></div>
         """, unsafe_allow_html=True)
         
+        render_recovery_section(session_manager)
+        
         st.text("Save Session")
+        # Keyed by the loaded session so the field shows the name of a newly loaded session.
+        st.session_state.session_name = st.text_input(
+            "Session name",
+            value=st.session_state.get('session_name', ""),
+            key=f"session_name_input_{st.session_state.get('loaded_session_id')}",
+            placeholder="Session name (optional)",
+            label_visibility="collapsed"
+        )
         if st.button("Save Analysis", key="save_btn", use_container_width=True):
-            timestamp = session_manager.save_current_session()
-            st.sidebar.success(f"Session saved at {timestamp}")
+            try:
+                timestamp = session_manager.save_current_session()
+                st.session_state.save_conflict = None
+                st.success(f"Session saved at {timestamp}")
+            except SessionConflictError as e:
+                st.session_state.save_conflict = e.head_id
+            except ValueError as e:
+                st.error(f"Could not save session: {e}")
+        render_save_conflict(session_manager)
+        render_merge_conflicts()
         
-        saved_sessions = session_manager.get_available_sessions()
+        query = st.text_input(
+            "Search sessions",
+            key="session_search",
+            placeholder="Search by name, ISP, language or model"
+        )
+        # One page widget per query, so a new search starts on the first page.
+        page_key = f"session_page_{query}"
+        page = st.session_state.get(page_key, 1)
+        saved_sessions, total = session_manager.search_sessions(
+            query, limit=SESSION_PAGE_SIZE, offset=(page - 1) * SESSION_PAGE_SIZE
+        )
+        page_count = (total + SESSION_PAGE_SIZE - 1) // SESSION_PAGE_SIZE
+        if total and page > page_count:
+            page = page_count
+            st.session_state.pop(page_key, None)
+            saved_sessions, total = session_manager.search_sessions(
+                query, limit=SESSION_PAGE_SIZE, offset=(page - 1) * SESSION_PAGE_SIZE
+            )
         if saved_sessions:
             st.markdown("<div style='margin-top: 15px;'></div>", unsafe_allow_html=True)
             st.text("Load Session")
-            session_options = {f"ID: {sid} at {ts}": sid for sid, ts in saved_sessions}
+            if page_count > 1:
+                st.number_input(
+                    f"Page (of {page_count}, {total} sessions)",
+                    min_value=1, max_value=page_count, value=page, step=1, key=page_key
+                )
+            session_options = {format_session_entry(entry): entry['session_id'] for entry in saved_sessions}
             selected_session_display = st.selectbox(
                 "Select saved session", 
                 list(session_options.keys()), 
@@ -529,14 +632,20 @@ def render_session_panel(session_manager, get_current_isp):
             
             if st.button("Continue Analysis", key="load_btn", use_container_width=True):
                 if session_manager.load_session(selected_session_id):
-                    st.sidebar.success("Session loaded successfully!")
                     current_isp = get_current_isp()
-                    if current_isp:
-                        st.sidebar.info(f"Selected ISP: {current_isp.get('name', f'ISP {st.session_state.current_isp_id}')}")
-                    if st.button("Start Analysis", key="continue_btn"):
-                        st.rerun()
+                    selected = (f" Selected ISP: {current_isp.get('name', f'ISP {st.session_state.current_isp_id}')}"
+                                if current_isp else "")
+                    rerun_app(f"Session loaded successfully!{selected}")
+            
+            if st.button("Train Quick Classifier", key="train_classifier_btn", use_container_width=True,
+                         help="Train a lightweight AA/OI classifier from the human-reviewed labels in all saved sessions. It provides instant suggestions when the AI model is busy or unavailable."):
+                handle_train_label_classifier(session_manager)
+        elif query:
+            st.info("No sessions match your search.")
         else:
-            st.sidebar.info("No saved sessions found.")
+            st.info("No saved sessions found.")
+        
+        render_archive_section(session_manager)
         
         st.markdown("<div style='margin-top: 40px;'></div>", unsafe_allow_html=True)
         
@@ -552,6 +661,14 @@ def render_session_panel(session_manager, get_current_isp):
             st.session_state.current_index = 0
             st.session_state.classifications = []
             st.session_state.analyzed_keywords = {}
+            st.session_state.loaded_session_id = None
+            st.session_state.loaded_head_id = None
+            st.session_state.save_conflict = None
+            st.session_state.merge_conflicts = []
+            st.session_state.isp_loader = None
+            st.session_state.session_name = ""
+            st.session_state.metrics = MetricsAggregate()
+            session_manager.reset_journal(None)
             st.rerun()
         
         st.markdown("""
@@ -567,10 +684,188 @@ def render_session_panel(session_manager, get_current_isp):
         </style>
         """, unsafe_allow_html=True)
 
+def render_save_conflict(session_manager):
+    """Offer to merge with a session someone else saved after the current one was loaded."""
+    head_id = st.session_state.get('save_conflict')
+    if head_id is None:
+        return
+    st.warning(f"Session {head_id} was saved by someone else after you loaded this session. "
+               "Merge their changes with yours before saving.")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Merge and Save", key="merge_save_btn", use_container_width=True):
+            try:
+                timestamp = session_manager.merge_with_head()
+                st.session_state.save_conflict = None
+                rerun_app(f"Merged and saved at {timestamp}")
+            except SessionConflictError as e:
+                st.session_state.save_conflict = e.head_id
+                st.warning("Another save happened during the merge. Please merge again.")
+            except ValueError as e:
+                st.session_state.save_conflict = None
+                st.error(f"Could not merge: {e}")
+    with col2:
+        if st.button("Cancel", key="merge_cancel_btn", use_container_width=True):
+            st.session_state.save_conflict = None
+            st.rerun()
+
+
+def render_merge_conflicts():
+    """List occurrences both analysts labeled differently and let the user pick a label for each."""
+    conflicts = st.session_state.get('merge_conflicts')
+    if not conflicts:
+        return
+    with st.expander(f"Merge conflicts ({len(conflicts)})", expanded=True):
+        st.caption("Both you and another analyst changed these. Your label was kept; "
+                   "choose theirs where it is the right one and save again.")
+        for index, conflict in enumerate(conflicts[:MERGE_CONFLICTS_SHOWN]):
+            isp = st.session_state.isps.get(conflict['isp_id'], {})
+            isp_name = isp.get('name', f"ISP {conflict['isp_id']}")
+            if conflict['keyword'] is None:
+                st.markdown(f"**{isp_name}** was deleted by one analyst and changed by the other; it was kept.")
+            else:
+                sentence = conflict['occurrence'].split("::")[0]
+                version = f" (session {conflict['theirs_version']})" if conflict.get('theirs_version') else ""
+                st.markdown(f"**{isp_name}** · {conflict['keyword']}: {sentence[:200]}")
+                st.caption(f"Yours: {conflict['ours'] or 'unclassified'} · "
+                           f"Theirs{version}: {conflict['theirs'] or 'unclassified'}")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Keep Mine", key=f"conflict_mine_{index}", use_container_width=True):
+                    conflicts.pop(index)
+                    st.rerun()
+            with col2:
+                if conflict['keyword'] is not None and st.button(
+                        "Use Theirs", key=f"conflict_theirs_{index}", use_container_width=True):
+                    resolve_conflict_with_theirs(conflict)
+                    conflicts.pop(index)
+                    st.rerun()
+        if len(conflicts) > MERGE_CONFLICTS_SHOWN:
+            st.caption(f"{len(conflicts) - MERGE_CONFLICTS_SHOWN} more conflicts are not shown.")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Use Theirs for All", key="conflict_theirs_all", use_container_width=True):
+                for conflict in conflicts:
+                    if conflict['keyword'] is not None:
+                        resolve_conflict_with_theirs(conflict)
+                st.session_state.merge_conflicts = []
+                st.rerun()
+        with col2:
+            if st.button("Done Reviewing", key="conflict_done", use_container_width=True):
+                st.session_state.merge_conflicts = []
+                st.rerun()
+
+
+def resolve_conflict_with_theirs(conflict):
+    """Replace the kept label of a conflicting occurrence with the other analyst's label and metadata."""
+    isp_id, keyword, occurrence = conflict['isp_id'], conflict['keyword'], conflict['occurrence']
+    if isp_id not in st.session_state.isps:
+        return
+    if conflict['theirs'] is None:
+        remove_classification(isp_id, keyword, occurrence)
+        return
+    apply_classification(isp_id, keyword, occurrence, conflict['theirs'], conflict.get('theirs_metadata'))
+    if conflict.get('theirs_metadata') is None:
+        st.session_state.classification_metadata.pop(f"{isp_id}::{keyword}::{occurrence}", None)
+
+
+def render_recovery_section(session_manager):
+    """Offer to restore unsaved work from sessions that ended without saving."""
+    recoverable = session_manager.get_recoverable_work()
+    if not recoverable:
+        return
+    
+    st.warning("Unsaved work from an interrupted session was found.")
+    options = {}
+    for journal in recoverable:
+        base = f"session {journal['base_session_id']}" if journal['base_session_id'] is not None else "a new analysis"
+        options[f"{len(journal['events'])} changes on {base} (last change {journal['modified']})"] = journal
+    selected_display = st.selectbox(
+        "Select unsaved work",
+        list(options.keys()),
+        key="recovery_select",
+        label_visibility="collapsed"
+    )
+    selected = options[selected_display]
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Recover", key="recover_btn", use_container_width=True):
+            session_manager.recover_work(selected)
+            st.rerun()
+    with col2:
+        if st.button("Discard", key="discard_recovery_btn", use_container_width=True):
+            SessionJournal.discard(selected['journal_id'])
+            st.rerun()
+    
+    st.markdown("<div style='margin-top: 15px;'></div>", unsafe_allow_html=True)
+
+
+def render_archive_section(session_manager):
+    """Render export and import of portable project archives."""
+    with st.expander("Project Archive"):
+        message = st.session_state.pop('archive_import_message', None)
+        if message:
+            st.success(message)
+        if st.session_state.isps:
+            def write(path):
+                with open(path, "wb") as archive_file:
+                    session_manager.export_archive(archive_file)
+            
+            name = st.session_state.get('session_name') or "project"
+            # The archive also holds the session settings, so it is rewritten when they change.
+            version = (st.session_state.metrics.version, st.session_state.language,
+                       st.session_state.context_mode, st.session_state.selected_model, name)
+            render_prepared_download(
+                "archive_export", version, "Prepare Project Archive", "Download Project Archive", ".zip",
+                "application/zip", write, file_name=f"{name}.zip", use_container_width=True
+            )
+        
+        uploaded_archive = st.file_uploader("Import ISPs from a project archive", type=["zip"], key="archive_upload")
+        st.caption("Downloads and uploads in the browser pass through the server's memory and are limited by "
+                   "Streamlit's upload size limit. For very large projects, use `python -m src.data.archive "
+                   "export` and `import` on the server, which stream archives from and to disk.")
+        if uploaded_archive is None:
+            return
+        try:
+            reader = ProjectArchiveReader(uploaded_archive)
+        except ArchiveError as e:
+            st.error(str(e))
+            return
+        
+        verified = st.session_state.get('archive_verified')
+        if verified is None or verified[0] != uploaded_archive.file_id:
+            with st.spinner("Checking archive..."):
+                verified = (uploaded_archive.file_id, reader.verify())
+            st.session_state.archive_verified = verified
+        if verified[1]:
+            st.error("The archive is damaged: " + "; ".join(verified[1][:5]))
+            return
+        
+        archive_language = reader.state.get('language')
+        if archive_language and st.session_state.isps and archive_language != st.session_state.language:
+            st.warning(f"The archive was analyzed in {archive_language}, but this session uses {st.session_state.language}.")
+        
+        options = {
+            f"{entry['name']} ({entry['counts']['AA']} AA, {entry['counts']['OI']} OI)": entry['id']
+            for entry in reader.isps
+        }
+        selected = st.multiselect("ISPs to import", list(options.keys()), default=list(options.keys()),
+                                  key="archive_isp_select")
+        if st.button("Import Selected ISPs", key="archive_import_btn", use_container_width=True, disabled=not selected):
+            if not st.session_state.isps and archive_language:
+                st.session_state.language = archive_language
+            imported = session_manager.import_archive_isps(reader, [options[label] for label in selected])
+            if st.session_state.current_isp_id is None and st.session_state.isps:
+                st.session_state.current_isp_id = next(iter(st.session_state.isps))
+            st.session_state.archive_import_message = f"Imported {len(imported)} ISP(s): {', '.join(imported)}"
+            st.rerun()
+
+
 def handle_delete_isp(isp_id):
     """Handle deleting an ISP from the analysis."""
     if isp_id not in st.session_state.isps:
-        st.sidebar.error(f"ISP with ID {isp_id} not found.")
+        st.error(f"ISP with ID {isp_id} not found.")
         return False
 
     isp_name = st.session_state.isps[isp_id].get('name', f"ISP {isp_id}")
@@ -599,5 +894,30 @@ def handle_delete_isp(isp_id):
     for key in keys_to_remove:
         del st.session_state.classification_metadata[key]
     
-    st.sidebar.success(f"'{isp_name}' has been removed from the analysis.")
-    return True
\ No newline at end of file
+    st.session_state.metrics.remove_isp(isp_id)
+    journal_event(EVENT_DELETE_ISP, isp_id=isp_id)
+    
+    st.success(f"'{isp_name}' has been removed from the analysis.")
+    return True
+
+
+def handle_train_label_classifier(session_manager):
+    """Train the lightweight label classifier from the newest session of every lineage."""
+    progress_bar = st.progress(0.0, text="Reading saved sessions...")
+    
+    def progress(done: int, total: int) -> None:
+        progress_bar.progress(done / total, text=f"Read {done} of {total} sessions")
+    
+    try:
+        with st.spinner("Training classifier from saved sessions..."):
+            model = train_from_sessions(session_manager.repository, progress=progress)
+    except ValueError as e:
+        st.error(f"Could not train classifier: {e}")
+        return
+    finally:
+        progress_bar.empty()
+    
+    info = model.info
+    # The Suggestion button in the classification panel is enabled once a model exists.
+    rerun_app(f"Classifier trained on {info['n_examples']} labels "
+              f"(AA: {info['n_aa']}, OI: {info['n_oi']}) and saved to {HashedNgramClassifier.DEFAULT_PATH}.")
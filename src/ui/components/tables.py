@@ -1,7 +1,12 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Callable
 from src.config.settings import KeywordSets
+from src.domain.intervals import LossIntervals
+from src.domain.agreement import AgreementAnalyzer
+from src.domain.corpus import REVIEWED_FLAG
+from src.ui.utils import apply_classification, get_occurrence_table, get_raw_data_frame, rerun_fragment
 
 def render_total_loss_table(all_metrics, create_safe_dataframe):
     """Render Table 1: Total Keyword Loss of Specificity."""
@@ -108,6 +113,25 @@ def render_keyword_loss_table(all_metrics, create_safe_dataframe):
     """Render Table 4: Keyword Loss of Specificity."""
     st.subheader("Table 4: Keyword Loss of Specificity (%)")
     keywords = KeywordSets.get_keywords(st.session_state.language)
+    # Kept outside the widget state, which is dropped when a classification reruns the script early.
+    st.session_state.show_loss_intervals = st.checkbox(
+        "Show confidence intervals", value=st.session_state.get("show_loss_intervals", False)
+    )
+    bounds = {}
+    if st.session_state.show_loss_intervals and st.session_state.get("metrics") is not None:
+        intervals = LossIntervals()
+        frame = intervals.for_metrics(st.session_state.metrics, keywords)
+        bounds = dict(zip(zip(frame['ISP'], frame['Keyword']),
+                          zip(frame['Wilson low (%)'], frame['Wilson high (%)'])))
+        st.caption(f"Wilson score intervals at {intervals.label} confidence. Bootstrap intervals "
+                   f"are shown in the breakdown and in Table 5 of the Excel export.")
+
+    def format_loss(isp, kw, loss):
+        if (isp, kw) in bounds:
+            low, high = bounds[(isp, kw)]
+            return f"{loss:.1f}% ({low:.1f}–{high:.1f})"
+        return f"{loss:.1f}%"
+
     table4_data = []
     
     for isp_id in sorted(st.session_state.isps.keys()):
@@ -117,7 +141,7 @@ def render_keyword_loss_table(all_metrics, create_safe_dataframe):
             for kw in keywords.keys():
                 loss = metrics['keyword_loss_specificity'].get(kw)
                 if loss is not None:
-                    row_data[kw] = f"{loss:.1f}%"
+                    row_data[kw] = format_loss(isp_id, kw, loss)
                 else:
                     row_data[kw] = '-'
             table4_data.append(row_data)
@@ -138,7 +162,7 @@ def render_keyword_loss_table(all_metrics, create_safe_dataframe):
             total = aa_sums[kw] + oi_sums[kw]
             if total > 0:
                 loss_specificity = (oi_sums[kw] / total) * 100
-                sum_row[kw] = f"{loss_specificity:.1f}%"
+                sum_row[kw] = format_loss('Sum', kw, loss_specificity)
             else:
                 sum_row[kw] = '-'
         table4_data.append(sum_row)
@@ -151,6 +175,76 @@ def render_keyword_loss_table(all_metrics, create_safe_dataframe):
         df4 = create_safe_dataframe(table4_data)
         st.dataframe(df4, hide_index=True)
 
+def render_corpus_breakdown():
+    """Render loss of specificity grouped by any combination of keyword, ISP, method, model and ISP attributes."""
+    st.subheader("Breakdown")
+    # Kept outside the widget state, which is dropped when a classification reruns the script early.
+    st.session_state.show_breakdown = st.toggle(
+        "Group results across the corpus", value=st.session_state.get("show_breakdown", False)
+    )
+    if not st.session_state.show_breakdown:
+        return
+    table = get_occurrence_table()
+    dimensions = st.multiselect(
+        "Group by",
+        table.dimensions,
+        default=[dimension for dimension in st.session_state.get("breakdown_dimensions", ["keyword"])
+                 if dimension in table.dimensions],
+        key="breakdown_dimensions_select"
+    )
+    st.session_state.breakdown_dimensions = dimensions
+    intervals = LossIntervals() if st.session_state.get("show_loss_intervals") else None
+    breakdown = table.breakdown(dimensions, intervals)
+    column_config = {"Loss of specificity (%)": st.column_config.NumberColumn(format="%.1f%%")}
+    if intervals is not None:
+        column_config.update({column: st.column_config.NumberColumn(format="%.1f%%")
+                              for column in LossIntervals.COLUMNS})
+    st.dataframe(breakdown, hide_index=True, column_config=column_config)
+    if (table.frame['method'] == "(unknown)").any():
+        st.caption("Method and model are unknown for classifications without metadata "
+                   "and for ISPs of a large session that have not been opened yet.")
+
+
+def render_agreement_analysis():
+    """Render agreement between AI labels and the reviewed labels, per keyword and as a confusion matrix."""
+    st.subheader("Human-vs-AI Agreement")
+    # Kept outside the widget state, which is dropped when a classification reruns the script early.
+    st.session_state.show_agreement = st.toggle(
+        "Compare AI labels with the reviewed labels", value=st.session_state.get("show_agreement", False)
+    )
+    if not st.session_state.show_agreement:
+        return
+    table = get_occurrence_table()
+    analyzer = AgreementAnalyzer()
+    agreement = analyzer.by_keyword(table)
+    unreviewed = int(agreement['Unreviewed AI labels'].iloc[-1])
+    if not agreement['Pairs'].iloc[-1]:
+        if unreviewed:
+            st.info(f"No AI labels have been reviewed yet ({unreviewed} unreviewed). Confirm or switch them in "
+                    "the raw data table, or classify with suggestions, to compare them with human judgement.")
+        else:
+            st.info("No occurrences have an AI label yet.")
+        return
+    percent = st.column_config.NumberColumn(format="%.1f%%")
+    st.dataframe(
+        agreement,
+        hide_index=True,
+        column_config={
+            'Disagreement (%)': percent,
+            'Disagreement low (%)': percent,
+            'Disagreement high (%)': percent,
+            "Cohen's kappa": st.column_config.NumberColumn(format="%.3f")
+        }
+    )
+    keyword = st.selectbox("Confusion matrix for", list(agreement['Keyword']),
+                           index=len(agreement) - 1, key="agreement_keyword_select")
+    st.dataframe(analyzer.confusion_matrix(table, None if keyword == AgreementAnalyzer.ALL_KEYWORDS else keyword))
+    st.caption("Only AI labels a human has reviewed are compared: accepted suggestions, suggestions shown but "
+               "not accepted, AI labels that were switched and AI labels confirmed in the raw data table. "
+               "AI labels nobody has looked at are counted as unreviewed and left out of the agreement. "
+               f"Disagreement bounds are Wilson score intervals at {analyzer.intervals.label} confidence.")
+
+
 def switch_classification(isp_id, keyword, occurrence, current_classification):
     """Switch a classification between AA and OI and update all related data."""
     if isp_id not in st.session_state.isps:
@@ -165,23 +259,20 @@ def switch_classification(isp_id, keyword, occurrence, current_classification):
     target_classification = "OI" if current_classification == "AA" else "AA"
     
     current_list = current_isp['analysis_results'][keyword][current_classification]
-    target_list = current_isp['analysis_results'][keyword][target_classification]
     
     if occurrence not in current_list:
         st.error(f"Occurrence not found in {current_classification} list.")
         return False
         
-    current_list.remove(occurrence)
-    if occurrence not in target_list:
-        target_list.append(occurrence)
-        
     metadata_key = f"{isp_id}::{keyword}::{occurrence}"
-    if metadata_key in st.session_state.classification_metadata:
-        metadata = st.session_state.classification_metadata[metadata_key]
-        metadata["method"] = "Manual (Switched)"
+    metadata = st.session_state.classification_metadata.get(metadata_key)
+    if metadata is not None:
         if "original_classification" not in metadata:
             metadata["original_classification"] = current_classification
-        st.session_state.classification_metadata[metadata_key] = metadata
+            metadata["original_method"] = metadata.get("method")
+        metadata["method"] = "Manual (Switched)"
+    
+    apply_classification(isp_id, keyword, occurrence, target_classification, metadata=metadata)
     
     # Move?
     st.session_state.skip_congratulations = True
@@ -189,6 +280,16 @@ def switch_classification(isp_id, keyword, occurrence, current_classification):
     st.success(f"Classification switched from {current_classification} to {target_classification}")
     return True
 
+def confirm_ai_classification(isp_id, keyword, occurrence, classification):
+    """Mark an AI label as reviewed by a human without changing it."""
+    metadata = st.session_state.classification_metadata.get(f"{isp_id}::{keyword}::{occurrence}")
+    if metadata is None or metadata.get("method") != "AI":
+        st.error("Only AI classifications can be confirmed.")
+        return False
+    apply_classification(isp_id, keyword, occurrence, classification, metadata={**metadata, REVIEWED_FLAG: True})
+    st.session_state.skip_congratulations = True
+    return True
+
 def synchronize_classifications(current_isp_id: int, target_classification: str, duplicate_group: List[Dict[str, Any]]) -> None:
     """Synchronize the classification of all duplicated sentences to the same classification.
     
@@ -218,263 +319,191 @@ def synchronize_classifications(current_isp_id: int, target_classification: str,
         st.session_state.skip_congratulations = True
         st.success(f"Classification synchronized for {sync_count} duplicates.")
 
-def render_raw_data_table(current_isp_id, isps, create_safe_dataframe):
-    """Render a table showing raw data for the current ISP with functionality to switch classification."""
+def render_raw_data_table(current_isp_id, isps):
+    """Render a table showing raw data for the current ISP with functionality to switch classification.
+    
+    The raw data comes from the cached DataFrame of the ISP; filters are applied
+    as boolean masks and only the rows of the visible page are rendered.
+    """
     st.subheader("Raw Data for Current ISP")
     
     if current_isp_id not in isps:
         st.info("No data available for this ISP.")
         return
         
-    current_isp = isps[current_isp_id]
-    analysis_results = current_isp.get('analysis_results', {})
-    isp_name = current_isp.get('name', f"ISP {current_isp_id}")
-    
-    if not analysis_results:
+    if not isps[current_isp_id].get('analysis_results', {}):
         st.info("No analysis data available for this ISP.")
         return
     
-    if "raw_data_order" not in st.session_state:
-        st.session_state.raw_data_order = {}
+    raw_data = get_raw_data_frame(current_isp_id)
+    if raw_data.empty:
+        st.info("No raw data available for this ISP.")
+        return
+    
+    keyword_filter = st.selectbox(
+        "Filter by Keyword:", 
+        ["All Keywords"] + sorted(raw_data['Keyword'].unique()),
+        key="raw_data_keyword_filter"
+    )
+    
+    classification_filter = st.radio(
+        "Filter by Classification:",
+        ["All", "AA", "OI"],
+        horizontal=True,
+        key="raw_data_classification_filter"
+    )
     
-    isp_key = f"isp_{current_isp_id}_order"
+    consistency_filter = st.radio(
+        "Filter by Classification Consistency:",
+        ["All", "Show only inconsistent", "Show only consistent"],
+        horizontal=True,
+        key="raw_data_consistency_filter"
+    )
     
-    if isp_key not in st.session_state.raw_data_order:
-        st.session_state.raw_data_order[isp_key] = {}
+    search_term = st.text_input("Search in sentences:", key="raw_data_search")
     
-    raw_data = []
-    row_counter = 0
+    mask = np.ones(len(raw_data), dtype=bool)
+    if keyword_filter != "All Keywords":
+        mask &= (raw_data['Keyword'] == keyword_filter).to_numpy()
+    if classification_filter != "All":
+        mask &= (raw_data['Classification'] == classification_filter).to_numpy()
+    if consistency_filter == "Show only inconsistent":
+        mask &= (raw_data['DuplicateCount'] > 1).to_numpy() & raw_data['Inconsistent'].to_numpy()
+    elif consistency_filter == "Show only consistent":
+        mask &= (raw_data['DuplicateCount'] > 1).to_numpy() & ~raw_data['Inconsistent'].to_numpy()
+    if search_term:
+        mask &= raw_data['Sentence'].str.contains(search_term, case=False, regex=False).to_numpy()
+    filtered_data = raw_data[mask]
     
-    for keyword in sorted(analysis_results.keys()):
-        aa_occurrences = analysis_results[keyword].get('AA', [])
-        oi_occurrences = analysis_results[keyword].get('OI', [])
+    # Go back to the first page whenever the filters change.
+    filters = (current_isp_id, keyword_filter, classification_filter, consistency_filter, search_term)
+    if st.session_state.get("raw_data_filters") != filters:
+        st.session_state.raw_data_filters = filters
+        st.session_state.raw_data_page = 0
+    
+    if search_term:
+        if filtered_data.empty:
+            st.warning(f"No results found for '{search_term}'")
+        else:
+            st.success(f"Found {len(filtered_data)} matches")
+    
+    if filtered_data.empty:
+        st.info("No data matches the current filters.")
+        return
+    
+    if "view_all_raw_data" not in st.session_state:
+        st.session_state.view_all_raw_data = False
         
-        all_occurrences = []
+    view_all = st.checkbox("Show all data on single page", 
+                          value=st.session_state.view_all_raw_data,
+                          key="view_all_checkbox")
+    
+    if view_all != st.session_state.view_all_raw_data:
+        st.session_state.view_all_raw_data = view_all
+        rerun_fragment()
+    
+    chunk_size = 20
+    total_chunks = (len(filtered_data) + chunk_size - 1) // chunk_size
+    
+    if "raw_data_page" not in st.session_state:
+        st.session_state.raw_data_page = 0
+    st.session_state.raw_data_page = min(st.session_state.raw_data_page, total_chunks - 1)
+    
+    if total_chunks > 1 and not st.session_state.view_all_raw_data:
+        st.write(f"Showing page {st.session_state.raw_data_page + 1} of {total_chunks}")
         
-        for occurrence in aa_occurrences:
-            all_occurrences.append((keyword, occurrence, "AA"))
-            
-        for occurrence in oi_occurrences:
-            all_occurrences.append((keyword, occurrence, "OI"))
-            
-        for keyword, occurrence, classification in all_occurrences:
-            occ_key = f"{keyword}::{occurrence}"
-            
-            if occ_key not in st.session_state.raw_data_order[isp_key]:
-                st.session_state.raw_data_order[isp_key][occ_key] = row_counter
-                row_counter += 1
-                
-            order_index = st.session_state.raw_data_order[isp_key][occ_key]
-            
-            parts = occurrence.split("::")
-            if len(parts) >= 3:
-                sentence = parts[0]
-                start_pos = int(parts[1])
-                end_pos = int(parts[2])
-                keyword_instance = sentence[start_pos:end_pos]
-                
-                highlighted_sentence = (
-                    sentence[:start_pos] +
-                    '[' + keyword_instance + ']' +
-                    sentence[end_pos:]
-                )
-                
-                metadata_key = f"{current_isp_id}::{keyword}::{occurrence}"
-                metadata = st.session_state.classification_metadata.get(metadata_key, {})
-                method = metadata.get("method", "Manual") 
-                rationale = metadata.get("rationale", "") 
+        col1, col2, col3 = st.columns([1, 3, 1])
+        with col1:
+            if st.button("Previous Page", key="prev_page", disabled=st.session_state.raw_data_page <= 0):
+                st.session_state.raw_data_page -= 1
+                rerun_fragment()
                 
-                raw_data.append({
-                    'Order': order_index, 
-                    'Keyword': keyword,
-                    'Classification': classification,
-                    'Sentence': highlighted_sentence,
-                    'BaseSentence': sentence,
-                    'Keyword Instance': keyword_instance,
-                    'Position': f"{start_pos}-{end_pos}",
-                    'Method': method,
-                    'Rationale': rationale,
-                    'Occurrence': occurrence, 
-                    'Switch': f"Switch to {'OI' if classification == 'AA' else 'AA'}"
-                })
-    
-    if raw_data:
-        raw_data.sort(key=lambda x: x['Order'])
-        
-        sentence_map = {}
-        for i, row in enumerate(raw_data):
-            base_sentence = row['BaseSentence']
-            if base_sentence not in sentence_map:
-                sentence_map[base_sentence] = []
-            sentence_map[base_sentence].append(i)
-        
-        for base_sentence, indices in sentence_map.items():
-            if len(indices) > 1:
-                classifications = set(raw_data[idx]['Classification'] for idx in indices)
+        with col3:
+            if st.button("Next Page", key="next_page", disabled=st.session_state.raw_data_page >= total_chunks - 1):
+                st.session_state.raw_data_page += 1
+                rerun_fragment()
                 
-                for idx in indices:
-                    raw_data[idx]['IsDuplicate'] = True
-                    raw_data[idx]['DuplicateCount'] = len(indices)
-                    raw_data[idx]['DuplicateIndices'] = indices
-                    
-                    if len(classifications) > 1:
-                        raw_data[idx]['InconsistentClassification'] = True
-                    else:
-                        raw_data[idx]['InconsistentClassification'] = False
-        
-        keywords_in_data = sorted(set(item['Keyword'] for item in raw_data))
-        
-        keyword_filter = st.selectbox(
-            "Filter by Keyword:", 
-            ["All Keywords"] + keywords_in_data,
-            key="raw_data_keyword_filter"
-        )
-        
-        classification_filter = st.radio(
-            "Filter by Classification:",
-            ["All", "AA", "OI"],
-            horizontal=True,
-            key="raw_data_classification_filter"
-        )
-        
-        consistency_filter = st.radio(
-            "Filter by Classification Consistency:",
-            ["All", "Show only inconsistent", "Show only consistent"],
-            horizontal=True,
-            key="raw_data_consistency_filter"
-        )
-        
-        filtered_data = raw_data
-        if keyword_filter != "All Keywords":
-            filtered_data = [item for item in filtered_data if item['Keyword'] == keyword_filter]
-            
-        if classification_filter != "All":
-            filtered_data = [item for item in filtered_data if item['Classification'] == classification_filter]
-            
-        if consistency_filter == "Show only inconsistent":
-            filtered_data = [item for item in filtered_data if 
-                           item.get('IsDuplicate', False) and 
-                           item.get('InconsistentClassification', False)]
-        elif consistency_filter == "Show only consistent":
-            filtered_data = [item for item in filtered_data if 
-                           item.get('IsDuplicate', False) and 
-                           not item.get('InconsistentClassification', False)]
-        
-        if filtered_data:
-            if "view_all_raw_data" not in st.session_state:
-                st.session_state.view_all_raw_data = False
+        with col2:
+            page_options = list(range(1, total_chunks + 1))
+            selected_page = st.selectbox(
+                "Go to page:",
+                page_options,
+                index=st.session_state.raw_data_page,
+                key="page_selector"
+            )
+            if selected_page - 1 != st.session_state.raw_data_page:
+                st.session_state.raw_data_page = selected_page - 1
+                rerun_fragment()
                 
-            view_all = st.checkbox("Show all data on single page", 
-                                  value=st.session_state.view_all_raw_data,
-                                  key="view_all_checkbox")
-            
-            if view_all != st.session_state.view_all_raw_data:
-                st.session_state.view_all_raw_data = view_all
-                st.rerun()
-            
-            chunk_size = 20
-            total_chunks = (len(filtered_data) + chunk_size - 1) // chunk_size
-            
-            if "raw_data_page" not in st.session_state:
-                st.session_state.raw_data_page = 0
+    if st.session_state.view_all_raw_data:
+        current_chunk = filtered_data
+        if len(filtered_data) > 50:
+            st.warning(f"Showing all {len(filtered_data)} items. This may cause slower performance.")
+    else:
+        start_idx = st.session_state.raw_data_page * chunk_size
+        current_chunk = filtered_data.iloc[start_idx:start_idx + chunk_size]
+    
+    for i, row in enumerate(current_chunk.to_dict('records')):
+        with st.container():
+            if row['DuplicateCount'] > 1:
+                if row['Inconsistent']:
+                    st.markdown(f"⚠️ **This sentence appears {row['DuplicateCount']} times with DIFFERENT classifications!**")
+                else:
+                    st.markdown(f"✅ **This sentence appears {row['DuplicateCount']} times with the same classification**")
             
-            if total_chunks > 1 and not st.session_state.view_all_raw_data:
-                st.write(f"Showing page {st.session_state.raw_data_page + 1} of {total_chunks}")
+            cols = st.columns([3, 1, 8, 1])
+            with cols[0]:
+                st.write(f"**Keyword:** {row['Keyword']}")
+                st.write(f"**Classification:** {row['Classification']}")
                 
-                col1, col2, col3 = st.columns([1, 3, 1])
-                with col1:
-                    if st.button("Previous Page", key="prev_page", disabled=st.session_state.raw_data_page <= 0):
-                        st.session_state.raw_data_page -= 1
+            with cols[1]:
+                if st.button(f"Switch to {'OI' if row['Classification'] == 'AA' else 'AA'}", 
+                           key=f"switch_{row['Order']}_{i}", 
+                           use_container_width=True):
+                    if switch_classification(
+                        current_isp_id, 
+                        row['Keyword'], 
+                        row['Occurrence'], 
+                        row['Classification']
+                    ):
                         st.rerun()
                         
-                with col3:
-                    if st.button("Next Page", key="next_page", disabled=st.session_state.raw_data_page >= total_chunks - 1):
-                        st.session_state.raw_data_page += 1
-                        st.rerun()
+                metadata = st.session_state.classification_metadata.get(
+                    f"{current_isp_id}::{row['Keyword']}::{row['Occurrence']}") or {}
+                if metadata.get("method") == "AI" and not metadata.get(REVIEWED_FLAG):
+                    if st.button("Confirm AI label",
+                               key=f"confirm_{row['Order']}_{i}",
+                               help="Mark this AI classification as reviewed, so it counts in the agreement analysis",
+                               use_container_width=True):
+                        if confirm_ai_classification(
+                            current_isp_id,
+                            row['Keyword'],
+                            row['Occurrence'],
+                            row['Classification']
+                        ):
+                            st.rerun()
                         
-                with col2:
-                    page_options = list(range(1, total_chunks + 1))
-                    selected_page = st.selectbox(
-                        "Go to page:",
-                        page_options,
-                        index=st.session_state.raw_data_page,
-                        key="page_selector"
-                    )
-                    if selected_page - 1 != st.session_state.raw_data_page:
-                        st.session_state.raw_data_page = selected_page - 1
+                if row['DuplicateCount'] > 1 and row['Inconsistent']:
+                    if st.button("Sync all duplicates", 
+                               key=f"sync_{row['Order']}_{i}", 
+                               help=f"Apply {row['Classification']} classification to all duplicates of this sentence",
+                               use_container_width=True):
+                        duplicate_rows = raw_data[raw_data['BaseSentence'] == row['BaseSentence']].to_dict('records')
+                        synchronize_classifications(
+                            current_isp_id, 
+                            row['Classification'], 
+                            duplicate_rows
+                        )
                         st.rerun()
                         
-            if st.session_state.view_all_raw_data:
-                current_chunk = filtered_data
-                if len(filtered_data) > 50:
-                    st.warning(f"Showing all {len(filtered_data)} items. This may cause slower performance.")
-            else:
-                start_idx = st.session_state.raw_data_page * chunk_size
-                end_idx = min(start_idx + chunk_size, len(filtered_data))
-                current_chunk = filtered_data[start_idx:end_idx]
-            
-            if st.session_state.view_all_raw_data:
-                search_term = st.text_input("Search in sentences:", key="raw_data_search")
-                if search_term:
-                    st.info(f"Searching for '{search_term}' in {len(current_chunk)} items")
-                    current_chunk = [item for item in current_chunk if search_term.lower() in item['Sentence'].lower()]
-                    if not current_chunk:
-                        st.warning(f"No results found for '{search_term}'")
-                    else:
-                        st.success(f"Found {len(current_chunk)} matches")
+            with cols[2]:
+                st.write("**Sentence:**")
+                st.markdown(f"{row['Sentence']}")
+                if row['Rationale']:
+                    with st.expander("Show rationale"):
+                        st.write(f"{row['Rationale']}")
+                
+            with cols[3]:
+                st.write(f"**Method:** {row['Method']}")
             
-            for i, row in enumerate(current_chunk):
-                with st.container():
-                    if row.get('IsDuplicate', False):
-                        if row.get('InconsistentClassification', False):
-                            duplicate_notification = f"⚠️ **This sentence appears {row.get('DuplicateCount', 0)} times with DIFFERENT classifications!**"
-                            st.markdown(duplicate_notification)
-                        else:
-                            duplicate_notification = f"✅ **This sentence appears {row.get('DuplicateCount', 0)} times with the same classification**"
-                            st.markdown(duplicate_notification)
-                    
-                    cols = st.columns([3, 1, 8, 1])
-                    with cols[0]:
-                        st.write(f"**Keyword:** {row['Keyword']}")
-                        st.write(f"**Classification:** {row['Classification']}")
-                        
-                    with cols[1]:
-                        if st.button(f"Switch to {'OI' if row['Classification'] == 'AA' else 'AA'}", 
-                                   key=f"switch_{row['Order']}_{i}", 
-                                   use_container_width=True):
-                            if switch_classification(
-                                current_isp_id, 
-                                row['Keyword'], 
-                                row['Occurrence'], 
-                                row['Classification']
-                            ):
-                                st.rerun()
-                                
-                        if row.get('IsDuplicate', False) and row.get('InconsistentClassification', False):
-                            if st.button("Sync all duplicates", 
-                                       key=f"sync_{row['Order']}_{i}", 
-                                       help=f"Apply {row['Classification']} classification to all duplicates of this sentence",
-                                       use_container_width=True):
-                                duplicate_rows = [raw_data[idx] for idx in row.get('DuplicateIndices', [])]
-                                synchronize_classifications(
-                                    current_isp_id, 
-                                    row['Classification'], 
-                                    duplicate_rows
-                                )
-                                st.rerun()
-                                
-                    with cols[2]:
-                        st.write("**Sentence:**")
-                        st.markdown(f"{row['Sentence']}")
-                        if row['Rationale']:
-                            with st.expander("Show rationale"):
-                                st.write(f"{row['Rationale']}")
-                        
-                    with cols[3]:
-                        st.write(f"**Method:** {row['Method']}")
-                    
-                    st.markdown("---")
-        else:
-            st.info("No data matches the current filters.")
-    else:
-        st.info("No raw data available for this ISP.")
\ No newline at end of file
+            st.markdown("---")
@@ -1,15 +1,19 @@
 """
 Page components for the ISP Keyword Analyzer.
 """
-from src.ui.pages.analysis import (
-    render_sentence_analysis_ui,
-    render_analysis_complete_ui,
-    render_context_ui,
-    render_suggestion_ui,
-    render_next_keyword_button
-)
-from src.ui.pages.export import render_export_ui
-from src.ui.pages.upload import render_upload_ui, handle_file_upload
+from typing import TYPE_CHECKING
+from src.startup.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from src.ui.pages.analysis import (
+        render_sentence_analysis_ui,
+        render_analysis_complete_ui,
+        render_context_ui,
+        render_suggestion_ui,
+        render_next_keyword_button
+    )
+    from src.ui.pages.export import render_export_ui
+    from src.ui.pages.upload import render_upload_ui, handle_file_upload
 
 __all__ = [
     'render_sentence_analysis_ui',
@@ -20,4 +24,11 @@ __all__ = [
     'render_export_ui',
     'render_upload_ui',
     'handle_file_upload'
-]
\ No newline at end of file
+]
+
+# Submodules are imported when one of their names is first used, see src.startup.lazy.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'src.ui.pages.analysis': ['render_sentence_analysis_ui', 'render_analysis_complete_ui', 'render_context_ui', 'render_suggestion_ui', 'render_next_keyword_button'],
+    'src.ui.pages.export': ['render_export_ui'],
+    'src.ui.pages.upload': ['render_upload_ui', 'handle_file_upload']
+})
@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
 from typing import Dict, Any, List, Optional
 from src.domain.analyzer import SentenceExtractor
 from src.domain.ai.classifier import SentenceClassifier
+from src.domain.ai.trained import HashedNgramClassifier
 from src.config.settings import KeywordSets
-from src.ui.utils import show_congratulations
+from src.ui.utils import show_congratulations, apply_classification, mark_keyword_analyzed, rerun_fragment
 
 def render_sentence_analysis_ui(current_isp: Dict[str, Any], classifier: SentenceClassifier) -> None:
     """Render the UI for analyzing individual sentences."""
@@ -15,7 +15,9 @@ def render_sentence_analysis_ui(current_isp: Dict[str, Any], classifier: Sentenc
     total_sentences = len(st.session_state.current_sentences)
     
     st.progress(st.session_state.current_index / total_sentences)
-    st.write(f"Sentence {st.session_state.current_index + 1} of {total_sentences}")
+    keyword_results = current_isp['analysis_results'][st.session_state.current_keyword]
+    st.write(f"Sentence {st.session_state.current_index + 1} of {total_sentences} "
+             f"(classified: {len(keyword_results['AA'])} AA, {len(keyword_results['OI'])} OI)")
     
     st.markdown("### Current sentence:")
     current_item = st.session_state.current_sentences[st.session_state.current_index]
@@ -51,14 +53,14 @@ def render_sentence_analysis_ui(current_isp: Dict[str, Any], classifier: Sentenc
     with col3:
         if st.button("Context", key="context_button", use_container_width=True):
             st.session_state.show_context = not st.session_state.show_context
-            st.rerun()
+            rerun_fragment()
             
     with col4:
         if st.button("Suggestion", key="suggestion_button", use_container_width=True, 
-                     disabled=not st.session_state.get("ai_available", False)):
+                     disabled=not suggestions_available()):
             st.session_state.suggestion_in_progress = True
             st.session_state.current_suggestion = None
-            st.rerun()
+            rerun_fragment()
             
     with col5:
         if st.button("Skip", key="skip_button", use_container_width=True):
@@ -68,11 +70,11 @@ def render_sentence_analysis_ui(current_isp: Dict[str, Any], classifier: Sentenc
                     st.session_state.current_index = max(0, len(st.session_state.current_sentences) - 1)
                 st.session_state.current_suggestion = None 
                 st.session_state.suggestion_in_progress = False
-                st.rerun()
+                rerun_fragment()
     
     if st.session_state.suggestion_in_progress:
-        if not st.session_state.get("ai_available", False):
-            st.error("AI suggestion is not available because the llama-cpp-python library is not installed.")
+        if not suggestions_available():
+            st.error("AI suggestion is not available because the llama-cpp-python library is not installed and no trained classifier was found.")
             st.session_state.suggestion_in_progress = False
         else:
             render_suggestion_ui(current_isp, current_item, classifier)
@@ -86,7 +88,7 @@ def render_sentence_analysis_ui(current_isp: Dict[str, Any], classifier: Sentenc
             st.session_state.current_index -= 1
             st.session_state.current_suggestion = None
             st.session_state.suggestion_in_progress = False
-            st.rerun()
+            rerun_fragment()
     with col_forward:
         if st.button("Forward", key="forward_button", use_container_width=True) and st.session_state.current_index < total_sentences - 1:
             occurrence_id = f"{current_item['sentence']}::{current_item['start']}::{current_item['end']}"
@@ -96,11 +98,32 @@ def render_sentence_analysis_ui(current_isp: Dict[str, Any], classifier: Sentenc
                 st.session_state.current_index += 1
                 st.session_state.current_suggestion = None
                 st.session_state.suggestion_in_progress = False
-                st.rerun()
+                rerun_fragment()
             else:
                 st.warning("Please classify the current sentence before moving forward.")
 
 
+def render_isp_counters(isp_id: int, keyword: str) -> None:
+    """Show the AA/OI counts of the current keyword and the totals of the current ISP.
+    
+    Rendered in the classification fragment from the session's MetricsAggregate,
+    so they follow every classification without redrawing the results tables.
+    """
+    metrics = st.session_state.metrics.isp_metrics(isp_id, {keyword: keyword})
+    if metrics is None:
+        return
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric(f"'{keyword}' AA", metrics['aa_count'][keyword])
+    col2.metric(f"'{keyword}' OI", metrics['oi_count'][keyword])
+    col3.metric("ISP total AA / OI", f"{metrics['total_aa']} / {metrics['total_oi']}")
+    col4.metric("ISP loss of specificity", f"{metrics['total_loss_specificity']:.1f}%")
+
+
+def suggestions_available() -> bool:
+    """Check whether the LLM or a trained classifier can provide suggestions."""
+    return st.session_state.get("ai_available", False) or HashedNgramClassifier.load_default() is not None
+
+
 def handle_classification(current_isp: Dict[str, Any], current_item: Dict[str, Any], classification: str, method: str = "Manual", rationale: str = None) -> None:
     """Handle classification of a sentence.
     
@@ -112,28 +135,18 @@ def handle_classification(current_isp: Dict[str, Any], current_item: Dict[str, A
         rationale: Rationale for classification (if provided by AI)
     """
     occurrence_id = f"{current_item['sentence']}::{current_item['start']}::{current_item['end']}"
-    
-    if 'analysis_results' not in current_isp:
-        current_isp['analysis_results'] = {}
-    if st.session_state.current_keyword not in current_isp['analysis_results']:
-        current_isp['analysis_results'][st.session_state.current_keyword] = {'AA': [], 'OI': []}
-    
-    if classification == "AA":
-        if occurrence_id not in current_isp['analysis_results'][st.session_state.current_keyword]['AA']:
-            current_isp['analysis_results'][st.session_state.current_keyword]['AA'].append(occurrence_id)
-        if occurrence_id in current_isp['analysis_results'][st.session_state.current_keyword]['OI']:
-            current_isp['analysis_results'][st.session_state.current_keyword]['OI'].remove(occurrence_id)
-    else:  # OI
-        if occurrence_id not in current_isp['analysis_results'][st.session_state.current_keyword]['OI']:
-            current_isp['analysis_results'][st.session_state.current_keyword]['OI'].append(occurrence_id)
-        if occurrence_id in current_isp['analysis_results'][st.session_state.current_keyword]['AA']:
-            current_isp['analysis_results'][st.session_state.current_keyword]['AA'].remove(occurrence_id)
-    
-    metadata_key = f"{st.session_state.current_isp_id}::{st.session_state.current_keyword}::{occurrence_id}"
-    st.session_state.classification_metadata[metadata_key] = {
-        "method": method,
-        "rationale": rationale
-    }
+    metadata = {"method": method, "rationale": rationale}
+    # A suggestion the user saw but did not accept is kept for the agreement analytics.
+    if method == "Manual" and st.session_state.get("current_suggestion"):
+        metadata["suggested_classification"] = st.session_state.current_suggestion["classification"]
+    
+    apply_classification(
+        st.session_state.current_isp_id,
+        st.session_state.current_keyword,
+        occurrence_id,
+        classification,
+        metadata=metadata
+    )
     
     st.session_state.classifications.append((classification, occurrence_id))
     st.session_state.current_index += 1
@@ -141,14 +154,17 @@ def handle_classification(current_isp: Dict[str, Any], current_item: Dict[str, A
     st.session_state.suggestion_in_progress = False
     
     if st.session_state.current_index >= len(st.session_state.current_sentences):
-        st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(st.session_state.current_keyword)
+        mark_keyword_analyzed(st.session_state.current_isp_id, st.session_state.current_keyword)
         
         all_keywords = list(KeywordSets.get_keywords(st.session_state.language).keys())
         analyzed_for_isp = st.session_state.analyzed_keywords.get(st.session_state.current_isp_id, set())
         if len(analyzed_for_isp) == len(all_keywords):
             show_congratulations()
+        
+        # The keyword is done: rerun the whole app so the sidebar and the results catch up.
+        st.rerun()
     
-    st.rerun()
+    rerun_fragment()
 
 
 def render_suggestion_ui(current_isp: Dict[str, Any], current_item: Dict[str, Any], classifier: SentenceClassifier) -> None:
@@ -164,6 +180,10 @@ def render_suggestion_ui(current_isp: Dict[str, Any], current_item: Dict[str, An
         suggestion = st.session_state.current_suggestion
         classification = suggestion["classification"]
         rationale = suggestion["rationale"]
+        probability = suggestion.get("probability")
+        confidence = ""
+        if probability is not None:
+            confidence = f" ({max(probability, 1 - probability):.0%} confidence)"
         
         if classification == "AA":
             box_color = "#1E6823"
@@ -174,7 +194,7 @@ def render_suggestion_ui(current_isp: Dict[str, Any], current_item: Dict[str, An
         
         st.markdown(f"""
         <div style="margin: 15px 0; padding: 10px; border-radius: 5px; background-color: {box_color}; color: {text_color};">
-            <h3 style="margin-top: 0;">Suggested Classification: {classification}</h3>
+            <h3 style="margin-top: 0;">Suggested Classification: {classification}{confidence}</h3>
             <p><strong>Rationale:</strong> {rationale}</p>
         </div>
         """, unsafe_allow_html=True)
@@ -188,7 +208,7 @@ def render_suggestion_ui(current_isp: Dict[str, Any], current_item: Dict[str, An
             if st.button("Cancel", key="cancel_suggestion", use_container_width=True):
                 st.session_state.current_suggestion = None
                 st.session_state.suggestion_in_progress = False
-                st.rerun()
+                rerun_fragment()
 
 
 def render_context_ui(current_item: Dict[str, Any]) -> None:
@@ -249,7 +269,7 @@ def render_context_ui(current_item: Dict[str, Any]) -> None:
 
 def render_analysis_complete_ui(current_isp: Dict[str, Any]) -> None:
     """Render the UI when analysis is complete."""
-    st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(st.session_state.current_keyword)
+    mark_keyword_analyzed(st.session_state.current_isp_id, st.session_state.current_keyword)
     st.success(f"All {len(st.session_state.current_sentences)} sentences with '{st.session_state.current_keyword}' have been classified!")
     
     all_keywords = list(KeywordSets.get_keywords(st.session_state.language).keys())
@@ -354,6 +374,7 @@ def render_current_keyword_raw_data(current_isp: Dict[str, Any]) -> None:
             for key in row:
                 row[key] = str(row[key])
         
+        import pandas as pd
         df = pd.DataFrame(data)
         st.dataframe(df, hide_index=True)
     else:
@@ -398,7 +419,7 @@ def render_next_keyword_button() -> None:
                 current_isp['analysis_results'][next_keyword] = {'AA': [], 'OI': []}
                 
             if len(st.session_state.current_sentences) == 0:
-                st.session_state.analyzed_keywords.setdefault(st.session_state.current_isp_id, set()).add(next_keyword)
+                mark_keyword_analyzed(st.session_state.current_isp_id, next_keyword)
                 
                 all_keywords = list(KeywordSets.get_keywords(st.session_state.language).keys())
                 analyzed_for_isp = st.session_state.analyzed_keywords.get(st.session_state.current_isp_id, set())
@@ -501,6 +522,7 @@ def render_current_keyword_raw_data(current_isp: Dict[str, Any]) -> None:
             for key in row:
                 row[key] = str(row[key])
         
+        import pandas as pd
         df = pd.DataFrame(data)
         st.dataframe(df, hide_index=True)
     else:
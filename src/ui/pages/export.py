@@ -1,29 +1,37 @@
 import streamlit as st
 import pandas as pd
 from typing import Dict, Any
-from src.domain.metrics import MetricsCalculator
+from src.domain.metrics import MetricsAggregate
 from src.data.exporters.excel import ExcelExporter
+from src.data.exporters.tabular import TabularExporter
+from src.data.exporters.bundle import WorkbookBundleExporter
 from src.config.settings import KeywordSets
+from src.ui.utils import get_occurrence_table
+from src.ui.components.downloads import render_prepared_download
 from src.ui.components.tables import (
     render_total_loss_table,
     render_aa_keywords_table,
     render_oi_keywords_table,
     render_keyword_loss_table,
-    render_raw_data_table
+    render_raw_data_table,
+    render_corpus_breakdown,
+    render_agreement_analysis
 )
 
 def render_export_ui(isps: Dict[int, Dict[str, Any]], language: str) -> None:
     """Render the export UI with analysis results."""
     st.header("Analysis Results")
+    st.caption("The tables are updated when a keyword is finished; the counts above the results follow every "
+               "classification. Click Refresh Metrics to update the tables sooner.")
     
     if st.button("Refresh Metrics", key="refresh_metrics_btn"):
         st.success("Metrics refreshed!")
         st.rerun()
     
-    all_metrics = MetricsCalculator.calculate_all_metrics(
-        isps, 
-        KeywordSets.get_keywords(language)
-    )
+    metrics = st.session_state.get("metrics")
+    if metrics is None:
+        metrics = st.session_state.metrics = MetricsAggregate.from_isps(isps)
+    all_metrics = metrics.all_metrics(KeywordSets.get_keywords(language))
     
     if all_metrics:
         def create_safe_dataframe(data):
@@ -36,18 +44,79 @@ def render_export_ui(isps: Dict[int, Dict[str, Any]], language: str) -> None:
         render_aa_keywords_table(all_metrics, create_safe_dataframe)
         render_oi_keywords_table(all_metrics, create_safe_dataframe)
         render_keyword_loss_table(all_metrics, create_safe_dataframe)
+        render_corpus_breakdown()
+        render_agreement_analysis()
         
         if st.session_state.current_isp_id is not None:
             if "last_displayed_isp" not in st.session_state or st.session_state.last_displayed_isp != st.session_state.current_isp_id:
                 st.session_state.raw_data_page = 0
                 st.session_state.last_displayed_isp = st.session_state.current_isp_id
                 
-            render_raw_data_table(st.session_state.current_isp_id, isps, create_safe_dataframe)
+            render_raw_data_table(st.session_state.current_isp_id, isps)
         
         st.subheader("Export Results")
-        exporter = ExcelExporter(
+        loader = st.session_state.get("isp_loader")
+        if loader is not None and loader.has_stubs():
+            st.info("Only the ISPs you have opened so far are loaded. Load all ISPs to export the results.")
+            if st.button("Load All ISPs for Export", key="hydrate_all_btn"):
+                with st.spinner("Loading ISPs..."):
+                    loader.hydrate_all()
+                st.rerun()
+            return
+        
+        render_excel_download(isps, language, metrics)
+        render_data_download(isps, language, metrics)
+        render_bundle_download(isps, language, metrics)
+
+
+def render_excel_download(isps: Dict[int, Dict[str, Any]], language: str, metrics: MetricsAggregate) -> None:
+    """Generate the Excel file on request and serve it until the data or language changes."""
+    def write(path: str) -> None:
+        ExcelExporter(
             isps=isps, 
             language=language, 
-            classification_metadata=st.session_state.classification_metadata
-        )
-        st.markdown(exporter.get_download_link(), unsafe_allow_html=True)
\ No newline at end of file
+            classification_metadata=st.session_state.classification_metadata,
+            metrics=metrics,
+            occurrence_table=get_occurrence_table()
+        ).write_excel(path)
+    
+    render_prepared_download(
+        "excel_export", (metrics.version, language), "Prepare Excel File", "Download Excel file", ".xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", write
+    )
+
+
+def render_data_download(isps: Dict[int, Dict[str, Any]], language: str, metrics: MetricsAggregate) -> None:
+    """Generate a ZIP of the occurrence table, per-ISP metrics and metadata in a data file format."""
+    formats = {TabularExporter.get_exporter(name).label: name for name in ("parquet", "csv", "jsonl")}
+    label = st.selectbox("Data file format", list(formats), key="data_export_format")
+    exporter_class = TabularExporter.get_exporter(formats[label])
+    
+    def write(path: str) -> None:
+        exporter = exporter_class(isps, language, st.session_state.classification_metadata, metrics)
+        with open(path, "wb") as f:
+            exporter.write_zip(f)
+    
+    render_prepared_download(
+        "data_export", (metrics.version, language, formats[label]), f"Prepare {label} Export",
+        f"Download {label} export", ".zip", "application/zip", write
+    )
+
+
+def render_bundle_download(isps: Dict[int, Dict[str, Any]], language: str, metrics: MetricsAggregate) -> None:
+    """Generate one workbook per ISP in parallel and serve them as a ZIP."""
+    def write(path: str) -> None:
+        items = WorkbookBundleExporter.items_from_session(isps, st.session_state.classification_metadata)
+        progress_bar = st.progress(0.0, text="Generating workbooks...")
+        
+        def progress(done: int, total: int) -> None:
+            progress_bar.progress(done / total, text=f"Generated {done} of {total} workbooks")
+        
+        with open(path, "wb") as f:
+            WorkbookBundleExporter(language).write_zip(f, items, len(items), progress)
+        progress_bar.empty()
+    
+    render_prepared_download(
+        "bundle_export", (metrics.version, language), "Prepare Workbook per ISP", "Download workbooks (ZIP)",
+        ".zip", "application/zip", write
+    )
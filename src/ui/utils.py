@@ -1,6 +1,9 @@
 # src/ui/utils.py
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from src.data.exporters.occurrences import OCCURRENCE_SCHEMA, iter_occurrences
+from src.data.journal import EVENT_CLASSIFY, EVENT_KEYWORD_DONE
 
 def show_congratulations():
     """Show a congratulations message and balloons when all keywords are analyzed."""
@@ -47,4 +50,163 @@ def show_congratulations():
         </ul>
         <p><strong>⚠️ Remember to save your progress by clicking "Save Analysis" in the sidebar!</strong></p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+def ensure_isp_loaded(isp_id):
+    """Hydrate an ISP of a lazily loaded session, returning the ISP dict."""
+    loader = st.session_state.get("isp_loader")
+    if loader is not None and isp_id is not None:
+        return loader.hydrate(isp_id)
+    return st.session_state.isps.get(isp_id)
+
+
+def journal_event(event_type, **fields):
+    """Append an event to the session's autosave journal, if one is open."""
+    journal = st.session_state.get("journal")
+    if journal is not None:
+        journal.append(event_type, **fields)
+
+
+def record_metrics(isp_id, keyword, old_label, new_label, metadata_changed=False):
+    """Update the session's metrics counters for a classification that changed."""
+    metrics = st.session_state.get("metrics")
+    if metrics is not None:
+        metrics.record(isp_id, keyword, old_label, new_label)
+        if metadata_changed and old_label == new_label:
+            metrics.touch()
+
+
+def apply_classification(isp_id, keyword, occurrence_id, classification, metadata=None):
+    """Put an occurrence in the AA or OI list of a keyword and journal the change.
+    
+    Args:
+        isp_id: ID of the ISP
+        keyword: Keyword the occurrence belongs to
+        occurrence_id: Occurrence ID ("sentence::start::end")
+        classification: Classification category ("AA" or "OI")
+        metadata: Classification metadata to store, or None to leave it unchanged
+    """
+    current_isp = st.session_state.isps[isp_id]
+    results = current_isp.setdefault('analysis_results', {}).setdefault(keyword, {'AA': [], 'OI': []})
+    other = "OI" if classification == "AA" else "AA"
+    
+    previous = None
+    if occurrence_id not in results[classification]:
+        results[classification].append(occurrence_id)
+    else:
+        previous = classification
+    if occurrence_id in results[other]:
+        results[other].remove(occurrence_id)
+        previous = other
+    record_metrics(isp_id, keyword, previous, classification, metadata_changed=metadata is not None)
+    
+    if metadata is not None:
+        st.session_state.classification_metadata[f"{isp_id}::{keyword}::{occurrence_id}"] = metadata
+    
+    journal_event(EVENT_CLASSIFY, isp_id=isp_id, keyword=keyword, occurrence=occurrence_id,
+                  label=classification, metadata=metadata)
+
+
+def remove_classification(isp_id, keyword, occurrence_id):
+    """Remove an occurrence from the AA and OI lists of a keyword, with its metadata, and journal the change."""
+    results = st.session_state.isps[isp_id].get('analysis_results', {}).get(keyword, {})
+    for label, labeled in results.items():
+        if occurrence_id in labeled:
+            labeled.remove(occurrence_id)
+            record_metrics(isp_id, keyword, label, None)
+    st.session_state.classification_metadata.pop(f"{isp_id}::{keyword}::{occurrence_id}", None)
+    journal_event(EVENT_CLASSIFY, isp_id=isp_id, keyword=keyword, occurrence=occurrence_id, label=None)
+
+
+def mark_keyword_analyzed(isp_id, keyword):
+    """Mark a keyword as fully analyzed for an ISP and journal the change."""
+    analyzed = st.session_state.analyzed_keywords.setdefault(isp_id, set())
+    if keyword not in analyzed:
+        analyzed.add(keyword)
+        journal_event(EVENT_KEYWORD_DONE, isp_id=isp_id, keyword=keyword)
+
+
+def get_occurrence_table():
+    """Get the occurrence table of the session, rebuilding it only when the data version has changed."""
+    from src.domain.corpus import OccurrenceTable
+    
+    version = st.session_state.metrics.version
+    table = st.session_state.get("occurrence_table")
+    if table is None or table.version != version:
+        table = OccurrenceTable.from_session(st.session_state.isps, st.session_state.classification_metadata, version)
+        st.session_state.occurrence_table = table
+    return table
+
+
+def get_raw_data_frame(isp_id):
+    """Get the raw data of an ISP as a typed DataFrame, one row per occurrence, rebuilt only when the data changes.
+
+    Rows keep the order in which they were first shown ('Order'), so switching a
+    classification does not move a row. Duplicate sentences are marked with
+    'DuplicateCount' (rows with the same sentence) and 'Inconsistent' (the
+    duplicates have different classifications).
+    """
+    import pandas as pd
+    
+    version = st.session_state.metrics.version
+    cached = st.session_state.get("raw_data_frame")
+    if cached is not None and cached[0] == isp_id and cached[1] == version:
+        return cached[2]
+    
+    isp = st.session_state.isps[isp_id]
+    records = list(iter_occurrences({isp_id: isp}, st.session_state.classification_metadata))
+    columns = [column for column, _ in OCCURRENCE_SCHEMA]
+    frame = pd.DataFrame.from_records(records, columns=columns) if records else pd.DataFrame(columns=columns)
+    frame = frame.sort_values('keyword', kind='stable', ignore_index=True)
+    occurrences = frame['sentence'] + "::" + frame['start'].astype(str) + "::" + frame['end'].astype(str)
+    
+    order_map = st.session_state.setdefault("raw_data_order", {}).setdefault(f"isp_{isp_id}_order", {})
+    occurrence_keys = frame['keyword'] + "::" + occurrences
+    order = occurrence_keys.map(order_map)
+    new = order.isna().to_numpy()
+    if new.any():
+        new_orders = range(len(order_map), len(order_map) + int(new.sum()))
+        order_map.update(zip(occurrence_keys[new], new_orders))
+        order[new] = list(new_orders)
+    
+    sentences = frame['sentence']
+    result = pd.DataFrame({
+        'Order': order.astype('int64'),
+        'Keyword': frame['keyword'].astype('category'),
+        'Classification': pd.Categorical(frame['classification'], categories=["AA", "OI"]),
+        'Sentence': pd.Series([s[:a] + "[" + s[a:b] + "]" + s[b:] for s, a, b
+                               in zip(sentences, frame['start'], frame['end'])], index=frame.index, dtype=object),
+        'BaseSentence': sentences,
+        'Method': frame['method'],
+        'Rationale': frame['rationale'].fillna(""),
+        'Occurrence': occurrences
+    })
+    duplicates = result.groupby('BaseSentence', sort=False)['Classification']
+    result['DuplicateCount'] = duplicates.transform('size').astype('int64')
+    result['Inconsistent'] = duplicates.transform('nunique').to_numpy() > 1
+    result = result.sort_values('Order', ignore_index=True)
+    
+    st.session_state.raw_data_frame = (isp_id, version, result)
+    return result
+
+
+def session_activity_check():
+    """A function telling whether the current browser session is still connected, or None outside a server."""
+    from streamlit.runtime import Runtime
+    ctx = get_script_run_ctx()
+    if ctx is None or not Runtime.exists():
+        return None
+    runtime, session_id = Runtime.instance(), ctx.session_id
+    return lambda: runtime.is_active_session(session_id)
+
+
+def rerun_fragment():
+    """Rerun only the current fragment when called during a fragment rerun, and the whole app otherwise.
+    
+    Streamlit only allows a fragment-scoped rerun while a fragment is rerun on
+    its own; a fragment's buttons can also fire during a full run of the app.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()